@@ -12,6 +12,11 @@ import click
 from datetime import timezone, timedelta
 import pytz
 from werkzeug.middleware.proxy_fix import ProxyFix
+from .cache import cache
+from .activity import activity_writer
+from .jobs import job_runner
+from .reports.pdf_cache import pdf_cache
+from .utils import NAV_COUNTS_TTL
 
 login_manager = LoginManager()
 bcrypt = Bcrypt()
@@ -54,6 +59,9 @@ def create_app():
     login_manager.init_app(app)
     bcrypt.init_app(app)
     mail.init_app(app)
+    activity_writer.init_app(app)
+    job_runner.init_app(app)
+    pdf_cache.init_app(app)
 
     app.jinja_env.filters['localdatetime'] = format_datetime_local
     app.jinja_env.filters['dayofweek'] = format_day_of_week
@@ -144,6 +152,55 @@ def create_app():
             db.session.commit()
             print(f"Pomyślnie dodano rolę '{role_name}' do użytkownika '{username}'.")
 
+    @app.cli.command("rebuild-stock-totals")
+    def rebuild_stock_totals():
+        """Przelicza od zera tabelę sum stanów surowców z partii."""
+        from .warehouse.stock import rebuild_material_stock
+        count = rebuild_material_stock()
+        db.session.commit()
+        print(f"Przeliczono stany dla {count} surowców.")
+
+    @app.cli.command("rebuild-production-stats")
+    def rebuild_production_stats_command():
+        """Przelicza od zera dzienne sumy produkcji (statystyki) ze zleceń."""
+        from .production.stats import rebuild_production_stats
+        count = rebuild_production_stats()
+        db.session.commit()
+        print(f"Przeliczono {count} dziennych sum produkcji.")
+
+    @app.cli.command("rebuild-sales-velocity")
+    def rebuild_sales_velocity_command():
+        """Przelicza od zera sprzedaż dzienną produktów (tempo sprzedaży) z raportów sprzedaży."""
+        from .finished_goods.sales_velocity import rebuild_daily_sales
+        count = rebuild_daily_sales()
+        db.session.commit()
+        print(f"Przeliczono sprzedaż dzienną z {count} wpisów raportów sprzedaży.")
+
+    @app.cli.command("prune-jobs")
+    def prune_jobs_command():
+        """Usuwa zadania w tle (i ich pliki wynikowe) starsze niż JOBS_RETENTION."""
+        from .jobs import job_runner
+        count = job_runner.prune_finished()
+        print(f"Usunięto {count} starych zadań w tle.")
+
+    @app.cli.command("check-query-plans")
+    def check_query_plans_command():
+        """Sprawdza (EXPLAIN), czy najczęstsze zapytania korzystają z indeksów."""
+        from .query_plans import check_query_plans
+        failed = 0
+        for label, index_name, used, plan in check_query_plans():
+            if used:
+                print(f"OK    {label}: {index_name}")
+            else:
+                failed += 1
+                print(f"BŁĄD  {label}: plan nie używa indeksu {index_name}")
+                for line in plan:
+                    print(f"        {line}")
+        if failed:
+            print(f"Zapytań bez oczekiwanego indeksu: {failed}.")
+            raise SystemExit(1)
+        print("Wszystkie zapytania korzystają z indeksów.")
+
     # === POCZĄTEK MODYFIKACJI ===
     @app.context_processor
     def inject_nav_counts():
@@ -153,18 +210,26 @@ def create_app():
         
         if current_user.is_authenticated:
             # Oblicz liczbę nowych zadań (dla wszystkich poza team_member)
+            # Liczniki są cache'owane krótko i unieważniane przy zmianie statusu zadań/zamówień
             if not current_user.has_role('team_member'):
                 try:
-                    count = Task.query.filter(Task.assignees.contains(current_user), Task.status == 'Nowe').count()
-                    new_tasks_count = count
+                    user_id = current_user.id
+                    new_tasks_count = cache.get_or_set(
+                        ('nav_tasks', user_id),
+                        lambda: Task.query.filter(Task.assignees.any(User.id == user_id), Task.status == 'Nowe').count(),
+                        NAV_COUNTS_TTL
+                    )
                 except Exception:
                     pass # Błąd bazy danych (np. przy starcie)
 
             # Oblicz liczbę zamówień drużyny (tylko dla admina)
             if current_user.has_role('admin'):
                 try:
-                    team_count = TeamOrder.query.filter_by(status='Oczekuje').count()
-                    pending_team_orders_count = team_count
+                    pending_team_orders_count = cache.get_or_set(
+                        ('nav_team_orders',),
+                        lambda: TeamOrder.query.filter_by(status='Oczekuje').count(),
+                        NAV_COUNTS_TTL
+                    )
                 except Exception:
                     pass # Błąd bazy danych (np. przy starcie)
                     
@@ -178,4 +243,5 @@ def create_app():
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
\ No newline at end of file
+    from .auth.principal import load_principal
+    return load_principal(int(user_id))
\ No newline at end of file
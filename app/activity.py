@@ -0,0 +1,122 @@
+# app/activity.py
+"""
+Buforowany zapis dziennika aktywności (ActivityLog).
+
+log_activity() nie robi już własnego commita: wpis trafia do ograniczonej
+kolejki w pamięci, a wątek w tle zapisuje wpisy paczkami jednym INSERT-em.
+Przy zamykaniu procesu kolejka jest opróżniana. Gdy kolejka zapełnia się
+powyżej progu, można włączyć próbkowanie (zapis tylko części wpisów).
+
+Tryb 'sync' (ACTIVITY_LOG_MODE) przywraca zapis natychmiastowy.
+"""
+import atexit
+import os
+import queue
+import random
+import threading
+from sqlalchemy import insert
+from app.models import db, ActivityLog
+
+_STOP = object()
+
+
+class ActivityLogWriter:
+    def __init__(self):
+        self.app = None
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def init_app(self, app):
+        self.app = app
+        self.mode = app.config.get('ACTIVITY_LOG_MODE', 'async')
+        self.queue_size = app.config.get('ACTIVITY_LOG_QUEUE_SIZE', 10000)
+        self.batch_size = app.config.get('ACTIVITY_LOG_BATCH_SIZE', 200)
+        self.flush_interval = app.config.get('ACTIVITY_LOG_FLUSH_INTERVAL', 2.0)
+        self.sample_rate = app.config.get('ACTIVITY_LOG_SAMPLE_RATE', 1.0)
+        self.high_water = int(self.queue_size * app.config.get('ACTIVITY_LOG_HIGH_WATER', 0.8))
+        atexit.register(self.shutdown)
+
+    def write(self, entry):
+        """Przyjmuje wpis jako słownik kolumn ActivityLog."""
+        if self.mode == 'sync':
+            self._insert([entry])
+            return
+        self._ensure_worker()
+        if self._queue.qsize() >= self.high_water and random.random() >= self.sample_rate:
+            self.dropped += 1
+            return
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 100 == 1:
+                print(f"Ostrzeżenie: kolejka dziennika aktywności pełna, pominięto {self.dropped} wpisów.")
+
+    def flush(self):
+        """Zapisuje synchronicznie wszystko, co czeka w kolejce."""
+        if self._queue is None:
+            return
+        batch = []
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not _STOP:
+                batch.append(entry)
+        if batch:
+            self._insert(batch)
+
+    def shutdown(self):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._queue.put(_STOP)
+            self._thread.join(timeout=self.flush_interval * 5)
+        self.flush()
+
+    def _ensure_worker(self):
+        # Po forku (gunicorn) wątek rodzica nie istnieje - każdy proces ma własną kolejkę i wątek
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid != os.getpid() or self._thread is None or not self._thread.is_alive():
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue(maxsize=self.queue_size)
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='activity-log-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                entry = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            if entry is _STOP:
+                return
+            batch.append(entry)
+            while len(batch) < self.batch_size:
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    self._insert(batch)
+                    return
+                batch.append(entry)
+            self._insert(batch)
+
+    def _insert(self, batch):
+        with self.app.app_context():
+            try:
+                db.session.execute(insert(ActivityLog.__table__), batch)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Błąd zapisu dziennika aktywności ({len(batch)} wpisów): {e}")
+
+
+activity_writer = ActivityLogWriter()
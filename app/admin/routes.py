@@ -1,12 +1,14 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
-from app.models import db, User, Role, Task, ProductionOrder, FinishedProduct, TeamOrder, TeamOrderProduct, ActivityLog
+from app.models import db, User, Role, Task, TeamOrder, TeamOrderProduct, ActivityLog
 from flask_login import login_required, current_user, login_user
 from app import bcrypt
 from app.decorators import permission_required
-from sqlalchemy import func
 from sqlalchemy.orm import joinedload
 from datetime import datetime, timedelta
-from app.utils import log_activity
+from app.utils import log_activity, invalidate_team_order_counts
+from app.inventory import invalidate_inventory_health
+from app.production.history import parse_date
+from app.production.stats import production_stats
 from markupsafe import Markup
 
 bp = Blueprint('admin', __name__, template_folder='templates', url_prefix='/admin')
@@ -109,21 +111,11 @@ def all_tasks():
 @login_required
 @permission_required('admin')
 def statistics():
-    engine_type = db.engine.dialect.name
-    if engine_type == 'postgresql':
-        date_func_daily = func.to_char(ProductionOrder.order_date, 'YYYY-MM-DD')
-        date_func_weekly = func.to_char(ProductionOrder.order_date, 'YYYY-WW')
-        date_func_monthly = func.to_char(ProductionOrder.order_date, 'YYYY-MM')
-    else:
-        date_func_daily = func.date(ProductionOrder.order_date)
-        date_func_weekly = func.strftime('%Y-%W', ProductionOrder.order_date)
-        date_func_monthly = func.strftime('%Y-%m', ProductionOrder.order_date)
-
-    daily_stats = db.session.query(date_func_daily.label('date'), FinishedProduct.name.label('product_name'), func.sum(ProductionOrder.quantity_produced).label('total_quantity')).join(FinishedProduct).group_by('date', 'product_name').order_by(db.desc('date')).all()
-    weekly_stats = db.session.query(date_func_weekly.label('week'), FinishedProduct.name.label('product_name'), func.sum(ProductionOrder.quantity_produced).label('total_quantity')).join(FinishedProduct).group_by('week', 'product_name').order_by(db.desc('week')).all()
-    monthly_stats = db.session.query(date_func_monthly.label('month'), FinishedProduct.name.label('product_name'), func.sum(ProductionOrder.quantity_produced).label('total_quantity')).join(FinishedProduct).group_by('month', 'product_name').order_by(db.desc('month')).all()
-    
-    return render_template('statistics.html', daily_stats=daily_stats, weekly_stats=weekly_stats, monthly_stats=monthly_stats)
+    # Statystyki czytają dzienne sumy produkcji (app/production/stats.py), nie wszystkie zlecenia
+    filters = {'date_from': parse_date(request.args.get('date_from')), 'date_to': parse_date(request.args.get('date_to'))}
+    stats = production_stats(filters['date_from'], filters['date_to'])
+    return render_template('statistics.html', daily_stats=stats['date'], weekly_stats=stats['week'],
+                           monthly_stats=stats['month'], filters=filters)
 
 @bp.route('/activity_log')
 @login_required
@@ -180,6 +172,8 @@ def complete_team_order(order_id):
     order.status = 'Zrealizowane'
     
     db.session.commit()
+    invalidate_inventory_health()
+    invalidate_team_order_counts()
     
     log_activity(f"Zrealizował zamówienie drużynowe #{order.id} (dla {order.user.username}) i zdjął produkty ze stanu.")
     
@@ -197,6 +191,7 @@ def delete_team_order(order_id):
     # powiązane z nim produkty (TeamOrderProduct) zostaną usunięte automatycznie.
     db.session.delete(order)
     db.session.commit()
+    invalidate_team_order_counts()
     
     log_activity(f"Trwale usunął zamówienie drużynowe #{order.id} (użytkownik: {order.user.username}).")
     
@@ -0,0 +1,51 @@
+# app/auth/principal.py
+"""
+Lekka tożsamość zalogowanego użytkownika dla Flask-Login.
+
+Przy każdym żądaniu Flask-Login wywołuje load_user(). Zamiast ładować pełny
+obiekt User (z rolami i relacjami) pobieramy jednym zapytaniem tylko id, nazwę
+i zbiór ról. Pozostałe atrybuty (np. adres członka drużyny) są doczytywane z
+bazy dopiero przy pierwszym odwołaniu, a zadania pobierają tylko widoki zadań.
+
+Role nie są cache'owane: cache jest osobny w każdym workerze, więc odebrana
+rola działałaby w pozostałych procesach aż do wygaśnięcia wpisu.
+"""
+from flask_login import UserMixin
+from app.models import db, User, Role
+
+
+class UserPrincipal(UserMixin):
+    def __init__(self, id, username, role_names):
+        self.id = id
+        self.username = username
+        self.role_names = frozenset(role_names)
+        self._user = None
+
+    def has_role(self, role_name):
+        return role_name in self.role_names
+
+    @property
+    def user(self):
+        """Pełny obiekt User - ładowany tylko gdy widok naprawdę go potrzebuje."""
+        if self._user is None:
+            self._user = db.session.get(User, self.id)
+        return self._user
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.user, name)
+
+
+def _fetch_principal_data(user_id):
+    rows = db.session.query(User.username, Role.name).outerjoin(User.roles).filter(User.id == user_id).all()
+    if not rows:
+        return None
+    return (user_id, rows[0][0], frozenset(role_name for _, role_name in rows if role_name))
+
+
+def load_principal(user_id):
+    data = _fetch_principal_data(user_id)
+    if data is None:
+        return None
+    return UserPrincipal(*data)
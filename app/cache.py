@@ -0,0 +1,75 @@
+# app/cache.py
+"""
+Prosty cache w pamięci procesu z czasem życia wpisów (TTL).
+
+Klucze są krotkami, których pierwszy element to przestrzeń nazw, np.
+('production_costs',) albo ('nav_counts', user_id). Dzięki temu można
+unieważnić naraz wszystkie wpisy danej przestrzeni metodą invalidate().
+Każdy worker gunicorna ma własną kopię, więc TTL ogranicza czas, przez
+jaki inny proces może widzieć nieaktualne dane.
+"""
+import threading
+import time
+
+
+class TTLCache:
+    def __init__(self, default_ttl=60, max_entries=4096):
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            if len(self._data) >= self.max_entries and key not in self._data:
+                self._evict()
+            self._data[key] = (expires_at, value)
+
+    def get_or_set(self, key, factory, ttl=None):
+        """Zwraca wartość z cache lub wylicza ją funkcją factory() i zapamiętuje."""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = factory()
+            self.set(key, value, ttl)
+        return value
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate(self, namespace):
+        """Usuwa wszystkie wpisy z danej przestrzeni nazw."""
+        with self._lock:
+            for key in [k for k in self._data if k[0] == namespace]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def _evict(self):
+        # Najpierw wygasłe wpisy, a jeśli to nie wystarczy - te najbliżej wygaśnięcia
+        now = time.monotonic()
+        expired = [k for k, (expires_at, _) in self._data.items() if expires_at < now]
+        for key in expired:
+            del self._data[key]
+        if len(self._data) >= self.max_entries:
+            oldest = sorted(self._data, key=lambda k: self._data[k][0])[:max(1, self.max_entries // 10)]
+            for key in oldest:
+                del self._data[key]
+
+
+cache = TTLCache()
@@ -0,0 +1,137 @@
+# app/debtor_tracker/bank_csv.py
+"""
+Wczytywanie wyciągu bankowego (CSV) dla modułu dłużników.
+
+Przesłany plik czytamy strumieniowo: pierwsze przejście blokami liczy skrót
+SHA-256 i rozpoznaje kodowanie, drugie (tylko dla nowego pliku) wczytuje
+go porcjami pd.read_csv z jawnymi typami i wyłącznie potrzebnymi kolumnami.
+W pamięci nie ma więc ani całego pliku, ani jego zdekodowanej kopii.
+"""
+import codecs
+import hashlib
+import re
+import pandas as pd
+from app.debtor_tracker.store import payment_row_hashes
+
+CSV_ORIGINAL_HEADERS = [
+    "DataKsiegowania", "DataWaluty", "TytulPrzelewu", "NadawcaInfo",
+    "NrKontaNadawcy", "KwotaPrzelewu", "SaldoPoOperacji", "IDTransakcji",
+    "_PustaKolumna"
+]
+CSV_COLUMNS_TO_KEEP = ["DataKsiegowania", "DataWaluty", "TytulPrzelewu", "NadawcaInfo", "KwotaPrzelewu"]
+# Kolumny identyfikujące wiersz wyciągu (ten sam wiersz w narastającym wyciągu = ta sama wpłata)
+CSV_ROW_HASH_COLUMNS = ["DataKsiegowania", "DataWaluty", "TytulPrzelewu", "NadawcaInfo", "NrKontaNadawcy", "KwotaPrzelewu", "IDTransakcji"]
+CSV_DISPLAY_NAMES = {
+    "DataKsiegowania": "Data Księgowania", "DataWaluty": "Data Waluty",
+    "TytulPrzelewu": "Tytuł Przelewu (Wpłata)", "NadawcaInfo": "Od Kogo (Wpłata)",
+    "KwotaPrzelewu": "Kwota Wpłaty"
+}
+CSV_DELIMITER = ','
+CSV_DECIMAL = ','
+
+# Kodowania próbowane przy odczycie (kolejność = pierwszeństwo). Poprawny UTF-8 wygrywa; cp1250
+# i iso-8859-2 rozróżniamy po bajtach liter ą, Ą, ś, Ś, ź, Ź, które w każdym z nich są inne.
+CSV_ENCODINGS = ['utf-8', 'cp1250', 'iso-8859-2']
+POLISH_LETTER_BYTES = {
+    'cp1250': [b'\xb9', b'\xa5', b'\x9c', b'\x8c', b'\x9f', b'\x8f'],
+    'iso-8859-2': [b'\xb1', b'\xa1', b'\xb6', b'\xa6', b'\xbc', b'\xac'],
+}
+# Wczytujemy tylko kolumny do wyświetlenia i do skrótu wiersza, wszystkie jako tekst
+CSV_USED_COLUMNS = [col for col in CSV_ORIGINAL_HEADERS if col in CSV_COLUMNS_TO_KEEP or col in CSV_ROW_HASH_COLUMNS]
+CSV_CHUNK_ROWS = 50000
+READ_BLOCK_SIZE = 1024 * 1024
+
+# Wzorce numeru faktury w tytule wpłaty, w kolejności ważności
+PAYMENT_TITLE_PATTERNS = [
+    r'(?:FV|PA|FAK|Faktura|Zamówienie|Zam)\s*(?:nr\.?|numer)?\s*([\w/.-]+)',
+    r'REF:\s*([\w/.-]+)',
+]
+PAYMENT_TITLE_REGEXES = [re.compile(pattern, re.IGNORECASE) for pattern in PAYMENT_TITLE_PATTERNS]
+# Tytuł będący samym numerem (bez spacji, dłuższy niż 4 znaki)
+PAYMENT_TITLE_NUMBER_REGEX = re.compile(r'[A-Z0-9/.-]{5,}')
+
+
+def extract_invoice_from_payment_title(title):
+    """Próbuje wyciągnąć numer faktury z tytułu WPŁATY (z CSV)."""
+    if not isinstance(title, str): return ""
+    for regex in PAYMENT_TITLE_REGEXES:
+        match = regex.search(title)
+        if match: return match.group(1).strip()
+    if PAYMENT_TITLE_NUMBER_REGEX.fullmatch(title):
+         return title
+    return ""
+
+
+def extract_invoices_from_payment_titles(titles):
+    """Wektorowa wersja extract_invoice_from_payment_title dla całej kolumny tytułów.
+
+    Każdy wzorzec (w kolejności ważności) przechodzi raz przez tytuły, które nie
+    mają jeszcze numeru - wynik jest taki sam jak przy kolejnych re.search.
+    """
+    is_text = titles.map(lambda value: isinstance(value, str)).astype(bool)
+    text = titles.where(is_text, '').astype(str)
+    numbers = text.str.extract(PAYMENT_TITLE_REGEXES[0], expand=False)
+    for regex in PAYMENT_TITLE_REGEXES[1:]:
+        pending = numbers.isna()
+        if not pending.any(): break
+        numbers = numbers.fillna(text[pending].str.extract(regex, expand=False))
+    # Grupa [\w/.-]+ nie zawiera białych znaków, więc strip() z wersji dla jednego tytułu jest tu zbędny
+    remaining = text[numbers.isna()]
+    numbers = numbers.fillna(remaining[remaining.str.fullmatch(PAYMENT_TITLE_NUMBER_REGEX)])
+    return numbers.fillna('').astype(str)
+
+
+def scan_upload(stream):
+    """Czyta przesłany plik blokami. Zwraca (skrót SHA-256, rozpoznane kodowanie) i przewija strumień na początek."""
+    sha = hashlib.sha256()
+    decoders = {encoding: codecs.getincrementaldecoder(encoding)() for encoding in CSV_ENCODINGS}
+    letters = dict.fromkeys(CSV_ENCODINGS, 0)
+    while True:
+        block = stream.read(READ_BLOCK_SIZE)
+        final = not block
+        sha.update(block)
+        for encoding in list(decoders):
+            try:
+                decoders[encoding].decode(block, final=final)
+            except UnicodeDecodeError:
+                del decoders[encoding]
+                continue
+            if not block.isascii():
+                letters[encoding] += sum(map(block.count, POLISH_LETTER_BYTES.get(encoding, [])))
+        if final:
+            break
+    stream.seek(0)
+
+    if 'utf-8' in decoders:
+        encoding = 'utf-8'
+    else:
+        # iso-8859-2 dekoduje każdy bajt, więc zawsze zostaje przynajmniej jeden kandydat
+        encoding = max(decoders, key=lambda name: (letters[name], -CSV_ENCODINGS.index(name)))
+    return sha.hexdigest(), encoding
+
+
+def read_payments(stream, encoding):
+    """Wczytuje wpłaty porcjami; zwraca DataFrame z kolumnami do wyświetlenia, RowHash i NrFaktury_z_Tytulu."""
+    chunks = []
+    seen_rows = {}
+    dropped = 0
+    reader = pd.read_csv(
+        stream, encoding=encoding, delimiter=CSV_DELIMITER, header=None, names=CSV_ORIGINAL_HEADERS,
+        usecols=CSV_USED_COLUMNS, dtype={col: str for col in CSV_USED_COLUMNS},
+        skipinitialspace=True, on_bad_lines='warn', chunksize=CSV_CHUNK_ROWS
+    )
+    with reader:
+        for chunk in reader:
+            # Kwota jako tekst: przecinek dziesiętny (CSV_DECIMAL) zamieniamy ręcznie
+            chunk['KwotaPrzelewu'] = pd.to_numeric(chunk['KwotaPrzelewu'].str.replace(CSV_DECIMAL, '.', regex=False), errors='coerce')
+            rows_before = len(chunk)
+            chunk = chunk.dropna(subset=['KwotaPrzelewu'])
+            dropped += rows_before - len(chunk)
+            chunk = chunk.assign(RowHash=payment_row_hashes(chunk, CSV_ROW_HASH_COLUMNS, seen_rows))
+            chunk = chunk[CSV_COLUMNS_TO_KEEP + ['RowHash']].rename(columns=CSV_DISPLAY_NAMES)
+            chunk['NrFaktury_z_Tytulu'] = extract_invoices_from_payment_titles(chunk['Tytuł Przelewu (Wpłata)'])
+            chunks.append(chunk)
+    if dropped: print(f"Ostrzeżenie: Usunięto {dropped} wierszy z CSV z powodu błędu kwoty.")
+    if not chunks:
+        return pd.DataFrame(columns=[CSV_DISPLAY_NAMES[col] for col in CSV_COLUMNS_TO_KEEP] + ['RowHash', 'NrFaktury_z_Tytulu'])
+    return pd.concat(chunks, ignore_index=True)
@@ -0,0 +1,67 @@
+# app/debtor_tracker/formatting.py
+"""
+Formatowanie tabel wyników modułu dłużników.
+
+Kolumny formatujemy wektorowo (operacje na całych kolumnach zamiast lambdy
+dla każdej komórki), a wiersze trafiają do makra Jinja jako krotki komórek
+razem z klasą CSS wiersza - bez DataFrame.to_html i późniejszego
+przerabiania HTML-a linia po linii.
+"""
+import numpy as np
+import pandas as pd
+
+MONEY_COLUMNS = ['KwotaPDF', 'Kwota Wpłaty', 'Różnica Kwot', 'Całkowite Zadłużenie (PLN)']
+MISSING = '-'
+_POLISH_SEPARATORS = str.maketrans({',': ' ', '.': ','})
+
+
+class ResultTable:
+    """Nagłówki i wiersze (klasa CSS, komórki) gotowe do wyrenderowania makrem render_table.
+
+    sort_keys (opcjonalnie) to klucze sortowania po stronie serwera dla kolejnych nagłówków.
+    """
+
+    def __init__(self, headers, rows, sort_keys=None):
+        self.headers = headers
+        self.rows = rows
+        self.sort_keys = sort_keys
+
+    def __bool__(self):
+        return bool(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def format_money(values):
+    """1234.5 -> '1 234,50 PLN', brak wartości -> '-' (jak dotychczasowy format f'{x:,.2f}')."""
+    numeric = pd.to_numeric(values, errors='coerce')
+    if numeric.empty:
+        return numeric.astype(object)
+    missing = numeric.isna().to_numpy()
+    # Jedno formatowanie i jedna zamiana separatorów dla całej kolumny zamiast lambdy na komórkę
+    text = '\n'.join(map('{:,.2f} PLN'.format, numeric.fillna(0).tolist())).translate(_POLISH_SEPARATORS).split('\n')
+    result = np.array(text, dtype=object)
+    result[missing] = MISSING
+    return pd.Series(result, index=numeric.index)
+
+
+def format_text(values):
+    text = values.astype(object).where(values.notna(), MISSING).astype(str)
+    return text.replace({'nan': MISSING, 'None': MISSING})
+
+
+def build_table(df, columns_to_show, rename_map, row_class_column=None, row_class='kontrahent-repeat', sort_keys=None):
+    """Zwraca ResultTable z wybranych kolumn; row_class_column (bool) nadaje wierszom klasę CSS."""
+    columns = [col for col in columns_to_show if col in df.columns and col != row_class_column]
+    headers = [rename_map.get(col, col) for col in columns]
+    if df.empty or not columns:
+        return ResultTable(headers, [], sort_keys)
+
+    formatted = [format_money(df[col]) if col in MONEY_COLUMNS else format_text(df[col]) for col in columns]
+    cells = zip(*[column.tolist() for column in formatted])
+    if row_class_column and row_class_column in df.columns:
+        classes = np.where(df[row_class_column].fillna(False).astype(bool), row_class, '').tolist()
+    else:
+        classes = [''] * len(df)
+    return ResultTable(headers, list(zip(classes, cells)), sort_keys)
@@ -0,0 +1,174 @@
+# app/debtor_tracker/matching.py
+"""
+Dopasowanie wpłat do faktur jeden-do-jednego.
+
+Zastępuje złączenie pd.merge po kwocie, które dla powtarzających się kwot
+dawało iloczyn kartezjański (N faktur x M wpłat). Kolejność reguł:
+
+1. numer faktury wyciągnięty z tytułu przelewu (pełny lub bez prefiksu typu),
+2. kwota w granicy tolerancji,
+3. wśród faktur o tej samej kwocie - najbliższa datą wystawienia do daty księgowania.
+
+Wszystkie wyszukiwania to słowniki i posortowane listy, więc czas i pamięć
+rosną liniowo z liczbą wierszy.
+"""
+import math
+from bisect import bisect_left
+import pandas as pd
+
+MATCH_BY_NUMBER = 'Numer faktury'
+MATCH_BY_AMOUNT = 'Kwota'
+
+
+class _FreeSlots:
+    """Wolne pozycje posortowanej listy; najbliższa wolna pozycja w czasie prawie stałym."""
+
+    def __init__(self, size):
+        self.size = size
+        self._right = list(range(size + 1)) # pozycja size = brak wolnej po prawej
+        self._left = list(range(size + 1))  # przesunięte o 1: pozycja 0 = brak wolnej po lewej
+
+    @staticmethod
+    def _find(parent, i):
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        while parent[i] != root:
+            parent[i], i = root, parent[i]
+        return root
+
+    def next_free(self, i):
+        """Najmniejsza wolna pozycja >= i albo None."""
+        j = self._find(self._right, i)
+        return j if j < self.size else None
+
+    def prev_free(self, i):
+        """Największa wolna pozycja <= i albo None."""
+        j = self._find(self._left, i + 1) - 1
+        return j if j >= 0 else None
+
+    def take(self, i):
+        self._right[i] = i + 1
+        self._left[i + 1] = i
+
+
+class _AmountBucket:
+    """Faktury o jednej kwocie (w groszach), posortowane po dacie wystawienia."""
+
+    def __init__(self):
+        self.entries = [] # (dzień, pozycja faktury)
+        self.days = []
+        self.slots = None
+
+    def freeze(self):
+        self.entries.sort()
+        self.days = [day for day, _ in self.entries]
+        self.slots = _FreeSlots(len(self.entries))
+
+    def nearest(self, day):
+        """Zwraca (odległość w dniach, indeks w kubełku) najbliższej wolnej faktury."""
+        if day is None:
+            first = self.slots.next_free(0)
+            return (0, first) if first is not None else None
+        pos = bisect_left(self.days, day)
+        best = None
+        for candidate in (self.slots.prev_free(pos - 1) if pos > 0 else None, self.slots.next_free(pos)):
+            if candidate is None:
+                continue
+            distance = abs(self.days[candidate] - day)
+            if best is None or (distance, candidate) < best:
+                best = (distance, candidate)
+        return best
+
+
+def _to_days(series, dayfirst=False):
+    """Daty jako numer dnia (int) albo None - porównania bez obiektów Timestamp w pętli."""
+    dates = pd.to_datetime(series, dayfirst=dayfirst, errors='coerce')
+    days = (dates - pd.Timestamp('1970-01-01')).dt.days
+    return [None if pd.isna(day) else int(day) for day in days]
+
+
+def _number_suffix(number):
+    # 'FV 12/05/2025' -> '12/05/2025' (tak numer zwykle pojawia się w tytule przelewu)
+    parts = number.split()
+    return parts[-1] if len(parts) > 1 else None
+
+
+def assign_payments(df_invoices, df_payments, tolerance):
+    """Zwraca listę krotek (pozycja faktury, pozycja wpłaty, metoda dopasowania)."""
+    invoice_numbers = df_invoices['NrFakturyPDF_Upper'].tolist()
+    invoice_cents = [int(round(amount * 100)) for amount in df_invoices['KwotaPDF'].tolist()]
+    if 'DataWystawieniaPDF' in df_invoices.columns:
+        invoice_days = _to_days(df_invoices['DataWystawieniaPDF'])
+    else:
+        invoice_days = [None] * len(df_invoices)
+
+    payment_numbers = df_payments['NrFaktury_z_Tytulu_Upper'].tolist()
+    payment_amounts = df_payments['Kwota Wpłaty'].tolist()
+    payment_days = _to_days(df_payments['Data Księgowania'], dayfirst=True)
+
+    matched_invoices = [False] * len(invoice_numbers)
+    pairs = []
+    remaining_payments = []
+
+    # --- 1. Numer faktury z tytułu wpłaty ---
+    by_number = {}
+    by_suffix = {}
+    for position, number in enumerate(invoice_numbers):
+        if not number:
+            continue
+        by_number.setdefault(number, []).append(position)
+        suffix = _number_suffix(number)
+        if suffix:
+            by_suffix.setdefault(suffix, []).append(position)
+
+    for position, number in enumerate(payment_numbers):
+        amount = payment_amounts[position]
+        if not (amount > 0):
+            continue
+        invoice_position = None
+        if number:
+            for candidates in (by_number.get(number), by_suffix.get(number)):
+                invoice_position = next((c for c in candidates or () if not matched_invoices[c]), None)
+                if invoice_position is not None:
+                    break
+        if invoice_position is None:
+            remaining_payments.append(position)
+            continue
+        matched_invoices[invoice_position] = True
+        pairs.append((invoice_position, position, MATCH_BY_NUMBER))
+
+    # --- 2. i 3. Kwota w tolerancji, potem najbliższa data ---
+    buckets = {}
+    for position, cents in enumerate(invoice_cents):
+        if not matched_invoices[position]:
+            buckets.setdefault(cents, _AmountBucket()).entries.append((invoice_days[position] if invoice_days[position] is not None else -1, position))
+    for bucket in buckets.values():
+        bucket.freeze()
+
+    # Okno kubełków w groszach: różnica kwot musi być ściśle mniejsza niż tolerancja
+    window = max(0, math.ceil(round(tolerance * 100, 6)) - 1)
+    remaining_payments.sort(key=lambda p: (payment_days[p] is None, payment_days[p] or 0, p))
+    for position in remaining_payments:
+        amount = payment_amounts[position]
+        cents = int(round(amount * 100))
+        best = None
+        for key in range(cents - window, cents + window + 1):
+            bucket = buckets.get(key)
+            if bucket is None:
+                continue
+            found = bucket.nearest(payment_days[position])
+            if found is None:
+                continue
+            distance, index = found
+            candidate = (distance, abs(key - cents), bucket.entries[index][1], bucket, index)
+            if best is None or candidate[:3] < best[:3]:
+                best = candidate
+        if best is None:
+            continue
+        _, _, invoice_position, bucket, index = best
+        bucket.slots.take(index)
+        matched_invoices[invoice_position] = True
+        pairs.append((invoice_position, position, MATCH_BY_AMOUNT))
+
+    return pairs
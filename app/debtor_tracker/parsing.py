@@ -0,0 +1,108 @@
+# app/debtor_tracker/parsing.py
+"""
+Parsowanie rejestrów faktur (PDF) dla modułu dłużników.
+
+Najdroższy jest układ stron w pdfplumber, dlatego tekst wyciągamy równolegle
+w puli procesów: każdy plik to osobne zadanie, a duże pliki dzielimy na
+zakresy stron. Wyniki składamy w kolejności (plik, strona), więc tekst
+i wynik parsowania są identyczne jak przy odczycie sekwencyjnym.
+"""
+import io
+import re
+import pandas as pd
+import pdfplumber
+from app.jobs import job_runner
+
+# --- Konfiguracja PDF (Faktury) ---
+PDF_ROW_PATTERN = re.compile(
+    r"^\s*\d+\.\s+"                 # 1. Numer porządkowy
+    r"([A-Z]+\s+[\w/.-]+)\s+"      # (1) Typ+Numer dokumentu
+    r"(?:[A-Z0-9]+)\s+"               # (IGNOROWANE) Numer zamówienia
+    r"(.+?)\s+"                       # (2) Kontrahent
+    r"(\d{4}-\d{2}-\d{2})\s+"      # (3) Data wystawienia
+    r"(\d{4}-\d{2}-\d{2})\s+"      # (4) Termin zapłaty
+    r"([\d\s.,]+?)\s+PLN\s+"         # (5) Wartość netto
+    r"([\d\s.,]+?)\s+PLN"            # (6) Wartość brutto
+    r"\s*$",
+    re.MULTILINE | re.IGNORECASE
+)
+
+# Pliki dłuższe niż tyle stron dzielimy na kilka zadań
+PAGES_PER_TASK = 25
+
+
+def extract_pages_text(pdf_bytes, first_page, last_page):
+    """Zwraca tekst stron [first_page, last_page) pliku PDF (uruchamiane w puli procesów)."""
+    texts = []
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        for page in pdf.pages[first_page:last_page]:
+            page_text = page.extract_text(x_tolerance=2, y_tolerance=2)
+            if page_text:
+                texts.append(page_text + "\n")
+    return "".join(texts)
+
+
+def parse_invoice_text(full_text):
+    """Wyciąga faktury (Nr, Kwota Brutto, Kontrahent) z tekstu rejestru i odfiltrowuje 'PA'."""
+    invoices_data = []
+    print("  -> Rozpoczynanie parsowania tekstu PDF (wzorzec wiersza)...")
+    count = 0
+    parsed_count = 0
+    for match in PDF_ROW_PATTERN.finditer(full_text):
+        count += 1
+        try:
+            invoice_number = match.group(1).strip()
+            if invoice_number.startswith('PA '): continue # Filtruj PA
+            kontrahent = match.group(2).strip()
+            brutto_str = match.group(6).strip()
+            amount_str_normalized = brutto_str.replace(' ', '').replace(',', '.')
+            amount = round(float(amount_str_normalized), 2)
+            invoices_data.append({
+                'NrFakturyPDF': invoice_number, 'KontrahentPDF': kontrahent, 'KwotaPDF': amount,
+                'DataWystawieniaPDF': match.group(3)
+            })
+            parsed_count += 1
+        except (ValueError, IndexError) as e:
+            print(f"    Ostrzeżenie podczas parsowania wiersza PDF ({e}): Nr='{match.group(1).strip() if match.group(1) else '?'}' KwotaStr='{match.group(6).strip() if match.group(6) else '?'}'")
+
+    print(f"  -> Zakończono parsowanie. Znaleziono {count} wierszy pasujących. Sparowano poprawnie {parsed_count} faktur (poza PA).")
+    return pd.DataFrame(invoices_data)
+
+
+def parse_pdf_files(files):
+    """Parsuje wiele rejestrów równolegle.
+
+    files: lista krotek (nazwa pliku, bajty). Zwraca listę krotek
+    (nazwa pliku, DataFrame, wyjątek lub None) w kolejności wejścia.
+    """
+    errors = {}
+    tasks = []
+    for index, (filename, data) in enumerate(files):
+        try:
+            with pdfplumber.open(io.BytesIO(data)) as pdf:
+                page_count = len(pdf.pages)
+        except Exception as e:
+            errors[index] = e
+            continue
+        for first_page in range(0, page_count, PAGES_PER_TASK):
+            tasks.append((index, first_page, min(first_page + PAGES_PER_TASK, page_count)))
+
+    texts = job_runner.map_in_process(
+        extract_pages_text, [(files[index][1], first, last) for index, first, last in tasks]
+    )
+
+    parts_by_file = {}
+    for (index, _, _), text in zip(tasks, texts):
+        if isinstance(text, Exception):
+            errors.setdefault(index, text)
+        else:
+            parts_by_file.setdefault(index, []).append(text)
+
+    results = []
+    for index, (filename, _) in enumerate(files):
+        if index in errors:
+            results.append((filename, pd.DataFrame(), errors[index]))
+            continue
+        print(f"\nParsowanie tekstu PDF: {filename}")
+        results.append((filename, parse_invoice_text("".join(parts_by_file.get(index, []))), None))
+    return results
@@ -0,0 +1,151 @@
+# app/debtor_tracker/results.py
+"""
+Zapisany wynik uzgodnienia (wiersze sekcji opłacone / nieopłacone / inne wpłaty).
+
+Po przetworzeniu plików wiersze trafiają do tabeli debtor_result_rows, a strona
+wyników pokazuje tylko pierwszą stronę każdej sekcji. Kolejne strony, sortowanie
+i filtrowanie (status, kontrahent) obsługuje endpoint JSON zapytaniami SQL.
+"""
+import math
+import pandas as pd
+from sqlalchemy import insert, func
+from app.models import db, DebtorRun, DebtorResultRow
+from app.debtor_tracker.formatting import build_table
+
+SECTION_PAID = 'paid'
+SECTION_UNPAID = 'unpaid'
+SECTION_OTHER = 'other'
+
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 500
+
+# Kolumna modelu -> nazwa kolumny w DataFrame porównania
+RESULT_COLUMNS = {
+    'invoice_number': 'NrFakturyPDF',
+    'contractor': 'KontrahentPDF',
+    'invoice_amount': 'KwotaPDF',
+    'status': 'Status',
+    'payment_amount': 'Kwota Wpłaty',
+    'amount_difference': 'Różnica Kwot',
+    'title_invoice_number': 'NrFaktury_z_Tytulu',
+    'booking_date': 'Data Księgowania',
+    'payment_title': 'Tytuł Przelewu (Wpłata)',
+    'sender': 'Od Kogo (Wpłata)',
+    'repeat_contractor': 'Repeat_Kontrahent',
+}
+
+SECTION_COLUMNS = {
+    SECTION_PAID: ['invoice_number', 'contractor', 'invoice_amount', 'status', 'payment_amount', 'amount_difference', 'title_invoice_number', 'booking_date'],
+    SECTION_UNPAID: ['invoice_number', 'invoice_amount', 'contractor', 'status'],
+    SECTION_OTHER: ['payment_amount', 'title_invoice_number', 'booking_date', 'payment_title', 'sender'],
+}
+
+COLUMN_LABELS = {
+    'NrFakturyPDF': 'Numer Faktury (PDF)', 'KontrahentPDF': 'Kontrahent (PDF)',
+    'KwotaPDF': 'Kwota (PDF)', 'Kwota Wpłaty': 'Kwota (Wpłata)',
+    'NrFaktury_z_Tytulu': 'Nr Faktury (Tytuł Wpłaty)'
+}
+
+# Klucz sortowania z żądania -> kolumna; 'position' to domyślna kolejność z przetwarzania
+SORT_COLUMNS = {
+    'position': DebtorResultRow.position,
+    'invoice_number': DebtorResultRow.invoice_number,
+    'contractor': DebtorResultRow.contractor,
+    'invoice_amount': DebtorResultRow.invoice_amount,
+    'status': DebtorResultRow.status,
+    'payment_amount': DebtorResultRow.payment_amount,
+    'amount_difference': DebtorResultRow.amount_difference,
+    'title_invoice_number': DebtorResultRow.title_invoice_number,
+    'booking_date': DebtorResultRow.booking_day,
+    'payment_title': DebtorResultRow.payment_title,
+    'sender': DebtorResultRow.sender,
+}
+
+
+def save_result_rows(run, sections):
+    """Zapisuje wiersze sekcji (słownik sekcja -> DataFrame w kolejności wyświetlania)."""
+    rows = []
+    for section, df in sections.items():
+        if df.empty:
+            continue
+        frame = pd.DataFrame({
+            attr: df[col] if col in df.columns else None for attr, col in RESULT_COLUMNS.items()
+        }, index=df.index)
+        frame['repeat_contractor'] = frame['repeat_contractor'].fillna(False).astype(bool)
+        booking_days = pd.to_datetime(frame['booking_date'], dayfirst=True, errors='coerce')
+        frame['booking_day'] = booking_days.dt.date
+        frame['run_id'] = run.id
+        frame['section'] = section
+        frame['position'] = range(len(frame))
+        frame = frame.astype(object).where(frame.notna(), None)
+        rows.extend(frame.to_dict('records'))
+    if rows:
+        db.session.execute(insert(DebtorResultRow.__table__), rows)
+    return len(rows)
+
+
+def prune_old_results(keep_runs):
+    """Usuwa zapisane wiersze wyników starszych uruchomień (same uruchomienia i dopasowania zostają)."""
+    kept_ids = [run_id for (run_id,) in db.session.query(DebtorRun.id).order_by(DebtorRun.id.desc()).limit(keep_runs)]
+    if kept_ids:
+        DebtorResultRow.query.filter(DebtorResultRow.run_id < min(kept_ids)).delete(synchronize_session=False)
+
+
+def results_pruned(run, keep_runs):
+    """Czy wiersze wyników uruchomienia usunęło już prune_old_results (jest co najmniej keep_runs nowszych)."""
+    return DebtorRun.query.filter(DebtorRun.id > run.id).count() >= keep_runs
+
+
+def section_sums(run_id):
+    """Suma kwot faktur w sekcjach opłaconych i nieopłaconych."""
+    sums = dict(db.session.query(DebtorResultRow.section, func.coalesce(func.sum(DebtorResultRow.invoice_amount), 0)).filter(
+        DebtorResultRow.run_id == run_id, DebtorResultRow.section.in_([SECTION_PAID, SECTION_UNPAID])
+    ).group_by(DebtorResultRow.section).all())
+    return sums.get(SECTION_PAID, 0.0), sums.get(SECTION_UNPAID, 0.0)
+
+
+def section_statuses(run_id, section):
+    """Statusy występujące w sekcji - opcje filtra."""
+    return [status for (status,) in db.session.query(DebtorResultRow.status).filter_by(
+        run_id=run_id, section=section
+    ).distinct().order_by(DebtorResultRow.status)]
+
+
+def query_section_page(run_id, section, page=1, per_page=DEFAULT_PER_PAGE, sort='position', order='asc', status=None, contractor=None):
+    """Zwraca (ResultTable, liczba wierszy po filtrach, numer strony, liczba stron)."""
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    query = DebtorResultRow.query.filter_by(run_id=run_id, section=section)
+    if status:
+        query = query.filter(DebtorResultRow.status == status)
+    if contractor:
+        # W innych wpłatach nie ma kontrahenta z PDF - szukamy po nadawcy przelewu
+        column = DebtorResultRow.sender if section == SECTION_OTHER else DebtorResultRow.contractor
+        query = query.filter(column.ilike(f'%{contractor}%'))
+
+    total = query.count()
+    pages = max(1, math.ceil(total / per_page))
+    page = max(1, min(page, pages))
+
+    sort_column = SORT_COLUMNS.get(sort, DebtorResultRow.position)
+    ordering = sort_column.desc() if order == 'desc' else sort_column.asc()
+    result_rows = query.order_by(ordering, DebtorResultRow.position).offset((page - 1) * per_page).limit(per_page).all()
+
+    attrs = SECTION_COLUMNS[section]
+    columns = [RESULT_COLUMNS[attr] for attr in attrs]
+    df = pd.DataFrame(
+        [[getattr(row, attr) for attr in attrs] + [row.repeat_contractor] for row in result_rows],
+        columns=columns + ['Repeat_Kontrahent']
+    )
+    row_class_column = 'Repeat_Kontrahent' if section == SECTION_UNPAID else None
+    table = build_table(df, columns, COLUMN_LABELS, row_class_column=row_class_column, sort_keys=attrs)
+    return table, total, page, pages
+
+
+def debtor_summary(run_id):
+    """Podsumowanie zadłużenia kontrahentów liczone w SQL z sekcji nieopłaconych."""
+    total_debt = func.sum(DebtorResultRow.invoice_amount)
+    rows = db.session.query(DebtorResultRow.contractor, total_debt, func.count(DebtorResultRow.id)).filter(
+        DebtorResultRow.run_id == run_id, DebtorResultRow.section == SECTION_UNPAID
+    ).group_by(DebtorResultRow.contractor).order_by(total_debt.desc()).all()
+    df = pd.DataFrame(rows, columns=['Kontrahent', 'Całkowite Zadłużenie (PLN)', 'Liczba Nieopłaconych Faktur'])
+    return build_table(df, list(df.columns), {})
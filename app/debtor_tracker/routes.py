@@ -1,51 +1,28 @@
 import os
 import pandas as pd
 from flask import (
-    Blueprint, render_template, request, redirect, url_for, flash, current_app
+    Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify, abort
 )
 from flask_login import login_required, current_user
 from app.decorators import permission_required
 from app.utils import log_activity
-import io
-import re
-import pdfplumber
 import numpy as np
+from app.debtor_tracker.parsing import parse_pdf_files
+from app.debtor_tracker.matching import MATCH_BY_NUMBER
+from app.debtor_tracker.results import (
+    SECTION_PAID, SECTION_UNPAID, SECTION_OTHER, DEFAULT_PER_PAGE, save_result_rows, prune_old_results, results_pruned,
+    section_sums, section_statuses, query_section_page, debtor_summary
+)
+from app.debtor_tracker.bank_csv import scan_upload, read_payments
+from app.debtor_tracker.store import (
+    file_sha256, find_file, register_file, max_payment_id,
+    save_invoices, save_payments, match_pending, reset_run_matches, load_comparison
+)
+from app.models import db, DebtorRun, DebtorInvoice
 
 # --- UTWORZENIE MODUŁU (BLUEPRINT) ---
 bp = Blueprint('debtor_tracker', __name__, template_folder='templates', url_prefix='/debtor_tracker')
 
-# --- Konfiguracja CSV (Wpłaty) ---
-# (Ta sekcja pozostaje bez zmian - kopiujemy ją z Twojego app.py)
-CSV_ORIGINAL_HEADERS = [
-    "DataKsiegowania", "DataWaluty", "TytulPrzelewu", "NadawcaInfo",
-    "NrKontaNadawcy", "KwotaPrzelewu", "SaldoPoOperacji", "IDTransakcji",
-    "_PustaKolumna"
-]
-CSV_COLUMNS_TO_KEEP = ["DataKsiegowania", "DataWaluty", "TytulPrzelewu", "NadawcaInfo", "KwotaPrzelewu"]
-CSV_DISPLAY_NAMES = {
-    "DataKsiegowania": "Data Księgowania", "DataWaluty": "Data Waluty",
-    "TytulPrzelewu": "Tytuł Przelewu (Wpłata)", "NadawcaInfo": "Od Kogo (Wpłata)",
-    "KwotaPrzelewu": "Kwota Wpłaty"
-}
-CSV_DELIMITER = ','
-CSV_ENCODING = 'utf-8' # lub 'cp1250', 'iso-8859-2'
-CSV_DECIMAL = ','
-
-# --- Konfiguracja PDF (Faktury) ---
-# (Ta sekcja pozostaje bez zmian - kopiujemy ją z Twojego app.py)
-PDF_ROW_PATTERN = re.compile(
-    r"^\s*\d+\.\s+"                 # 1. Numer porządkowy
-    r"([A-Z]+\s+[\w/.-]+)\s+"      # (1) Typ+Numer dokumentu
-    r"(?:[A-Z0-9]+)\s+"               # (IGNOROWANE) Numer zamówienia
-    r"(.+?)\s+"                       # (2) Kontrahent
-    r"(\d{4}-\d{2}-\d{2})\s+"      # (3) Data wystawienia
-    r"(\d{4}-\d{2}-\d{2})\s+"      # (4) Termin zapłaty
-    r"([\d\s.,]+?)\s+PLN\s+"         # (5) Wartość netto
-    r"([\d\s.,]+?)\s+PLN"            # (6) Wartość brutto
-    r"\s*$",
-    re.MULTILINE | re.IGNORECASE
-)
-
 # --- Konfiguracja Ogólna ---
 # (Ta sekcja pozostaje bez zmian - kopiujemy ją z Twojego app.py)
 ALLOWED_EXTENSIONS = {'csv', 'pdf'}
@@ -58,63 +35,6 @@ def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def extract_invoice_from_payment_title(title):
-    """Próbuje wyciągnąć numer faktury z tytułu WPŁATY (z CSV)."""
-    if not isinstance(title, str): return ""
-    patterns = [
-        r'(?:FV|PA|FAK|Faktura|Zamówienie|Zam)\s*(?:nr\.?|numer)?\s*([\w/.-]+)',
-        r'REF:\s*([\w/.-]+)',
-    ]
-    for pattern in patterns:
-        match = re.search(pattern, title, re.IGNORECASE)
-        if match: return match.group(1).strip()
-    if re.fullmatch(r'[A-Z0-9/.-]+', title) and len(title) > 4 and ' ' not in title:
-         return title
-    return ""
-
-def parse_pdf_invoices(pdf_stream):
-    """Próbuje wyciągnąć dane faktur (Nr, Kwota Brutto, Kontrahent) z PDF i odfiltrowuje 'PA'."""
-    invoices_data = []
-    try:
-        with pdfplumber.open(pdf_stream) as pdf:
-            full_text = ""
-            for i, page in enumerate(pdf.pages):
-                page_text = page.extract_text(x_tolerance=2, y_tolerance=2)
-                if page_text:
-                    full_text += page_text + "\n"
-                # else: print(f"Ostrzeżenie: Strona {i+1} PDF nie zawierała tekstu.")
-
-            print("  -> Rozpoczynanie parsowania tekstu PDF (wzorzec wiersza)...")
-            matches = PDF_ROW_PATTERN.finditer(full_text)
-            count = 0
-            parsed_count = 0
-            for match in matches:
-                count += 1
-                try:
-                    invoice_number = match.group(1).strip()
-                    if invoice_number.startswith('PA '): continue # Filtruj PA
-                    kontrahent = match.group(2).strip()
-                    brutto_str = match.group(6).strip()
-                    amount_str_normalized = brutto_str.replace(' ', '').replace(',', '.')
-                    amount = round(float(amount_str_normalized), 2)
-                    invoices_data.append({
-                        'NrFakturyPDF': invoice_number, 'KontrahentPDF': kontrahent, 'KwotaPDF': amount
-                    })
-                    parsed_count += 1
-                except (ValueError, IndexError) as e:
-                    print(f"    Ostrzeżenie podczas parsowania wiersza PDF ({e}): Nr='{match.group(1).strip() if match.group(1) else '?'}' KwotaStr='{match.group(6).strip() if match.group(6) else '?'}'")
-
-            print(f"  -> Zakończono parsowanie. Znaleziono {count} wierszy pasujących. Sparowano poprawnie {parsed_count} faktur (poza PA).")
-
-            df_temp = pd.DataFrame(invoices_data)
-
-    except Exception as pdf_err:
-         print(f"  Krytyczny błąd podczas przetwarzania PDF: {pdf_err}")
-         import traceback; traceback.print_exc()
-         return pd.DataFrame()
-
-    return df_temp
-
 # --- GŁÓWNE TRASY MODUŁU (ZABEZPIECZONE) ---
 
 @bp.route('/', methods=['GET'])
@@ -149,124 +69,99 @@ def process_files():
         flash('Proszę wybrać przynajmniej jeden plik PDF!', 'warning')
         return redirect(url_for('.index')) # ZMIANA: .index
 
-    df_payments = pd.DataFrame()
-    all_invoices_dfs = []
     processed_pdf_filenames = []
 
     # --- Odczyt CSV ---
-    try:
-        print(f"Rozpoczynanie odczytu CSV: {csv_file.filename}")
-        stream_csv = io.StringIO(csv_file.stream.read().decode(CSV_ENCODING), newline=None)
-        df_payments = pd.read_csv(
-            stream_csv, delimiter=CSV_DELIMITER, header=None, names=CSV_ORIGINAL_HEADERS,
-            decimal=CSV_DECIMAL, skipinitialspace=True, on_bad_lines='warn'
-        )
-        df_payments['KwotaPrzelewu'] = pd.to_numeric(df_payments['KwotaPrzelewu'], errors='coerce')
-        rows_before = len(df_payments)
-        df_payments.dropna(subset=['KwotaPrzelewu'], inplace=True)
-        rows_after = len(df_payments)
-        if rows_before > rows_after: print(f"Ostrzeżenie: Usunięto {rows_before - rows_after} wierszy z CSV z powodu błędu kwoty.")
-        df_payments = df_payments[CSV_COLUMNS_TO_KEEP].copy()
-        df_payments = df_payments.rename(columns=CSV_DISPLAY_NAMES)
-        df_payments['NrFaktury_z_Tytulu'] = df_payments['Tytuł Przelewu (Wpłata)'].apply(extract_invoice_from_payment_title)
-        print(f"Wczytano {len(df_payments)} poprawnych wpłat z CSV.")
-    except Exception as e:
-        flash(f"Błąd podczas odczytu pliku CSV '{csv_file.filename}': {e}", 'error')
-        import traceback; traceback.print_exc()
-        return redirect(url_for('.index')) # ZMIANA: .index
+    # Skrót i kodowanie liczymy czytając plik blokami; plik o znanym skrócie był już
+    # zapisany w bazie - nie parsujemy go ponownie
+    csv_hash, csv_encoding = scan_upload(csv_file.stream)
+    csv_record = find_file(csv_hash)
+    df_payments = None
+    if csv_record is None:
+        try:
+            print(f"Rozpoczynanie odczytu CSV: {csv_file.filename} (kodowanie: {csv_encoding})")
+            df_payments = read_payments(csv_file.stream, csv_encoding)
+            print(f"Wczytano {len(df_payments)} poprawnych wpłat z CSV.")
+        except Exception as e:
+            flash(f"Błąd podczas odczytu pliku CSV '{csv_file.filename}': {e}", 'error')
+            import traceback; traceback.print_exc()
+            return redirect(url_for('.index')) # ZMIANA: .index
+    else:
+        print(f"Plik CSV {csv_file.filename} był już przetworzony - pomijam parsowanie.")
 
     # --- Odczyt wielu PDFów ---
-    # (Ta sekcja pozostaje bez zmian - kopiujemy ją z Twojego app.py)
+    # Tekst plików wyciągany jest równolegle w puli procesów (per plik i per zakres stron)
+    pdf_inputs = []
+    known_pdf_records = []
+    seen_hashes = set()
     for pdf_file_storage in pdf_files:
         if pdf_file_storage and allowed_file(pdf_file_storage.filename):
-            filename = pdf_file_storage.filename
-            print(f"\nRozpoczynanie przetwarzania PDF: {filename}")
-            try:
-                df_single_pdf = parse_pdf_invoices(pdf_file_storage.stream)
-                if not df_single_pdf.empty:
-                    df_single_pdf['KwotaPDF'] = pd.to_numeric(df_single_pdf['KwotaPDF'], errors='coerce')
-                    df_single_pdf.dropna(subset=['KwotaPDF'], inplace=True)
-                    if not df_single_pdf.empty:
-                        all_invoices_dfs.append(df_single_pdf)
-                        processed_pdf_filenames.append(filename)
-                        print(f"-> Przetworzono {len(df_single_pdf)} faktur (poza PA) z pliku {filename}.")
-            except Exception as e:
-                flash(f"Wystąpił błąd podczas przetwarzania pliku PDF '{filename}': {e}. Pomijanie.", 'warning')
-                print(f"Błąd przetwarzania PDF {filename}: {e}")
-                import traceback; traceback.print_exc()
+            data = pdf_file_storage.read()
+            sha = file_sha256(data)
+            if sha in seen_hashes: continue
+            seen_hashes.add(sha)
+            record = find_file(sha)
+            if record is not None:
+                known_pdf_records.append(record)
+                processed_pdf_filenames.append(pdf_file_storage.filename)
+                print(f"Plik PDF {pdf_file_storage.filename} był już przetworzony - pomijam parsowanie.")
+            else:
+                pdf_inputs.append((pdf_file_storage.filename, data, sha))
         else:
              flash(f'Pominięto plik "{pdf_file_storage.filename}" - nieprawidłowy typ.', 'warning')
 
-    # --- Agregacja danych PDF ---
-    # (Ta sekcja pozostaje bez zmian - kopiujemy ją z Twojego app.py)
-    if not all_invoices_dfs:
-        df_invoices = pd.DataFrame(columns=['NrFakturyPDF', 'KontrahentPDF', 'KwotaPDF'])
-        print("Nie udało się przetworzyć żadnych danych z plików PDF.")
-    else:
-        df_invoices = pd.concat(all_invoices_dfs, ignore_index=True)
-        print(f"\nPołączono dane z {len(processed_pdf_filenames)} plików PDF. Łącznie {len(df_invoices)} faktur (poza PA).")
-        if 'NrFakturyPDF' in df_invoices.columns:
-            invoices_before_dedup = len(df_invoices)
-            df_invoices['NrFakturyPDF'] = df_invoices['NrFakturyPDF'].astype(str)
-            df_invoices = df_invoices.drop_duplicates(subset=['NrFakturyPDF'], keep='first')
-            invoices_after_dedup = len(df_invoices)
-            if invoices_before_dedup > invoices_after_dedup:
-                print(f"Usunięto {invoices_before_dedup - invoices_after_dedup} zduplikowanych faktur (wg numeru).")
-
-    # --- Porównanie Danych ---
-    # (Ta sekcja pozostaje bez zmian - kopiujemy ją z Twojego app.py)
-    if df_payments.empty and df_invoices.empty:
-         flash("Brak poprawnych danych w obu plikach.", "warning")
-         return redirect(url_for('.index')) # ZMIANA: .index
-
-    # Przygotuj kolumny nawet jeśli jedna ramka jest pusta
-    if not df_payments.empty:
-        df_payments['Kwota_MergeKey'] = df_payments['Kwota Wpłaty'].round(2)
-        df_payments = df_payments.reset_index(drop=True)
-        df_payments['NrFaktury_z_Tytulu_Upper'] = df_payments['NrFaktury_z_Tytulu'].astype(str).str.strip().str.upper()
-    else:
-        df_payments = pd.DataFrame(columns=list(CSV_DISPLAY_NAMES.values()) + ['NrFaktury_z_Tytulu', 'Kwota_MergeKey', 'Payment_ID', 'NrFaktury_z_Tytulu_Upper'])
-
-    if not df_invoices.empty:
-        df_invoices['Kwota_MergeKey'] = df_invoices['KwotaPDF'].round(2)
-        df_invoices = df_invoices.reset_index(drop=True)
-        df_invoices['NrFakturyPDF_Upper'] = df_invoices['NrFakturyPDF'].astype(str).str.strip().str.upper()
-        if 'KontrahentPDF' not in df_invoices.columns: df_invoices['KontrahentPDF'] = '-'
-        df_invoices['KontrahentPDF'] = df_invoices['KontrahentPDF'].fillna('-')
-    else:
-        df_invoices = pd.DataFrame(columns=['NrFakturyPDF', 'KontrahentPDF', 'KwotaPDF', 'Kwota_MergeKey', 'Invoice_ID', 'NrFakturyPDF_Upper'])
-
-    # (Cała reszta logiki porównania, analizy statusu, podziału na sekcje,
-    # obliczania sum, oznaczania powtarzających się kontrahentów,
-    # sortowania i podsumowania dłużników pozostaje bez zmian.
-    # Kopiujemy ją 1:1 z Twojego app.py, aż do `return render_template`)
-    
-    # ... (logika od try: print("--- Rozpoczynanie...") ... do html_debtor_summary = ...)
+    print(f"\nRozpoczynanie przetwarzania {len(pdf_inputs)} plików PDF")
+    parsed_pdfs = []
+    parse_results = parse_pdf_files([(filename, data) for filename, data, _ in pdf_inputs])
+    for (filename, df_single_pdf, error), (_, _, sha) in zip(parse_results, pdf_inputs):
+        if error is not None:
+            flash(f"Wystąpił błąd podczas przetwarzania pliku PDF '{filename}': {error}. Pomijanie.", 'warning')
+            print(f"Błąd przetwarzania PDF {filename}: {error}")
+            continue
+        if not df_single_pdf.empty:
+            df_single_pdf['KwotaPDF'] = pd.to_numeric(df_single_pdf['KwotaPDF'], errors='coerce')
+            df_single_pdf.dropna(subset=['KwotaPDF'], inplace=True)
+            if not df_single_pdf.empty:
+                df_single_pdf['NrFakturyPDF'] = df_single_pdf['NrFakturyPDF'].astype(str)
+                df_single_pdf['NrFakturyPDF_Upper'] = df_single_pdf['NrFakturyPDF'].str.strip().str.upper()
+                df_single_pdf['KontrahentPDF'] = df_single_pdf['KontrahentPDF'].fillna('-')
+                parsed_pdfs.append((filename, sha, df_single_pdf))
+                processed_pdf_filenames.append(filename)
+                print(f"-> Przetworzono {len(df_single_pdf)} faktur (poza PA) z pliku {filename}.")
+
+    # --- Zapis do bazy i dopasowanie nowych pozycji ---
+    try:
+        run = DebtorRun(user_id=current_user.id, csv_filename=csv_file.filename,
+                        new_invoices=0, new_payments=0, new_matches=0)
+        min_new_payment_id = max_payment_id()
+        if csv_record is None:
+            csv_record = register_file('csv', csv_file.filename, csv_hash, len(df_payments))
+            run.new_payments = save_payments(csv_record, df_payments)
+        pdf_records = list(known_pdf_records)
+        for filename, sha, df_single_pdf in parsed_pdfs:
+            pdf_record = register_file('pdf', filename, sha, len(df_single_pdf))
+            run.new_invoices += save_invoices(pdf_record, df_single_pdf)
+            pdf_records.append(pdf_record)
+        run.files = [csv_record] + pdf_records
+        run.pdf_filenames = ", ".join(processed_pdf_filenames)
+        db.session.add(run)
+        db.session.flush()
+        run.new_matches = match_pending(AMOUNT_TOLERANCE, run.new_invoices > 0, min_new_payment_id, run)
+        db.session.commit()
+        print(f"Zapisano uruchomienie #{run.id}: nowe faktury {run.new_invoices}, nowe wpłaty {run.new_payments}, nowe dopasowania {run.new_matches}.")
+    except Exception as e:
+        db.session.rollback()
+        flash(f"Błąd podczas zapisu wyników uzgodnienia: {e}", 'error')
+        import traceback; traceback.print_exc()
+        return redirect(url_for('.index'))
 
     try:
-        print("\n--- Rozpoczynanie porównywania (łączenie po kwocie) ---")
-        comparison_df = pd.DataFrame()
-        if df_invoices.empty and df_payments.empty:
-             flash("Brak danych do porównania.", "warning")
+        print("\n--- Wczytywanie tabeli porównawczej z bazy ---")
+        comparison_df = load_comparison([f.id for f in run.files])
+        if comparison_df.empty:
+             flash("Brak poprawnych danych w obu plikach.", "warning")
              return redirect(url_for('.index')) # ZMIANA: .index
-        elif df_invoices.empty:
-             comparison_df = df_payments.copy()
-             comparison_df['Status'] = 'Wpłata bez faktury (?)'
-             print("Brak faktur z PDF, pokazuję tylko płatności.")
-             for col in ['NrFakturyPDF', 'KontrahentPDF', 'KwotaPDF', 'NrFakturyPDF_Upper', 'Invoice_ID', 'Weryfikacja Nr Faktury', 'Różnica Kwot']:
-                 if col not in comparison_df.columns: comparison_df[col] = np.nan if col == 'Różnica Kwot' else ('-' if 'Nr' in col or 'Kontra' in col else 0)
-        elif df_payments.empty:
-             comparison_df = df_invoices.copy()
-             comparison_df['Status'] = 'NIEOPŁACONA'
-             print("Brak płatności z CSV, pokazuję tylko faktury (poza PA).")
-             for col in list(CSV_DISPLAY_NAMES.values()) + ['NrFaktury_z_Tytulu', 'Payment_ID', 'NrFaktury_z_Tytulu_Upper', 'Weryfikacja Nr Faktury', 'Różnica Kwot']:
-                 if col not in comparison_df.columns: comparison_df[col] = np.nan if col == 'Różnica Kwot' else ('-' if 'Nr' in col or 'Tytuł' in col or 'Od Kogo' in col else 0)
-        else:
-            comparison_df = pd.merge(
-                df_invoices, df_payments, on='Kwota_MergeKey', how='outer', suffixes=('_Faktura', '_Wplata')
-            )
-            comparison_df = comparison_df.drop(columns=['Kwota_MergeKey'])
-            print(f"Połączono dane. Rozmiar tabeli porównawczej: {comparison_df.shape}")
+        print(f"Rozmiar tabeli porównawczej: {comparison_df.shape}")
 
         # --- Analiza statusu płatności ---
         kwota_wplaty_col = 'Kwota Wpłaty'
@@ -308,10 +203,12 @@ def process_files():
             'BŁĘDNA KWOTA', comparison_df['Status']
         )
 
+        if 'Dopasowanie' not in comparison_df.columns: comparison_df['Dopasowanie'] = '-'
         comparison_df['Weryfikacja Nr Faktury'] = np.where(
              (comparison_df['Status'].isin(['OPŁACONA', 'BŁĘDNA KWOTA'])) & \
-             (comparison_df[nr_faktury_pdf_upper_col] == comparison_df[nr_faktury_tytul_upper_col]) & \
-             (comparison_df[nr_faktury_pdf_upper_col] != ''), 'OK',
+             (((comparison_df[nr_faktury_pdf_upper_col] == comparison_df[nr_faktury_tytul_upper_col]) & \
+               (comparison_df[nr_faktury_pdf_upper_col] != '')) | \
+              (comparison_df['Dopasowanie'] == MATCH_BY_NUMBER)), 'OK',
              np.where((comparison_df['Status'].isin(['OPŁACONA', 'BŁĘDNA KWOTA'])), 'Sprawdź Nr', '-')
         )
 
@@ -320,18 +217,6 @@ def process_files():
         df_unpaid = comparison_df[comparison_df['Status'] == 'NIEOPŁACONA'].copy()
         df_other_payments = comparison_df[comparison_df['Status'] == 'Wpłata bez faktury (?)'].copy()
 
-        # --- Obliczanie sum ---
-        sum_paid_val = 0.0
-        sum_unpaid_val = 0.0
-        if not df_paid.empty and kwota_pdf_col in df_paid.columns:
-            sum_paid_val = pd.to_numeric(df_paid[kwota_pdf_col], errors='coerce').sum()
-        if not df_unpaid.empty and kwota_pdf_col in df_unpaid.columns:
-            sum_unpaid_val = pd.to_numeric(df_unpaid[kwota_pdf_col], errors='coerce').sum()
-        sum_paid_str = f"{sum_paid_val:.2f}".replace('.', ',')
-        sum_unpaid_str = f"{sum_unpaid_val:.2f}".replace('.', ',')
-        print(f"Suma opłaconych faktur (PDF): {sum_paid_str}")
-        print(f"Suma nieopłaconych faktur (PDF): {sum_unpaid_str}")
-
         # --- Oznaczanie powtarzających się kontrahentów w NIEOPŁACONYCH ---
         if not df_unpaid.empty and kontrahent_pdf_col in df_unpaid.columns:
             df_unpaid[kontrahent_pdf_col] = df_unpaid[kontrahent_pdf_col].fillna('-').astype(str)
@@ -383,96 +268,13 @@ def process_files():
                  print("Posortowano sekcję innych wpłat.")
         # === KONIEC SEKCJI SORTOWANIA ===
 
-        # --- NOWA SEKCJA: Podsumowanie dłużników ---
-        df_debtor_summary = pd.DataFrame()
-        if not df_unpaid.empty:
-            print("Generowanie podsumowania dłużników...")
-            try:
-                df_debtor_summary = df_unpaid.groupby('KontrahentPDF').agg(
-                    CalkowiteZadluzenie=('KwotaPDF', 'sum'),
-                    LiczbaFaktur=('NrFakturyPDF', 'count')
-                ).reset_index()
-                df_debtor_summary = df_debtor_summary.sort_values(by='CalkowiteZadluzenie', ascending=False)
-                df_debtor_summary = df_debtor_summary.rename(columns={
-                    'KontrahentPDF': 'Kontrahent',
-                    'CalkowiteZadluzenie': 'Całkowite Zadłużenie (PLN)',
-                    'LiczbaFaktur': 'Liczba Nieopłaconych Faktur'
-                })
-                print(f"Wygenerowano podsumowanie dla {len(df_debtor_summary)} dłużników.")
-            except Exception as e:
-                print(f"Błąd podczas generowania podsumowania dłużników: {e}")
-        # --- KONIEC SEKCJI PODSUMOWANIA DŁUŻNIKÓW ---
-
-
-        # --- Wybór kolumn i formatowanie dla każdej sekcji ---
-        
-        # === ZMIENIONA LINIA ===
-        paid_cols = ['NrFakturyPDF', 'KontrahentPDF', 'KwotaPDF', 'Status', 'Kwota Wpłaty', 'Różnica Kwot', 'NrFaktury_z_Tytulu', 'Data Księgowania']
-        # =======================
-        
-        unpaid_cols = ['NrFakturyPDF', 'KwotaPDF', 'KontrahentPDF', 'Status', 'Repeat_Kontrahent'] # Flaga potrzebna do HTML
-        other_cols = ['Kwota Wpłaty', 'NrFaktury_z_Tytulu', 'Data Księgowania', 'Tytuł Przelewu (Wpłata)', 'Od Kogo (Wpłata)']
-        debtor_summary_cols = ['Kontrahent', 'Całkowite Zadłużenie (PLN)', 'Liczba Nieopłaconych Faktur']
-
-        final_names_map = {
-            'NrFakturyPDF': 'Numer Faktury (PDF)', 'KontrahentPDF': 'Kontrahent (PDF)',
-            'KwotaPDF': 'Kwota (PDF)', 'Kwota Wpłaty': 'Kwota (Wpłata)',
-            'NrFaktury_z_Tytulu': 'Nr Faktury (Tytuł Wpłaty)'
-        }
-
-        def format_and_generate_html(df, columns_to_show, rename_map, add_repeat_class=False):
-            if df.empty: return ""
-            # Upewnij się, że kolumny do formatowania istnieją
-            existing_cols = [col for col in columns_to_show if col in df.columns]
-            if not existing_cols: return ""
-            
-            df_display = df[existing_cols].copy()
-
-            row_attrs = []
-            if add_repeat_class and 'Repeat_Kontrahent' in df_display.columns:
-                    row_attrs = [' class="kontrahent-repeat"' if repeat else '' for repeat in df_display['Repeat_Kontrahent']]
-                    df_display = df_display.drop(columns=['Repeat_Kontrahent'])
-
-            # Formatowanie kwot
-            money_cols = ['KwotaPDF', 'Kwota Wpłaty', 'Różnica Kwot', 'Całkowite Zadłużenie (PLN)']
-            for col in money_cols:
-                if col in df_display.columns:
-                    numeric_col = pd.to_numeric(df_display[col], errors='coerce')
-                    df_display[col] = numeric_col.apply(lambda x: f"{x:,.2f} PLN".replace(',', ' ').replace('.', ',') if pd.notna(x) else '-')
-
-            # Formatowanie reszty jako string
-            for col in df_display.columns:
-                if col not in money_cols:
-                    df_display[col] = df_display[col].astype(str).fillna('-')
-
-            df_display = df_display.rename(columns=rename_map)
-            if 'index' in df_display.columns: df_display = df_display.drop(columns=['index'])
-
-            html = df_display.to_html(classes='table table-striped table-hover table-bordered table-sm',
-                                        index=False, border=0, na_rep='-', escape=False)
-            
-            # Wstrzykiwanie atrybutów <tr> (dla podświetlania wierszy)
-            if add_repeat_class and row_attrs:
-                html_lines = html.splitlines()
-                tr_index = 0
-                output_html_lines = []
-                tbody_found = False
-                for line in html_lines:
-                    if '<tbody>' in line: tbody_found = True
-                    if '</tbody>' in line: tbody_found = False
-                    if tbody_found and line.strip().startswith('<tr>'):
-                        if tr_index < len(row_attrs):
-                            line = line.replace('<tr>', f'<tr{row_attrs[tr_index]}>', 1)
-                            tr_index += 1
-                    output_html_lines.append(line)
-                html = "\n".join(output_html_lines)
-            
-            return html
-
-        html_paid = format_and_generate_html(df_paid, paid_cols, final_names_map)
-        html_unpaid = format_and_generate_html(df_unpaid, unpaid_cols, final_names_map, add_repeat_class=True)
-        html_other = format_and_generate_html(df_other_payments, other_cols, final_names_map)
-        html_debtor_summary = format_and_generate_html(df_debtor_summary, debtor_summary_cols, {})
+        # --- Zapis wyników: strona wyników pobiera je stronami z bazy ---
+        saved_rows = save_result_rows(run, {
+            SECTION_PAID: df_paid, SECTION_UNPAID: df_unpaid, SECTION_OTHER: df_other_payments
+        })
+        prune_old_results(current_app.config.get('DEBTOR_RESULT_RUNS_KEPT', 20))
+        db.session.commit()
+        print(f"Zapisano {saved_rows} wierszy wyników uruchomienia #{run.id}.")
 
         # --- ZAPIS DO DZIENNIKA AKTYWNOŚCI ---
         log_activity(
@@ -480,21 +282,84 @@ def process_files():
             'debtor_tracker.index' # Link do strony głównej modułu
         )
 
-        # Przekazanie do szablonu
-        return render_template('results.html',
-                                table_paid_html=html_paid,
-                                table_unpaid_html=html_unpaid,
-                                table_other_html=html_other,
-                                html_debtor_summary=html_debtor_summary, # NOWA ZMIENNA
-                                sum_paid_str=sum_paid_str,
-                                sum_unpaid_str=sum_unpaid_str,
-                                csv_filename=csv_file.filename,
-                                pdf_filenames=", ".join(processed_pdf_filenames) if processed_pdf_filenames else "Brak przetworzonych plików PDF")
+        return redirect(url_for('.results', run_id=run.id))
 
     except Exception as e:
+        db.session.rollback()
         flash(f"Błąd podczas porównywania lub formatowania danych: {e}", 'error')
         print(f"Błąd porównania/formatowania: {e}")
         import traceback; traceback.print_exc()
         return redirect(url_for('.index')) # ZMIANA: .index
 
+@bp.route('/runs/<int:run_id>', methods=['GET'])
+@login_required
+@permission_required('admin')
+def results(run_id):
+    """Strona wyników: sumy, podsumowanie dłużników i pierwsza strona każdej sekcji."""
+    run = DebtorRun.query.get_or_404(run_id)
+    keep_runs = current_app.config.get('DEBTOR_RESULT_RUNS_KEPT', 20)
+    if results_pruned(run, keep_runs):
+        # Puste sekcje i zerowe sumy wyglądałyby jak uruchomienie bez danych
+        return render_template('results.html',
+                               run=run,
+                               results_pruned=True,
+                               keep_runs=keep_runs,
+                               active_matches=DebtorInvoice.query.filter_by(match_run_id=run.id).count(),
+                               csv_filename=run.csv_filename,
+                               pdf_filenames=run.pdf_filenames or "Brak przetworzonych plików PDF")
+    sum_paid_val, sum_unpaid_val = section_sums(run_id)
+    sections = {}
+    for section in (SECTION_PAID, SECTION_UNPAID, SECTION_OTHER):
+        table, total, page, pages = query_section_page(run_id, section)
+        sections[section] = {
+            'table': table, 'total': total, 'page': page, 'pages': pages,
+            'statuses': section_statuses(run_id, section)
+        }
+    return render_template('results.html',
+                            run=run,
+                            active_matches=DebtorInvoice.query.filter_by(match_run_id=run.id).count(),
+                            sections=sections,
+                            per_page=DEFAULT_PER_PAGE,
+                            table_debtor_summary=debtor_summary(run_id),
+                            sum_paid_str=f"{sum_paid_val:.2f}".replace('.', ','),
+                            sum_unpaid_str=f"{sum_unpaid_val:.2f}".replace('.', ','),
+                            csv_filename=run.csv_filename,
+                            pdf_filenames=run.pdf_filenames or "Brak przetworzonych plików PDF")
+
+@bp.route('/runs/<int:run_id>/reset_matches', methods=['POST'])
+@login_required
+@permission_required('admin')
+def reset_matches(run_id):
+    """Cofa dopasowania faktur do wpłat wykonane przez uruchomienie (np. błędne dopasowania po kwocie)."""
+    run = DebtorRun.query.get_or_404(run_id)
+    released = reset_run_matches(run)
+    db.session.commit()
+    log_activity(f"Cofnął {released} dopasowań faktur z uruchomienia raportu dłużników #{run.id}", 'debtor_tracker.index')
+    flash(f"Cofnięto dopasowania z uruchomienia #{run.id}: {released}. Faktury zostaną dopasowane ponownie przy następnym przesłaniu plików.", 'success')
+    return redirect(url_for('.index'))
+
+@bp.route('/runs/<int:run_id>/rows', methods=['GET'])
+@login_required
+@permission_required('admin')
+def result_rows(run_id):
+    """JSON ze stroną sekcji wyników (stronicowanie, sortowanie i filtry po stronie serwera)."""
+    section = request.args.get('section', SECTION_PAID)
+    if section not in (SECTION_PAID, SECTION_UNPAID, SECTION_OTHER):
+        abort(400)
+    table, total, page, pages = query_section_page(
+        run_id, section,
+        page=request.args.get('page', 1, type=int),
+        per_page=request.args.get('per_page', DEFAULT_PER_PAGE, type=int),
+        sort=request.args.get('sort', 'position'),
+        order=request.args.get('order', 'asc'),
+        status=request.args.get('status') or None,
+        contractor=(request.args.get('contractor') or '').strip() or None
+    )
+    return jsonify({
+        'headers': table.headers,
+        'sort_keys': table.sort_keys,
+        'rows': [{'class': row_class, 'cells': list(cells)} for row_class, cells in table.rows],
+        'total': total, 'page': page, 'pages': pages
+    })
+
 # --- USUNIĘTO SEKCJE 'app.secret_key' oraz 'if __name__ == "__main__":' ---
\ No newline at end of file
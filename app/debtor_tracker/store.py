@@ -0,0 +1,207 @@
+# app/debtor_tracker/store.py
+"""
+Trwały zapis uzgodnień dłużników.
+
+Pliki rozpoznajemy po SHA-256 zawartości: znany plik nie jest ponownie
+parsowany. Wpłaty identyfikuje skrót wiersza wyciągu, więc z narastającego
+wyciągu bankowego dopisywane są tylko nowe wiersze. Faktury identyfikuje numer.
+Dopasowanie (faktura -> wpłata) zapisujemy przy fakturze razem z uruchomieniem,
+które je wykonało; dopasowane pozycje nie biorą już udziału w kolejnych
+uruchomieniach, dopóki dopasowań tego uruchomienia nie cofniemy (reset_run_matches).
+"""
+import hashlib
+from datetime import datetime
+import pandas as pd
+from sqlalchemy import bindparam, insert, select, func
+from app.models import db, DebtorFile, DebtorInvoice, DebtorPayment, debtor_file_invoices, debtor_file_payments
+from app.debtor_tracker.matching import assign_payments
+
+# Limit parametrów w klauzuli IN (SQLite)
+CHUNK_SIZE = 500
+
+
+def file_sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def payment_row_hashes(df_raw, columns, seen=None):
+    """Skrót każdego wiersza wyciągu; identyczne wiersze numerujemy kolejnym wystąpieniem.
+
+    Przy odczycie porcjami ten sam słownik seen przekazujemy do kolejnych porcji.
+    """
+    hashes = []
+    seen = {} if seen is None else seen
+    for values in df_raw[columns].astype(object).fillna('').astype(str).itertuples(index=False, name=None):
+        key = '\x1f'.join(values)
+        occurrence = seen.get(key, 0)
+        seen[key] = occurrence + 1
+        hashes.append(hashlib.sha256(f'{key}\x1f{occurrence}'.encode('utf-8')).hexdigest())
+    return hashes
+
+
+def find_file(sha256):
+    return DebtorFile.query.filter_by(sha256=sha256).first()
+
+
+def register_file(kind, filename, sha256, row_count):
+    record = DebtorFile(kind=kind, filename=filename, sha256=sha256, row_count=row_count)
+    db.session.add(record)
+    db.session.flush()
+    return record
+
+
+def _ids_by_key(key_column, id_column, keys):
+    ids = {}
+    for start in range(0, len(keys), CHUNK_SIZE):
+        chunk = keys[start:start + CHUNK_SIZE]
+        for key, row_id in db.session.execute(select(key_column, id_column).where(key_column.in_(chunk))):
+            ids[key] = row_id
+    return ids
+
+
+def max_payment_id():
+    return db.session.execute(select(func.coalesce(func.max(DebtorPayment.id), 0))).scalar()
+
+
+def save_invoices(file_record, df_invoices):
+    """Dopisuje nowe faktury i wiąże wszystkie faktury pliku z plikiem. Zwraca liczbę nowych."""
+    df = df_invoices.drop_duplicates(subset=['NrFakturyPDF_Upper'], keep='first')
+    numbers = df['NrFakturyPDF_Upper'].tolist()
+    existing = _ids_by_key(DebtorInvoice.number_upper, DebtorInvoice.id, numbers)
+    new_rows = [
+        {
+            'number': row.NrFakturyPDF, 'number_upper': row.NrFakturyPDF_Upper, 'contractor': row.KontrahentPDF,
+            'amount': float(row.KwotaPDF), 'issue_date': getattr(row, 'DataWystawieniaPDF', None)
+        }
+        for row in df.itertuples(index=False) if row.NrFakturyPDF_Upper not in existing
+    ]
+    if new_rows:
+        db.session.execute(insert(DebtorInvoice.__table__), new_rows)
+        existing.update(_ids_by_key(DebtorInvoice.number_upper, DebtorInvoice.id, [r['number_upper'] for r in new_rows]))
+    if existing:
+        db.session.execute(insert(debtor_file_invoices), [
+            {'file_id': file_record.id, 'invoice_id': invoice_id} for invoice_id in existing.values()
+        ])
+    return len(new_rows)
+
+
+def _text(value):
+    """Wartość komórki CSV jako tekst; pusta komórka (NaN) -> None zamiast 'nan'."""
+    return None if pd.isna(value) else str(value)
+
+
+def save_payments(file_record, df_payments):
+    """Dopisuje wiersze wyciągu, których jeszcze nie znamy, i wiąże wszystkie z plikiem. Zwraca liczbę nowych."""
+    hashes = df_payments['RowHash'].tolist()
+    existing = _ids_by_key(DebtorPayment.row_hash, DebtorPayment.id, hashes)
+    new_rows = [
+        {
+            'row_hash': row_hash, 'booking_date': _text(booking_date), 'value_date': _text(value_date),
+            'title': _text(title), 'sender': _text(sender), 'amount': float(amount), 'invoice_number_from_title': _text(number)
+        }
+        for row_hash, booking_date, value_date, title, sender, amount, number in zip(
+            hashes, df_payments['Data Księgowania'], df_payments['Data Waluty'], df_payments['Tytuł Przelewu (Wpłata)'],
+            df_payments['Od Kogo (Wpłata)'], df_payments['Kwota Wpłaty'], df_payments['NrFaktury_z_Tytulu']
+        )
+        if row_hash not in existing
+    ]
+    if new_rows:
+        db.session.execute(insert(DebtorPayment.__table__), new_rows)
+        existing.update(_ids_by_key(DebtorPayment.row_hash, DebtorPayment.id, [r['row_hash'] for r in new_rows]))
+    if existing:
+        db.session.execute(insert(debtor_file_payments), [
+            {'file_id': file_record.id, 'payment_id': payment_id} for payment_id in existing.values()
+        ])
+    return len(new_rows)
+
+
+def match_pending(tolerance, new_invoices, min_new_payment_id, run):
+    """Dopasowuje niedopasowane faktury do niedopasowanych wpłat i zapisuje decyzje (z id uruchomienia).
+
+    Stare pary niedopasowanych pozycji już raz się nie dopasowały, dlatego gdy nie
+    przybyło faktur (ani nie cofnięto dopasowań), porównujemy z fakturami tylko
+    nowe wpłaty (id > min_new_payment_id).
+    """
+    rematch = db.session.execute(
+        DebtorInvoice.__table__.update().where(DebtorInvoice.rematch_pending.is_(True)).values(rematch_pending=False)
+    ).rowcount
+    invoice_rows = db.session.execute(
+        select(DebtorInvoice.id, DebtorInvoice.number_upper, DebtorInvoice.amount, DebtorInvoice.issue_date)
+        .where(DebtorInvoice.payment_id.is_(None)).order_by(DebtorInvoice.id)
+    ).all()
+    matched_payment_ids = select(DebtorInvoice.payment_id).where(DebtorInvoice.payment_id.is_not(None))
+    payment_query = select(
+        DebtorPayment.id, DebtorPayment.invoice_number_from_title, DebtorPayment.amount, DebtorPayment.booking_date
+    ).where(DebtorPayment.id.not_in(matched_payment_ids)).order_by(DebtorPayment.id)
+    if not new_invoices and not rematch:
+        payment_query = payment_query.where(DebtorPayment.id > min_new_payment_id)
+    payment_rows = db.session.execute(payment_query).all()
+    if not invoice_rows or not payment_rows:
+        return 0
+
+    df_invoices = pd.DataFrame(invoice_rows, columns=['id', 'NrFakturyPDF_Upper', 'KwotaPDF', 'DataWystawieniaPDF'])
+    df_payments = pd.DataFrame(payment_rows, columns=['id', 'NrFaktury_z_Tytulu_Upper', 'Kwota Wpłaty', 'Data Księgowania'])
+    df_payments['NrFaktury_z_Tytulu_Upper'] = df_payments['NrFaktury_z_Tytulu_Upper'].fillna('').astype(str).str.strip().str.upper()
+
+    pairs = assign_payments(df_invoices, df_payments, tolerance)
+    if pairs:
+        invoice_ids = df_invoices['id'].tolist()
+        payment_ids = df_payments['id'].tolist()
+        now = datetime.utcnow()
+        table = DebtorInvoice.__table__
+        db.session.execute(
+            table.update().where(table.c.id == bindparam('i_id')).values(
+                payment_id=bindparam('p_id'), match_method=bindparam('method'), matched_at=now, match_run_id=run.id
+            ),
+            [{'i_id': invoice_ids[i], 'p_id': payment_ids[p], 'method': method} for i, p, method in pairs]
+        )
+    return len(pairs)
+
+
+def reset_run_matches(run):
+    """Cofa dopasowania zapisane przez uruchomienie; zwolnione faktury i wpłaty wrócą do dopasowania.
+
+    Zwraca liczbę cofniętych dopasowań. Nie robi commitu.
+    """
+    return db.session.execute(
+        DebtorInvoice.__table__.update().where(DebtorInvoice.match_run_id == run.id).values(
+            payment_id=None, match_method=None, matched_at=None, match_run_id=None, rematch_pending=True
+        )
+    ).rowcount
+
+
+def load_comparison(file_ids):
+    """Tabela porównawcza dla plików uruchomienia: faktury (z wpłatą, jeśli dopasowana) i niedopasowane wpłaty."""
+    invoice_columns = ['NrFakturyPDF', 'NrFakturyPDF_Upper', 'KontrahentPDF', 'KwotaPDF', 'DataWystawieniaPDF', 'Dopasowanie']
+    payment_columns = ['Data Księgowania', 'Data Waluty', 'Tytuł Przelewu (Wpłata)', 'Od Kogo (Wpłata)', 'Kwota Wpłaty', 'NrFaktury_z_Tytulu']
+    payment_fields = [
+        DebtorPayment.booking_date, DebtorPayment.value_date, DebtorPayment.title,
+        DebtorPayment.sender, DebtorPayment.amount, DebtorPayment.invoice_number_from_title
+    ]
+
+    scoped_invoices = select(debtor_file_invoices.c.invoice_id).where(debtor_file_invoices.c.file_id.in_(file_ids))
+    invoice_rows = db.session.execute(
+        select(
+            DebtorInvoice.number, DebtorInvoice.number_upper, DebtorInvoice.contractor, DebtorInvoice.amount,
+            DebtorInvoice.issue_date, DebtorInvoice.match_method, *payment_fields
+        ).outerjoin(DebtorPayment, DebtorInvoice.payment_id == DebtorPayment.id)
+        .where(DebtorInvoice.id.in_(scoped_invoices)).order_by(DebtorInvoice.id)
+    ).all()
+
+    # Wpłaty dopasowane do faktur spoza tego uruchomienia zostały już rozliczone - pomijamy je
+    scoped_payments = select(debtor_file_payments.c.payment_id).where(debtor_file_payments.c.file_id.in_(file_ids))
+    matched_payment_ids = select(DebtorInvoice.payment_id).where(DebtorInvoice.payment_id.is_not(None))
+    payment_rows = db.session.execute(
+        select(*payment_fields).where(
+            DebtorPayment.id.in_(scoped_payments), DebtorPayment.id.not_in(matched_payment_ids)
+        ).order_by(DebtorPayment.id)
+    ).all()
+
+    df_invoice_side = pd.DataFrame(invoice_rows, columns=invoice_columns + payment_columns)
+    df_payment_side = pd.DataFrame(payment_rows, columns=payment_columns)
+    frames = [frame for frame in (df_invoice_side, df_payment_side) if not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=invoice_columns + payment_columns)
+    comparison_df = pd.concat(frames, ignore_index=True)
+    comparison_df['NrFaktury_z_Tytulu_Upper'] = comparison_df['NrFaktury_z_Tytulu'].fillna('').astype(str).str.strip().str.upper()
+    return comparison_df
@@ -1,16 +1,79 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
-from app.models import db, FinishedProduct, FinishedProductCategory, SalesReportLog
-from flask_login import login_required
+import json
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, Response
+from app.models import db, FinishedProduct, FinishedProductCategory, BackgroundJob
+from flask_login import login_required, current_user
 from app.decorators import permission_required
 from sqlalchemy import asc, desc
-from markupsafe import Markup
-import pdfplumber
-import io
-import re
-from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from app.jobs import job_runner, job_params, STATUS_DONE
+from app.inventory import low_stock_finished_products, invalidate_inventory_health
+from app.finished_goods.sales_import import extract_sales_report, parse_sales_rows, apply_sales, sales_diff_csv
+from app.finished_goods.sales_velocity import sales_velocity_report
 
 bp = Blueprint('finished_goods', __name__, template_folder='templates', url_prefix='/finished_goods')
 
+
+def _sales_import_committed(job):
+    # Stany zmienił zatwierdzony import - dopiero teraz listy niskich stanów mogą się przeliczyć
+    invalidate_inventory_health()
+
+
+@job_runner.handler('sales_import', on_success=_sales_import_committed, serial=True)
+def run_sales_import(job):
+    """Importuje raport sprzedaży w tle; zestawienie zmian zapisuje w job.result_data."""
+    params = job_params(job)
+    with open(job_runner.payload_path(job.id), 'rb') as f:
+        pdf_bytes = f.read()
+
+    # Odczyt PDF to do 80% paska postępu, zapis stanów to reszta
+    def on_pages(done, page_count):
+        job_runner.set_progress(job, 80 * done / page_count, f'Przeczytano strony: {done} z {page_count}')
+
+    job_runner.set_progress(job, 0, 'Odczyt raportu PDF...')
+    report_period, page_count, tables = extract_sales_report(pdf_bytes, on_pages=on_pages)
+    if report_period is None:
+        raise ValueError('Nie można znaleźć daty raportu w pliku PDF. Upewnij się, że zawiera frazę "ZA OKRES: RRRR-MM-DD".')
+    report_date, period_end = report_period
+    if period_end < report_date:
+        raise ValueError(f'Niepoprawny okres raportu: {report_date} - {period_end}.')
+    period_days = (period_end - report_date).days + 1
+
+    sales_rows = parse_sales_rows(tables)
+    job_runner.set_progress(job, 85, f'Znaleziono wierszy sprzedaży: {len(sales_rows)}. Aktualizacja stanów...')
+    # Zmiany stanów zatwierdza dopiero _execute razem ze statusem zadania - błąd cofa cały import
+    try:
+        updated_products, not_found_codes = apply_sales(report_date, sales_rows, period_days)
+    except IntegrityError:
+        # Ten sam raport zapisał w międzyczasie import z innego procesu (unikalny wpis produktu i daty)
+        raise ValueError(f'Raport z dnia {report_date.strftime("%Y-%m-%d")} jest już importowany w innym zadaniu. '
+                         'Spróbuj ponownie po jego zakończeniu.')
+    not_found = set(not_found_codes)
+    matched_rows = sum(1 for code, _ in sales_rows if code not in not_found)
+
+    job.result_data = json.dumps({
+        'report_date': report_date.strftime('%Y-%m-%d'),
+        'period_end': period_end.strftime('%Y-%m-%d'),
+        'filename': params.get('filename'),
+        'pages': page_count,
+        'rows': len(sales_rows),
+        'matched_rows': matched_rows,
+        'updated': updated_products,
+        'not_found': not_found_codes,
+    })
+    period = report_date.strftime('%Y-%m-%d')
+    if period_days > 1:
+        period += f' - {period_end.strftime("%Y-%m-%d")}'
+    job.message = (f'Raport z dnia {period}: stron {page_count}, '
+                   f'wierszy {len(sales_rows)} (dopasowanych {matched_rows}), '
+                   f'zaktualizowano produktów: {len(updated_products)}.')
+
+
+def _get_sales_import_or_404(job_id):
+    job = BackgroundJob.query.get_or_404(job_id)
+    if job.kind != 'sales_import' or job.status != STATUS_DONE or not job.result_data:
+        abort(404)
+    return job
+
 @bp.route('/')
 @login_required
 @permission_required('warehouse')
@@ -24,15 +87,23 @@ def index():
 
     query = FinishedProduct.query.order_by(asc(sort_column) if order == 'asc' else desc(sort_column))
     all_products = query.all()
-    low_stock_products = [p for p in all_products if p.critical_stock_level > 0 and p.quantity_in_stock < p.critical_stock_level]
+    low_stock_products = low_stock_finished_products()
     
     return render_template('finished_goods_index.html', 
                            categories=categories, 
                            all_products=all_products,
                            low_stock_products=low_stock_products,
+                           low_stock_ids={item.id for item in low_stock_products},
                            sort_by=sort_by,
                            order=order)
 
+@bp.route('/sales_velocity')
+@login_required
+@permission_required('warehouse')
+def sales_velocity():
+    as_of, items = sales_velocity_report()
+    return render_template('sales_velocity.html', as_of=as_of, items=items)
+
 @bp.route('/edit_stock/<int:product_id>', methods=['GET', 'POST'])
 @login_required
 @permission_required('warehouse')
@@ -42,6 +113,7 @@ def edit_product_stock(product_id):
         product.quantity_in_stock = request.form.get('quantity_in_stock', type=int)
         product.critical_stock_level = request.form.get('critical_stock_level', type=int)
         db.session.commit()
+        invalidate_inventory_health()
         flash(f"Zaktualizowano dane dla produktu '{product.name}'.", 'success')
         return redirect(url_for('finished_goods.index'))
     return render_template('edit_fp_stock.html', product=product)
@@ -73,6 +145,7 @@ def edit_category(id):
     if new_name:
         category.name = new_name
         db.session.commit()
+        invalidate_inventory_health()
         flash("Nazwa kategorii została zaktualizowana.", "success")
     return redirect(url_for('finished_goods.manage_categories'))
 
@@ -86,6 +159,7 @@ def delete_category(id):
     else:
         db.session.delete(category)
         db.session.commit()
+        invalidate_inventory_health()
         flash(f"Kategoria '{category.name}' została usunięta.", 'success')
     return redirect(url_for('finished_goods.manage_categories'))
 
@@ -113,99 +187,33 @@ def import_sales():
             flash('Nie wybrano pliku.', 'danger')
             return redirect(request.url)
         if file and file.filename.endswith('.pdf'):
-            try:
-                pdf_stream = io.BytesIO(file.read())
-                with pdfplumber.open(pdf_stream) as pdf:
-                    text = "".join(page.extract_text() for page in pdf.pages)
-                    
-                    date_match = re.search(r'ZA OKRES:\s*(\d{4}-\d{2}-\d{2})', text)
-                    if not date_match:
-                        flash('Nie można znaleźć daty raportu w pliku PDF. Upewnij się, że zawiera frazę "ZA OKRES: RRRR-MM-DD".', 'danger')
-                        return redirect(url_for('finished_goods.index'))
-                    report_date = datetime.strptime(date_match.group(1), '%Y-%m-%d').date()
-
-                    updated_products = []
-                    not_found_codes = []
-
-                    for page in pdf.pages:
-                        tables = page.extract_tables()
-                        for table in tables:
-                            try:
-                                header = [h.replace('\n', ' ') if h else '' for h in table[0]]
-                                code_idx = header.index('Kod produktu')
-                                qty_idx = header.index('Ilość sprzedana')
-                            except (ValueError, IndexError):
-                                continue 
-
-                            for row in table[1:]:
-                                if len(row) > max(code_idx, qty_idx) and row[code_idx]:
-                                    product_code = row[code_idx].strip()
-                                    try:
-                                        quantity_sold = int(row[qty_idx])
-                                    except (ValueError, TypeError):
-                                        continue
-
-                                    products = FinishedProduct.query.filter_by(product_code=product_code).all()
-                                    if not products:
-                                        if product_code not in not_found_codes:
-                                            not_found_codes.append(product_code)
-                                        continue
-
-                                    for product in products:
-                                        # --- POPRAWKA TUTAJ: Zapisujemy stan przed zmianą ---
-                                        stock_before = product.quantity_in_stock
-                                        
-                                        log_entry = SalesReportLog.query.filter_by(
-                                            product_id=product.id,
-                                            report_date=report_date
-                                        ).first()
-                                        
-                                        quantity_to_deduct = 0
-                                        if log_entry:
-                                            quantity_to_deduct = quantity_sold - log_entry.quantity_sold
-                                            log_entry.quantity_sold = quantity_sold
-                                        else:
-                                            quantity_to_deduct = quantity_sold
-                                            new_log = SalesReportLog(
-                                                product_id=product.id,
-                                                report_date=report_date,
-                                                quantity_sold=quantity_sold
-                                            )
-                                            db.session.add(new_log)
-                                        
-                                        if quantity_to_deduct > 0:
-                                            product.quantity_in_stock -= quantity_to_deduct
-                                            # --- POPRAWKA TUTAJ: Zapisujemy więcej szczegółów ---
-                                            updated_products.append({
-                                                'name': product.name,
-                                                'before': stock_before,
-                                                'deducted': quantity_to_deduct,
-                                                'after': product.quantity_in_stock
-                                            })
-
-                    db.session.commit()
-                    
-                    # --- POPRAWKA TUTAJ: Budujemy nową, bardziej szczegółową wiadomość ---
-                    msg = f"<b>Import zakończony dla raportu z dnia {report_date.strftime('%Y-%m-%d')}.</b><br>"
-                    if updated_products:
-                        msg += "<h5>Zaktualizowano stany magazynowe:</h5><ul class='list-group'>"
-                        for p in updated_products:
-                            msg += (f"<li class='list-group-item'>"
-                                    f"<strong>{p['name']}</strong>: "
-                                    f"Było: {p['before']} &rarr; "
-                                    f"Odjęto: <span class='text-danger'>-{p['deducted']}</span> &rarr; "
-                                    f"Jest: <span class='fw-bold'>{p['after']}</span>"
-                                    f"</li>")
-                        msg += "</ul>"
-                    
-                    if not_found_codes:
-                        msg += "<br><div class='alert alert-warning mt-2'><b>Nie znaleziono w systemie produktów o kodach:</b> " + ", ".join(not_found_codes) + "</div>"
-                    
-                    flash(Markup(msg), 'success')
-
-            except Exception as e:
-                flash(f'Wystąpił błąd podczas przetwarzania pliku PDF: {e}', 'danger')
-
-            return redirect(url_for('finished_goods.index'))
-
-    return render_template('import_sales.html')
\ No newline at end of file
+            # Odczyt PDF i aktualizacja stanów idą w tle - strona statusu pokazuje postęp
+            job = job_runner.enqueue('sales_import', {
+                'title': f'Import sprzedaży: {file.filename}',
+                'filename': file.filename,
+                'details_endpoint': 'finished_goods.import_sales_result',
+            }, user_id=current_user.id, payload=file.read())
+            return redirect(url_for('main.job_status', job_id=job.id))
+        flash('Wybierz plik w formacie PDF.', 'danger')
+        return redirect(request.url)
+
+    return render_template('import_sales.html')
+
+@bp.route('/import_sales/<int:job_id>')
+@login_required
+@permission_required('admin')
+def import_sales_result(job_id):
+    job = _get_sales_import_or_404(job_id)
+    return render_template('import_sales_result.html', job=job, result=json.loads(job.result_data))
+
+@bp.route('/import_sales/<int:job_id>/diff.csv')
+@login_required
+@permission_required('admin')
+def import_sales_diff(job_id):
+    job = _get_sales_import_or_404(job_id)
+    result = json.loads(job.result_data)
+    return Response(
+        sales_diff_csv(result),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename=import_sprzedazy_{result["report_date"]}_{job.id}.csv'}
+    )
\ No newline at end of file
@@ -0,0 +1,208 @@
+# app/finished_goods/sales_import.py
+"""
+Import raportu sprzedaży (PDF) do stanów wyrobów gotowych.
+
+Import ma dwa etapy: najpierw z tabel raportu zbieramy wszystkie wiersze
+(kod produktu, ilość sprzedana), potem jednym zapytaniem pobieramy produkty
+po kodach i jednym istniejące wpisy SalesReportLog dla daty raportu.
+Zmiany stanów i wpisów zapisujemy wsadowo, zamiast dwóch zapytań na wiersz.
+
+PDF czytamy jednym przejściem: tabele i (z pierwszych stron) datę raportu
+wyciągamy z tego samego obiektu strony, więc pdfplumber analizuje układ
+każdej strony raz. Długie raporty dzielimy na zakresy stron w puli procesów.
+
+Import działa jako zadanie w tle ('sales_import'); zestawienie zmian stanów
+zostaje w wyniku zadania i można je pobrać jako CSV (sales_diff_csv). Importy
+wykonują się po kolei (handler z serial=True), a wpis SalesReportLog jest
+unikalny dla produktu i daty, więc ten sam raport nie odejmie stanów dwa razy.
+Raport obejmuje okres ("ZA OKRES: od - do" albo jeden dzień); data raportu to
+początek okresu, a liczbę dni okresu zapisujemy we wpisach SalesReportLog.
+"""
+import csv
+import io
+import re
+from datetime import datetime
+import pdfplumber
+from sqlalchemy import insert
+from app.jobs import job_runner
+from app.models import db, FinishedProduct, SalesReportLog
+from app.finished_goods.sales_velocity import add_sales
+
+CODE_HEADER = 'Kod produktu'
+QUANTITY_HEADER = 'Ilość sprzedana'
+REPORT_PERIOD_PATTERN = re.compile(r'ZA OKRES:\s*(\d{4}-\d{2}-\d{2})(?:\s*(?:-|–|do)\s*(\d{4}-\d{2}-\d{2}))?')
+# Data raportu jest w nagłówku - szukamy jej tylko na tylu pierwszych stronach
+DATE_SEARCH_PAGES = 2
+PAGES_PER_TASK = 10
+
+
+def _find_report_period(text):
+    """(pierwszy, ostatni dzień okresu) jako tekst RRRR-MM-DD albo None; raport jednodniowy ma oba równe."""
+    match = REPORT_PERIOD_PATTERN.search(text or '')
+    if not match:
+        return None
+    return match.group(1), match.group(2) or match.group(1)
+
+
+def extract_report_pages(pdf_bytes, first_page, last_page, date_pages):
+    """Zwraca (okres raportu lub None, tabele) dla stron [first_page, last_page) (uruchamiane w puli procesów).
+
+    Tekst (do szukania okresu) wyciągamy tylko ze stron o indeksie < date_pages i tylko
+    dopóki okres nie zostanie znaleziony; znaki strony są wtedy już wczytane dla tabel.
+    """
+    report_period = None
+    tables = []
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        for index in range(first_page, last_page):
+            page = pdf.pages[index]
+            tables.extend(page.extract_tables())
+            if report_period is None and index < date_pages:
+                report_period = _find_report_period(page.extract_text())
+    return report_period, tables
+
+
+def extract_sales_report(pdf_bytes, on_pages=None):
+    """Czyta raport sprzedaży. Zwraca (okres raportu, liczba stron, tabele w kolejności stron).
+
+    Okres to (pierwszy dzień, ostatni dzień) jako date albo None, gdy raport nie ma daty.
+
+    on_pages(przeczytane strony, liczba stron) jest wołane po każdym zakresie stron.
+    """
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        page_count = len(pdf.pages)
+    ranges = [(first, min(first + PAGES_PER_TASK, page_count)) for first in range(0, page_count, PAGES_PER_TASK)]
+    on_result = None
+    if on_pages:
+        on_result = lambda done: on_pages(ranges[done - 1][1], page_count)
+    results = job_runner.map_in_process(
+        extract_report_pages, [(pdf_bytes, first, last, DATE_SEARCH_PAGES) for first, last in ranges], on_result
+    )
+
+    report_period = None
+    tables = []
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
+        page_period, page_tables = result
+        report_period = report_period or page_period
+        tables.extend(page_tables)
+
+    if report_period is None and page_count > DATE_SEARCH_PAGES:
+        # Nietypowy układ: data nie jest na pierwszych stronach - przeszukujemy resztę tekstu
+        with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+            for page in pdf.pages[DATE_SEARCH_PAGES:]:
+                report_period = _find_report_period(page.extract_text())
+                if report_period:
+                    break
+
+    if report_period is not None:
+        report_period = tuple(datetime.strptime(day, '%Y-%m-%d').date() for day in report_period)
+    return report_period, page_count, tables
+
+
+def parse_sales_rows(tables):
+    """Zwraca listę (kod produktu, ilość sprzedana) z tabel raportu w kolejności wierszy."""
+    rows = []
+    for table in tables:
+        try:
+            header = [h.replace('\n', ' ') if h else '' for h in table[0]]
+            code_idx = header.index(CODE_HEADER)
+            qty_idx = header.index(QUANTITY_HEADER)
+        except (ValueError, IndexError):
+            continue
+
+        for row in table[1:]:
+            if len(row) > max(code_idx, qty_idx) and row[code_idx]:
+                try:
+                    quantity_sold = int(row[qty_idx])
+                except (ValueError, TypeError):
+                    continue
+                rows.append((row[code_idx].strip(), quantity_sold))
+    return rows
+
+
+def apply_sales(report_date, rows, period_days=1):
+    """Odejmuje sprzedaż od stanów i zapisuje SalesReportLog dla daty raportu.
+
+    Wiersze przetwarzamy po kolei jak dotychczas: ponowny import (lub powtórzony
+    kod w raporcie) odejmuje tylko przyrost względem zapisanej ilości. Zmiany
+    wpisów trafiają też do sprzedaży dziennej produktów (add_sales).
+    Zwraca (lista zmian stanów, lista nieznalezionych kodów). Nie robi commitu.
+    """
+    codes = list(dict.fromkeys(code for code, _ in rows))
+    products_by_code = {}
+    if codes:
+        # Blokada wierszy produktów (PostgreSQL) szereguje importy z różnych procesów:
+        # następny import czyta wpisy dziennika dopiero po zatwierdzeniu poprzedniego
+        products = FinishedProduct.query.filter(
+            FinishedProduct.product_code.in_(codes)
+        ).order_by(FinishedProduct.id).with_for_update()
+        for product in products:
+            products_by_code.setdefault(product.product_code, []).append(product)
+
+    product_ids = [product.id for products in products_by_code.values() for product in products]
+    logs_by_product = {}
+    if product_ids:
+        existing_logs = SalesReportLog.query.filter(
+            SalesReportLog.report_date == report_date, SalesReportLog.product_id.in_(product_ids)
+        ).order_by(SalesReportLog.id)
+        for log_entry in existing_logs:
+            logs_by_product.setdefault(log_entry.product_id, log_entry)
+    # Ilość sprzedana zapisana dla daty raportu (aktualizowana w trakcie importu)
+    sold = {product_id: log_entry.quantity_sold for product_id, log_entry in logs_by_product.items()}
+
+    updated_products = []
+    not_found_codes = []
+    for product_code, quantity_sold in rows:
+        products = products_by_code.get(product_code)
+        if not products:
+            if product_code not in not_found_codes:
+                not_found_codes.append(product_code)
+            continue
+
+        for product in products:
+            stock_before = product.quantity_in_stock
+            previous = sold.get(product.id)
+            quantity_to_deduct = quantity_sold - previous if previous is not None else quantity_sold
+            sold[product.id] = quantity_sold
+
+            if quantity_to_deduct > 0:
+                product.quantity_in_stock -= quantity_to_deduct
+                updated_products.append({
+                    'code': product_code,
+                    'name': product.name,
+                    'before': stock_before,
+                    'deducted': quantity_to_deduct,
+                    'after': product.quantity_in_stock
+                })
+
+    # Zmienione wpisy i stany zapisze flush (UPDATE wsadowo), nowe wpisy - jeden INSERT wielu wierszy
+    new_logs = []
+    daily_changes = []
+    for product_id, quantity_sold in sold.items():
+        log_entry = logs_by_product.get(product_id)
+        if log_entry is None:
+            new_logs.append({'product_id': product_id, 'report_date': report_date, 'quantity_sold': quantity_sold,
+                             'period_days': period_days})
+            daily_changes.append((product_id, report_date, period_days, quantity_sold))
+        elif log_entry.quantity_sold != quantity_sold or log_entry.period_days != period_days:
+            daily_changes.append((product_id, report_date, log_entry.period_days, -log_entry.quantity_sold))
+            daily_changes.append((product_id, report_date, period_days, quantity_sold))
+            log_entry.quantity_sold = quantity_sold
+            log_entry.period_days = period_days
+    if new_logs:
+        db.session.execute(insert(SalesReportLog.__table__), new_logs)
+    add_sales(daily_changes)
+    return updated_products, not_found_codes
+
+
+def sales_diff_csv(result):
+    """Zestawienie zmian stanów z wyniku zadania importu jako CSV (średniki, BOM dla Excela)."""
+    output = io.StringIO()
+    writer = csv.writer(output, delimiter=';')
+    writer.writerow(['Data raportu', 'Kod produktu', 'Produkt', 'Stan przed', 'Odjęto', 'Stan po'])
+    for item in result['updated']:
+        writer.writerow([result['report_date'], item['code'], item['name'], item['before'], item['deducted'], item['after']])
+    for code in result['not_found']:
+        writer.writerow([result['report_date'], code, 'Nie znaleziono w systemie', '', '', ''])
+    return '\ufeff' + output.getvalue()
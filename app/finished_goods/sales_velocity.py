@@ -0,0 +1,117 @@
+# app/finished_goods/sales_velocity.py
+"""
+Tempo sprzedaży produktów i zapas w dniach (z importowanych raportów sprzedaży).
+
+Raport obejmuje okres ("ZA OKRES: od - do", albo jeden dzień). Ilość sprzedaną
+w raporcie rozkładamy po równo na dni okresu i trzymamy w product_daily_sales
+(produkt, dzień, ilość). Import dodaje tylko zmianę względem poprzedniego
+importu tej samej daty i tylko dla produktów z raportu (add_sales), więc nie
+przelicza całej tabeli ani dziennika sprzedaży.
+
+Tempo liczymy przy odczycie z ostatnich 28 dni objętych raportami (indeks po
+dniu): dzień, w którym produkt nie pojawił się w raporcie, to dzień bez jego
+sprzedaży. Na początku historii okno skraca się do dni od pierwszego raportu.
+Zapas w dniach liczymy względem bieżącego stanu produktu, bo stan zmienia się
+też poza importem. Tabelę odbudowuje komenda `flask rebuild-sales-velocity`.
+"""
+from collections import namedtuple
+from datetime import timedelta
+from sqlalchemy import func, case
+from app.models import db, SalesReportLog, ProductDailySales, FinishedProduct, FinishedProductCategory
+
+WEEK_DAYS = 7
+WINDOW_DAYS = 28
+# Resztki z dzielenia ilości na dni po cofnięciu sprzedaży nie są sprzedażą
+MIN_QUANTITY = 1e-6
+
+SalesVelocity = namedtuple(
+    'SalesVelocity',
+    'id name category_name quantity_in_stock unit sold_7d sold_28d daily_velocity weekly_velocity days_of_cover'
+)
+
+
+def _upsert():
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+def add_sales(changes):
+    """Dodaje sprzedaż do dni okresów. changes: lista (product_id, pierwszy dzień, liczba dni, ilość).
+
+    Ujemna ilość cofa wcześniej dodaną sprzedaż (np. przy ponownym imporcie raportu). Nie robi commitu.
+    """
+    daily = {}
+    for product_id, first_day, period_days, quantity in changes:
+        for offset in range(period_days):
+            key = (product_id, first_day + timedelta(days=offset))
+            daily[key] = daily.get(key, 0) + quantity / period_days
+    rows = [{'product_id': product_id, 'day': day, 'quantity': quantity}
+            for (product_id, day), quantity in daily.items() if abs(quantity) > MIN_QUANTITY]
+    if not rows:
+        return
+    table = ProductDailySales.__table__
+    stmt = _upsert()(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.product_id, table.c.day],
+        set_={'quantity': table.c.quantity + stmt.excluded.quantity}
+    )
+    db.session.execute(stmt, rows)
+
+
+def rebuild_daily_sales():
+    """Przelicza od zera sprzedaż dzienną z całego dziennika sprzedaży. Zwraca liczbę wpisów dziennika."""
+    db.session.execute(ProductDailySales.__table__.delete())
+    logs = db.session.query(
+        SalesReportLog.product_id, SalesReportLog.report_date, SalesReportLog.period_days, SalesReportLog.quantity_sold
+    ).all()
+    add_sales(logs)
+    return len(logs)
+
+
+def remove_product_daily_sales(product_id):
+    """Usuwa sprzedaż dzienną produktu (przy usuwaniu produktu)."""
+    ProductDailySales.query.filter_by(product_id=product_id).delete(synchronize_session=False)
+
+
+def sales_velocity_report():
+    """Zwraca (ostatni dzień objęty raportami lub None, lista SalesVelocity).
+
+    Produkty ze sprzedażą w oknie 28 dni są uporządkowane od najkrótszego zapasu
+    w dniach (najpilniejsze do uzupełnienia).
+    """
+    first_day, as_of = db.session.query(func.min(ProductDailySales.day), func.max(ProductDailySales.day)).one()
+    if as_of is None:
+        return None, []
+    history_days = (as_of - first_day).days + 1
+    days_7d = min(WEEK_DAYS, history_days)
+    days_28d = min(WINDOW_DAYS, history_days)
+
+    in_week = ProductDailySales.day >= as_of - timedelta(days=WEEK_DAYS - 1)
+    sold_7d = func.sum(case((in_week, ProductDailySales.quantity), else_=0))
+    sold_28d = func.sum(ProductDailySales.quantity)
+    rows = db.session.query(
+        FinishedProduct.id, FinishedProduct.name, FinishedProductCategory.name,
+        FinishedProduct.quantity_in_stock, FinishedProduct.unit, sold_7d, sold_28d
+    ).join(ProductDailySales, ProductDailySales.product_id == FinishedProduct.id).outerjoin(
+        FinishedProduct.category
+    ).filter(
+        ProductDailySales.day >= as_of - timedelta(days=WINDOW_DAYS - 1)
+    ).group_by(
+        FinishedProduct.id, FinishedProduct.name, FinishedProductCategory.name,
+        FinishedProduct.quantity_in_stock, FinishedProduct.unit
+    ).having(sold_28d > MIN_QUANTITY).all()
+
+    items = []
+    for product_id, name, category_name, quantity_in_stock, unit, week_total, window_total in rows:
+        daily_velocity = window_total / days_28d
+        items.append(SalesVelocity(
+            product_id, name, category_name, quantity_in_stock, unit, week_total, window_total,
+            daily_velocity,
+            week_total * WEEK_DAYS / days_7d,
+            max(quantity_in_stock, 0) / daily_velocity
+        ))
+    items.sort(key=lambda item: (item.days_of_cover, item.name))
+    return as_of, items
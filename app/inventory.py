@@ -0,0 +1,69 @@
+# app/inventory.py
+"""
+Stan zdrowia magazynów: pozycje poniżej poziomu krytycznego.
+
+Listy niskich stanów surowców, opakowań i produktów gotowych liczy SQL (filtr
+po stanie i poziomie krytycznym), a nie Python po wczytaniu całych tabel.
+Stan surowca to suma partii utrzymywana w raw_material_stocks (app/warehouse/stock.py),
+więc nie trzeba agregować partii przy każdym zapytaniu.
+
+Wyniki to zwarte wiersze (LowStockItem) cache'owane krótko w przestrzeni
+'inventory_health'; widoki zmieniające stany wołają invalidate_inventory_health()
+po commicie (razem z sekcjami niskich stanów na pulpicie), a TTL ogranicza
+nieaktualność w pozostałych workerach.
+"""
+from collections import namedtuple
+from app.cache import cache
+from app.utils import invalidate_dashboard
+from app.models import db, RawMaterial, RawMaterialStock, Category, Packaging, PackagingCategory, FinishedProduct, FinishedProductCategory
+
+INVENTORY_HEALTH_TTL = 30
+
+LowStockItem = namedtuple('LowStockItem', 'id name category_name current_stock critical_stock_level')
+
+
+def _low_stock_raw_materials():
+    current_stock = db.func.coalesce(RawMaterialStock.total_quantity, 0)
+    rows = db.session.query(
+        RawMaterial.id, RawMaterial.name, Category.name, current_stock, RawMaterial.critical_stock_level
+    ).join(RawMaterial.category).outerjoin(RawMaterialStock, RawMaterialStock.raw_material_id == RawMaterial.id).filter(
+        RawMaterial.critical_stock_level > 0, current_stock < RawMaterial.critical_stock_level
+    ).order_by(RawMaterial.name).all()
+    return [LowStockItem(*row) for row in rows]
+
+
+def _low_stock_packaging():
+    rows = db.session.query(
+        Packaging.id, Packaging.name, PackagingCategory.name, Packaging.quantity_in_stock, Packaging.critical_stock_level
+    ).outerjoin(Packaging.category).filter(
+        Packaging.critical_stock_level > 0, Packaging.quantity_in_stock < Packaging.critical_stock_level
+    ).order_by(Packaging.name).all()
+    return [LowStockItem(*row) for row in rows]
+
+
+def _low_stock_finished_products():
+    rows = db.session.query(
+        FinishedProduct.id, FinishedProduct.name, FinishedProductCategory.name,
+        FinishedProduct.quantity_in_stock, FinishedProduct.critical_stock_level
+    ).outerjoin(FinishedProduct.category).filter(
+        FinishedProduct.critical_stock_level > 0, FinishedProduct.quantity_in_stock < FinishedProduct.critical_stock_level
+    ).order_by(FinishedProduct.name).all()
+    return [LowStockItem(*row) for row in rows]
+
+
+def low_stock_raw_materials():
+    return cache.get_or_set(('inventory_health', 'raw_materials'), _low_stock_raw_materials, INVENTORY_HEALTH_TTL)
+
+
+def low_stock_packaging():
+    return cache.get_or_set(('inventory_health', 'packaging'), _low_stock_packaging, INVENTORY_HEALTH_TTL)
+
+
+def low_stock_finished_products():
+    return cache.get_or_set(('inventory_health', 'finished_products'), _low_stock_finished_products, INVENTORY_HEALTH_TTL)
+
+
+def invalidate_inventory_health():
+    """Unieważnia listy niskich stanów (wołać po commicie zmieniającym stany lub poziomy krytyczne)."""
+    cache.invalidate('inventory_health')
+    invalidate_dashboard('low_stock')
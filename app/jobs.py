@@ -0,0 +1,265 @@
+# app/jobs.py
+"""
+Lokalna kolejka zadań w tle (tabela background_jobs).
+
+Długie operacje (np. generowanie PDF przez WeasyPrint) nie blokują już workera
+gunicorna: endpoint zapisuje zadanie w bazie i od razu zwraca stronę statusu,
+a zadanie wykonuje pula wątków procesu. Operacje obciążające CPU handler może
+przekazać do puli procesów (run_in_process), żeby nie trzymać GIL-a.
+
+Wynik (plik) trafia do JOBS_FOLDER i jest pobierany przez main.job_download.
+Zadania starsze niż JOBS_RETENTION są usuwane razem z plikami (prune_finished,
+wołane przy enqueue i komendą `flask prune-jobs`).
+"""
+import atexit
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from app.models import db, BackgroundJob
+
+STATUS_PENDING = 'Oczekuje'
+STATUS_RUNNING = 'W toku'
+STATUS_DONE = 'Gotowe'
+STATUS_FAILED = 'Błąd'
+
+
+class JobRunner:
+    def __init__(self):
+        self.app = None
+        self.handlers = {}
+        self.success_hooks = {}
+        # Typy zadań wykonywane po kolei: kind -> blokada
+        self.serial_locks = {}
+        self._executor = None
+        self._process_pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.max_workers = app.config.get('JOBS_MAX_WORKERS', 2)
+        self.process_workers = app.config.get('JOBS_PROCESS_WORKERS', 2)
+        self.folder = app.config['JOBS_FOLDER']
+        self.timeout = timedelta(seconds=app.config.get('JOBS_TIMEOUT', 1800))
+        # Krócej niż limit czasu nie wolno - usunęlibyśmy zadania jeszcze w toku
+        self.retention = max(timedelta(seconds=app.config.get('JOBS_RETENTION', 7 * 24 * 3600)), self.timeout)
+        os.makedirs(self.folder, exist_ok=True)
+        atexit.register(self.shutdown)
+
+    def handler(self, kind, on_success=None, serial=False):
+        """Rejestruje funkcję handler(job) wykonywaną w tle dla zadań danego typu.
+
+        on_success(job) jest wołane po zatwierdzeniu (commit) udanego zadania - np. do
+        unieważnienia cache, którego nie wolno czyścić przed zapisem zmian.
+        serial=True: zadania tego typu w procesie wykonują się po kolei (następne
+        czeka ze statusem 'Oczekuje', aż poprzednie zatwierdzi zmiany).
+        """
+        def decorator(f):
+            self.handlers[kind] = f
+            if on_success is not None:
+                self.success_hooks[kind] = on_success
+            if serial:
+                self.serial_locks[kind] = threading.Lock()
+            return f
+        return decorator
+
+    def enqueue(self, kind, params=None, user_id=None, payload=None):
+        """Zapisuje zadanie w bazie i przekazuje je do puli wątków.
+
+        payload (tekst lub bajty, np. przesłany PDF) jest zapisywany do pliku
+        obok wyniku - duże dane wejściowe nie trafiają do bazy.
+        """
+        self.prune_finished()
+        job = BackgroundJob(kind=kind, user_id=user_id, params=json.dumps(params or {}))
+        db.session.add(job)
+        db.session.commit()
+        if isinstance(payload, bytes):
+            with open(self.payload_path(job.id), 'wb') as f:
+                f.write(payload)
+        elif payload is not None:
+            with open(self.payload_path(job.id), 'w', encoding='utf-8') as f:
+                f.write(payload)
+        self._get_executor().submit(self._execute, job.id)
+        return job
+
+    def payload_path(self, job_id):
+        return os.path.join(self.folder, f'job_{job_id}.in')
+
+    def result_path(self, job_id, extension):
+        return os.path.join(self.folder, f'job_{job_id}.{extension}')
+
+    def set_progress(self, job, progress, message=None):
+        job.progress = int(progress)
+        if message is not None:
+            job.message = message
+        db.session.commit()
+
+    def run_in_process(self, func, *args):
+        """Wykonuje funkcję (zdefiniowaną na poziomie modułu) w puli procesów i czeka na wynik."""
+        if self.process_workers <= 0:
+            return func(*args)
+        try:
+            return self._get_process_pool().submit(func, *args).result()
+        except BrokenProcessPool:
+            # Proces roboczy padł (np. OOM) - budujemy pulę od nowa i próbujemy raz jeszcze
+            with self._lock:
+                self._process_pool = None
+            return self._get_process_pool().submit(func, *args).result()
+
+    def map_in_process(self, func, args_list, on_result=None):
+        """Wykonuje func(*args) dla każdej krotki równolegle w puli procesów.
+
+        Wyniki zwracane są w kolejności wejścia; wyjątek pojedynczego wywołania
+        trafia na jego pozycję zamiast wyniku, żeby jeden zły plik nie przerywał całości.
+        on_result(liczba gotowych wyników) pozwala raportować postęp.
+        """
+        results = []
+        if self.process_workers <= 0 or len(args_list) <= 1:
+            for args in args_list:
+                results.append(self._call_safely(func, args))
+                if on_result: on_result(len(results))
+            return results
+        pool = self._get_process_pool()
+        futures = [pool.submit(func, *args) for args in args_list]
+        for future in futures:
+            try:
+                results.append(future.result())
+            except BrokenProcessPool as e:
+                with self._lock:
+                    self._process_pool = None
+                results.append(e)
+            except Exception as e:
+                results.append(e)
+            if on_result: on_result(len(results))
+        return results
+
+    def _call_safely(self, func, args):
+        try:
+            return func(*args)
+        except Exception as e:
+            return e
+
+    def expire_stale(self, job):
+        """Zadanie przerwane restartem procesu nigdy się nie zakończy - oznaczamy je jako błąd."""
+        if job.is_finished or datetime.utcnow() - job.created_at < self.timeout:
+            return False
+        job.status = STATUS_FAILED
+        job.error = 'Zadanie zostało przerwane (przekroczono limit czasu).'
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        return True
+
+    def prune_finished(self):
+        """Usuwa zadania starsze niż JOBS_RETENTION (wiersz, plik wynikowy i dane wejściowe). Zwraca ich liczbę.
+
+        Zadanie niezakończone tak stare na pewno zostało przerwane (retencja >= limit czasu).
+        PDF-y w cache raportów są osobnymi dowiązaniami, więc usunięcie wyniku ich nie rusza.
+        """
+        cutoff = datetime.utcnow() - self.retention
+        jobs = db.session.query(BackgroundJob.id, BackgroundJob.result_path).filter(
+            func.coalesce(BackgroundJob.finished_at, BackgroundJob.created_at) < cutoff
+        ).all()
+        if not jobs:
+            return 0
+        for job_id, result_path in jobs:
+            for path in (result_path, self.payload_path(job_id)):
+                if path and os.path.exists(path):
+                    try:
+                        os.remove(path)
+                    except OSError as e:
+                        print(f"Nie udało się usunąć pliku zadania #{job_id}: {e}")
+        BackgroundJob.query.filter(
+            BackgroundJob.id.in_([job_id for job_id, _ in jobs])
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return len(jobs)
+
+    def shutdown(self):
+        if self._pid != os.getpid():
+            return
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+
+    def _reset_after_fork(self):
+        # Po forku (gunicorn) pule rodzica nie działają - każdy proces tworzy własne
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._executor = None
+            self._process_pool = None
+
+    def _get_executor(self):
+        with self._lock:
+            self._reset_after_fork()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='background-job')
+            return self._executor
+
+    def _get_process_pool(self):
+        with self._lock:
+            self._reset_after_fork()
+            if self._process_pool is None:
+                # 'spawn' zamiast 'fork' - proces z działającymi wątkami nie jest bezpiecznie forkowalny
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self.process_workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._process_pool
+
+    def _execute(self, job_id):
+        with self.app.app_context():
+            job = db.session.get(BackgroundJob, job_id)
+            if job is None:
+                return
+            lock = self.serial_locks.get(job.kind)
+            if lock is None:
+                self._run(job)
+                return
+            # Koniec transakcji przed czekaniem - nie trzymamy połączenia ani starego odczytu
+            db.session.rollback()
+            with lock:
+                job = db.session.get(BackgroundJob, job_id)
+                # W czasie czekania zadanie mogło zostać uznane za przerwane (expire_stale)
+                if job is not None and not job.is_finished:
+                    self._run(job)
+
+    def _run(self, job):
+        job_id = job.id
+        job.status = STATUS_RUNNING
+        job.started_at = datetime.utcnow()
+        db.session.commit()
+        try:
+            self.handlers[job.kind](job)
+            job.status = STATUS_DONE
+            job.progress = 100
+        except Exception as e:
+            db.session.rollback()
+            job = db.session.get(BackgroundJob, job_id)
+            job.status = STATUS_FAILED
+            job.error = str(e)
+            print(f"Błąd zadania w tle #{job_id} ({job.kind}): {e}")
+        finally:
+            payload = self.payload_path(job_id)
+            if os.path.exists(payload):
+                os.remove(payload)
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        on_success = self.success_hooks.get(job.kind)
+        if on_success is not None and job.status == STATUS_DONE:
+            try:
+                on_success(job)
+            except Exception as e:
+                print(f"Błąd po zakończeniu zadania w tle #{job_id} ({job.kind}): {e}")
+
+
+def job_params(job):
+    return json.loads(job.params) if job.params else {}
+
+
+job_runner = JobRunner()
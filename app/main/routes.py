@@ -1,6 +1,11 @@
-from flask import Blueprint, render_template, redirect, url_for
+import os
+from flask import Blueprint, render_template, redirect, url_for, jsonify, send_file, abort, get_template_attribute
 from flask_login import login_required, current_user
-from app.models import db, RawMaterial, Packaging, FinishedProduct, Order, ProductionOrder, Task, VacationRequest, TeamOrder
+from app.models import Order, ProductionOrder, Task, VacationRequest, TeamOrder, User, BackgroundJob
+from app.inventory import low_stock_raw_materials, low_stock_packaging, low_stock_finished_products
+from app.jobs import job_runner, job_params, STATUS_DONE
+from app.cache import cache
+from app.utils import DASHBOARD_TTL
 
 bp = Blueprint('main', __name__)
 
@@ -12,46 +17,90 @@ def index():
 @bp.route('/dashboard')
 @login_required
 def dashboard():
-    # --- MAGAZYNY ---
-    low_stock_materials = []
-    all_materials = RawMaterial.query.all()
-    for material in all_materials:
-        current_stock = sum(batch.quantity_on_hand for batch in material.batches)
-        if material.critical_stock_level > 0 and current_stock < material.critical_stock_level:
-            material.current_stock = current_stock
-            low_stock_materials.append(material)
+    # Każda sekcja to gotowy HTML z cache (app/utils.py: invalidate_dashboard), liczony tylko po unieważnieniu
+    user_id = current_user.id
+    sections = {
+        # --- ZADANIA ---
+        'tasks': _dashboard_section('tasks', 'tasks', lambda: Task.query.filter(
+            Task.assignees.any(User.id == user_id), Task.status == 'Nowe'
+        ).order_by(Task.creation_date.desc()).all(), user_id),
+        # --- MAGAZYNY --- (listy niskich stanów z app/inventory.py)
+        'low_stock_materials': _dashboard_section('low_stock', 'low_stock_materials', low_stock_raw_materials),
+        'low_stock_packaging': _dashboard_section('low_stock', 'low_stock_packaging', low_stock_packaging),
+        'low_stock_finished_products': _dashboard_section('low_stock', 'low_stock_finished_products', low_stock_finished_products),
+        # --- ZAMÓWIENIA ---
+        'active_orders': _dashboard_section('orders', 'active_orders', lambda: Order.query.filter_by(
+            is_archived=False
+        ).order_by(Order.order_date.desc()).limit(5).all()),
+        'orders_to_invoice': _dashboard_section('orders', 'orders_to_invoice', lambda: Order.query.filter_by(
+            is_archived=True, invoice_number=None
+        ).order_by(Order.order_date.desc()).limit(5).all()),
+        # --- PRODUKCJA ---
+        'open_production_orders': _dashboard_section('production', 'open_production_orders', lambda: ProductionOrder.query.filter(
+            ProductionOrder.quantity_produced == 0
+        ).order_by(ProductionOrder.order_date.desc()).limit(5).all()),
+    }
 
-    low_stock_packaging = Packaging.query.filter(Packaging.quantity_in_stock < Packaging.critical_stock_level, Packaging.critical_stock_level > 0).order_by(Packaging.name).all()
-    low_stock_finished_products = FinishedProduct.query.filter(FinishedProduct.quantity_in_stock < FinishedProduct.critical_stock_level, FinishedProduct.critical_stock_level > 0).order_by(FinishedProduct.name).all()
+    # --- SEKCJE TYLKO DLA ADMINA ---
+    if current_user.has_role('admin'):
+        sections['vacations'] = _dashboard_section('vacations', 'vacations', lambda: VacationRequest.query.filter_by(
+            status='Oczekuje'
+        ).order_by(VacationRequest.request_date.asc()).all())
+        sections['team_orders'] = _dashboard_section('team_orders', 'team_orders', lambda: TeamOrder.query.filter_by(
+            status='Oczekuje'
+        ).order_by(TeamOrder.order_date.desc()).all())
 
-    # --- ZAMÓWIENIA ---
-    active_orders = Order.query.filter_by(is_archived=False).order_by(Order.order_date.desc()).limit(5).all()
-    orders_to_invoice = Order.query.filter_by(is_archived=True, invoice_number=None).order_by(Order.order_date.desc()).limit(5).all()
+    return render_template('dashboard.html', sections=sections)
 
-    # --- PRODUKCJA ---
-    open_production_orders = ProductionOrder.query.filter(ProductionOrder.quantity_produced == 0).order_by(ProductionOrder.order_date.desc()).limit(5).all()
+def _dashboard_section(section, macro, load, user_id=None):
+    """HTML sekcji pulpitu z cache; przy braku wpisu ładuje dane i renderuje makro z dashboard_sections.html."""
+    def render():
+        return get_template_attribute('dashboard_sections.html', macro)(load())
+    return cache.get_or_set((f'dashboard_{section}', macro, user_id), render, DASHBOARD_TTL)
 
-    # --- ZADANIA ---
-    new_tasks_for_user = Task.query.filter(Task.assignees.contains(current_user), Task.status == 'Nowe').order_by(Task.creation_date.desc()).all()
 
-    # --- SEKCJE TYLKO DLA ADMINA ---
-    pending_vacations = []
-    pending_team_orders = [] # Inicjalizujemy pustą listę
-    if current_user.has_role('admin'):
-        pending_vacations = VacationRequest.query.filter_by(status='Oczekuje').order_by(VacationRequest.request_date.asc()).all()
-        # --- NOWA LOGIKA ---
-        pending_team_orders = TeamOrder.query.filter_by(status='Oczekuje').order_by(TeamOrder.order_date.desc()).all()
-        # -------------------
-
-    return render_template(
-        'dashboard.html',
-        low_stock_materials=low_stock_materials,
-        low_stock_packaging=low_stock_packaging,
-        low_stock_finished_products=low_stock_finished_products,
-        active_orders=active_orders,
-        orders_to_invoice=orders_to_invoice,
-        open_production_orders=open_production_orders,
-        new_tasks_for_user=new_tasks_for_user,
-        pending_vacations=pending_vacations,
-        pending_team_orders=pending_team_orders # <-- Przekazanie do widoku
-    )
\ No newline at end of file
+# --- ZADANIA W TLE ---
+def _get_job_or_404(job_id):
+    job = BackgroundJob.query.get_or_404(job_id)
+    if job.user_id != current_user.id and not current_user.has_role('admin'):
+        abort(404)
+    job_runner.expire_stale(job)
+    return job
+
+def _job_details_url(job):
+    """Adres strony z wynikiem zadania (params['details_endpoint']), gdy zadanie się zakończyło."""
+    endpoint = job_params(job).get('details_endpoint')
+    if job.status != STATUS_DONE or not endpoint:
+        return None
+    return url_for(endpoint, job_id=job.id)
+
+@bp.route('/jobs/<int:job_id>')
+@login_required
+def job_status(job_id):
+    job = _get_job_or_404(job_id)
+    return render_template('job_status.html', job=job, title=job_params(job).get('title', 'Zadanie w tle'),
+                           details_url=_job_details_url(job))
+
+@bp.route('/jobs/<int:job_id>/status')
+@login_required
+def job_status_json(job_id):
+    job = _get_job_or_404(job_id)
+    ready = job.status == STATUS_DONE and bool(job.result_path)
+    return jsonify(
+        id=job.id,
+        status=job.status,
+        finished=job.is_finished,
+        progress=job.progress,
+        message=job.message,
+        error=job.error,
+        download_url=url_for('main.job_download', job_id=job.id) if ready else None,
+        details_url=_job_details_url(job)
+    )
+
+@bp.route('/jobs/<int:job_id>/download')
+@login_required
+def job_download(job_id):
+    job = _get_job_or_404(job_id)
+    if job.status != STATUS_DONE or not job.result_path or not os.path.exists(job.result_path):
+        abort(404)
+    return send_file(job.result_path, as_attachment=True, download_name=job.result_filename)
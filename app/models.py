@@ -37,7 +37,7 @@ class User(db.Model, UserMixin):
     address_city = db.Column(db.String(100), nullable=True)
     phone_number = db.Column(db.String(20), nullable=True)
 
-    assigned_tasks = db.relationship('Task', secondary=task_assignees, lazy='subquery',
+    assigned_tasks = db.relationship('Task', secondary=task_assignees, lazy='select',
                                      backref=db.backref('assignees', lazy=True))
 
     def has_role(self, role_name):
@@ -51,7 +51,7 @@ class Task(db.Model):
     creation_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     priority = db.Column(db.Integer, nullable=False, default=1) 
     due_date = db.Column(db.Date, nullable=True)
-    status = db.Column(db.String(50), nullable=False, default='Nowe')
+    status = db.Column(db.String(50), nullable=False, default='Nowe', index=True)
     assigner_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     assigner = db.relationship('User', foreign_keys=[assigner_id], backref='created_tasks')
     attachments = db.relationship('TaskAttachment', backref='task', lazy=True, cascade="all, delete-orphan")
@@ -76,6 +76,7 @@ class RawMaterial(db.Model):
     category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
     critical_stock_level = db.Column(db.Float, nullable=False, default=0)
     batches = db.relationship('RawMaterialBatch', backref='material', lazy=True, cascade="all, delete-orphan")
+    stock = db.relationship('RawMaterialStock', uselist=False, lazy=True, cascade="all, delete-orphan")
     unit_price = db.Column(db.Float, nullable=False, default=0.0, server_default="0.0")
 
 
@@ -87,6 +88,16 @@ class RawMaterialBatch(db.Model):
     quantity_on_hand = db.Column(db.Float, nullable=False, default=0.0)
     unit = db.Column(db.String(20), nullable=False)
     received_date = db.Column(db.Date, nullable=False, default=date.today)
+    # Partie surowca od najstarszej (FIFO przy rozchodzie)
+    __table_args__ = (
+        db.Index('ix_raw_material_batches_material_received', 'raw_material_id', 'received_date'),
+    )
+
+class RawMaterialStock(db.Model):
+    # Bieżąca suma quantity_on_hand wszystkich partii surowca (patrz app/warehouse/stock.py)
+    __tablename__ = 'raw_material_stocks'
+    raw_material_id = db.Column(db.Integer, db.ForeignKey('raw_materials.id'), primary_key=True)
+    total_quantity = db.Column(db.Float, nullable=False, default=0.0)
 
 class FinishedProductCategory(db.Model):
     __tablename__ = 'finished_product_categories'
@@ -126,7 +137,7 @@ class FinishedProduct(db.Model):
     __tablename__ = 'finished_products'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(150), unique=True, nullable=False)
-    product_code = db.Column(db.String(50), nullable=True)
+    product_code = db.Column(db.String(50), nullable=True, index=True)
     category_id = db.Column(db.Integer, db.ForeignKey('finished_product_categories.id'), nullable=True)
     packaging_weight_kg = db.Column(db.Float, nullable=False, default=1.0)
     unit = db.Column(db.String(10), nullable=False, server_default='szt.')
@@ -138,22 +149,10 @@ class FinishedProduct(db.Model):
     
     def calculate_production_cost(self):
         """Wylicza koszt wytworzenia 1 jednostki (szt/kg) produktu."""
-        total_cost = 0.0
-        
-        # 1. Koszt składników z receptury
-        for component in self.recipe_components:
-            if component.raw_material:
-                total_cost += component.quantity_required * (component.raw_material.unit_price or 0)
-            elif component.sub_product:
-                # Rekurencyjne obliczenie dla półproduktów
-                total_cost += component.quantity_required * component.sub_product.calculate_production_cost()
-        
-        # 2. Koszt opakowań (BOM)
-        for pkg_item in self.packaging_bill:
-            if pkg_item.packaging:
-                total_cost += pkg_item.quantity_required * (pkg_item.packaging.unit_price or 0)
-                
-        return round(total_cost, 2)
+        # Koszty całego katalogu liczone są naraz i cache'owane (app/production/costing.py)
+        from app.production.costing import get_production_cost
+        cost = get_production_cost(self.id)
+        return cost if cost is not None else 0.0
 
 class RecipeComponent(db.Model):
     __tablename__ = 'recipe_components'
@@ -186,11 +185,23 @@ class ProductionOrder(db.Model):
     @property
     def production_date(self):
         return self.order_date.date()
+    # Stronicowanie historii kursorem po (order_date, id) - patrz app/production/history.py
+    __table_args__ = (
+        db.Index('ix_production_orders_order_date_id', 'order_date', 'id'),
+    )
+
+class ProductionStatRollup(db.Model):
+    # Dzienne sumy produkcji produktu dla statystyk (patrz app/production/stats.py)
+    __tablename__ = 'production_stat_rollups'
+    production_day = db.Column(db.Date, primary_key=True)
+    finished_product_id = db.Column(db.Integer, db.ForeignKey('finished_products.id'), primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    quantity_produced = db.Column(db.Integer, nullable=False, default=0)
 
 class ProductionLog(db.Model):
     __tablename__ = 'production_logs'
     id = db.Column(db.Integer, primary_key=True)
-    production_order_id = db.Column(db.Integer, db.ForeignKey('production_orders.id'), nullable=False)
+    production_order_id = db.Column(db.Integer, db.ForeignKey('production_orders.id'), nullable=False, index=True)
     raw_material_batch_id = db.Column(db.Integer, db.ForeignKey('raw_material_batches.id'), nullable=True)
     sub_product_order_id = db.Column(db.Integer, db.ForeignKey('production_orders.id'), nullable=True)
     quantity_consumed = db.Column(db.Float, nullable=False)
@@ -218,6 +229,10 @@ class Order(db.Model):
     is_archived = db.Column(db.Boolean, nullable=False, default=False)
     invoice_number = db.Column(db.String(100), nullable=True)
     products_in_order = db.relationship('OrderProduct', backref='order', lazy=True, cascade="all, delete-orphan")
+    # Aktywne zamówienia i zarchiwizowane bez faktury
+    __table_args__ = (
+        db.Index('ix_orders_archived_invoice', 'is_archived', 'invoice_number'),
+    )
 
 class OrderProduct(db.Model):
     __tablename__ = 'order_products'
@@ -235,7 +250,7 @@ class VacationRequest(db.Model):
     start_date = db.Column(db.Date, nullable=False)
     end_date = db.Column(db.Date, nullable=False)
     request_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
-    status = db.Column(db.String(50), nullable=False, default='Oczekuje')
+    status = db.Column(db.String(50), nullable=False, default='Oczekuje', index=True)
     # --- NOWA KOLUMNA ---
     category = db.Column(db.String(50), nullable=False, default='Wypoczynkowy')
     # --------------------
@@ -249,13 +264,26 @@ class SalesReportLog(db.Model):
     product_id = db.Column(db.Integer, db.ForeignKey('finished_products.id'), nullable=False)
     report_date = db.Column(db.Date, nullable=False)
     quantity_sold = db.Column(db.Integer, nullable=False)
+    # Liczba dni okresu raportu ("ZA OKRES: od - do"), licząc od report_date
+    period_days = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     product = db.relationship('FinishedProduct')
+    __table_args__ = (
+        # Jeden wpis na produkt i datę raportu - równoległy import tej samej daty kończy się błędem
+        db.Index('ix_sales_report_logs_product_date', 'product_id', 'report_date', unique=True),
+    )
+
+class ProductDailySales(db.Model):
+    # Sprzedaż produktu rozłożona na dni okresów raportów (patrz app/finished_goods/sales_velocity.py)
+    __tablename__ = 'product_daily_sales'
+    product_id = db.Column(db.Integer, db.ForeignKey('finished_products.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True, index=True)
+    quantity = db.Column(db.Float, nullable=False, default=0)
 
 class ActivityLog(db.Model):
     __tablename__ = 'activity_logs'
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
     action = db.Column(db.Text, nullable=False)
     url = db.Column(db.String(255), nullable=True)
     user = db.relationship('User', backref='activity_logs')
@@ -270,6 +298,9 @@ class TeamOrder(db.Model):
     notes = db.Column(db.Text, nullable=True)
     admin_notes = db.Column(db.Text, nullable=True)
     user = db.relationship('User', backref='team_orders')
+    __table_args__ = (
+        db.Index('ix_team_orders_status_date', 'status', 'order_date'),
+    )
     products = db.relationship('TeamOrderProduct', backref='order', cascade="all, delete-orphan")
 
 class TeamOrderProduct(db.Model):
@@ -278,4 +309,118 @@ class TeamOrderProduct(db.Model):
     team_order_id = db.Column(db.Integer, db.ForeignKey('team_orders.id'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('finished_products.id'), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
-    product = db.relationship('FinishedProduct')
\ No newline at end of file
+    product = db.relationship('FinishedProduct')
+# === ZADANIA W TLE ===
+class BackgroundJob(db.Model):
+    __tablename__ = 'background_jobs'
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    # 'Oczekuje', 'W toku', 'Gotowe', 'Błąd'
+    status = db.Column(db.String(20), nullable=False, default='Oczekuje')
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    params = db.Column(db.Text, nullable=True) # JSON
+    progress = db.Column(db.Integer, nullable=False, default=0) # 0-100
+    message = db.Column(db.String(255), nullable=True)
+    result_path = db.Column(db.String(500), nullable=True)
+    result_filename = db.Column(db.String(255), nullable=True)
+    result_data = db.Column(db.Text, nullable=True) # JSON
+    error = db.Column(db.Text, nullable=True)
+    user = db.relationship('User')
+
+    @property
+    def is_finished(self):
+        return self.status in ('Gotowe', 'Błąd')
+
+# === MODUŁ DŁUŻNIKÓW: ZAPISANE WYNIKI UZGODNIEŃ ===
+debtor_file_invoices = db.Table('debtor_file_invoices',
+    db.Column('file_id', db.Integer, db.ForeignKey('debtor_files.id'), primary_key=True),
+    db.Column('invoice_id', db.Integer, db.ForeignKey('debtor_invoices.id'), primary_key=True)
+)
+
+debtor_file_payments = db.Table('debtor_file_payments',
+    db.Column('file_id', db.Integer, db.ForeignKey('debtor_files.id'), primary_key=True),
+    db.Column('payment_id', db.Integer, db.ForeignKey('debtor_payments.id'), primary_key=True)
+)
+
+debtor_run_files = db.Table('debtor_run_files',
+    db.Column('run_id', db.Integer, db.ForeignKey('debtor_runs.id'), primary_key=True),
+    db.Column('file_id', db.Integer, db.ForeignKey('debtor_files.id'), primary_key=True)
+)
+
+class DebtorFile(db.Model):
+    __tablename__ = 'debtor_files'
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), unique=True, nullable=False)
+    kind = db.Column(db.String(10), nullable=False) # 'csv' lub 'pdf'
+    filename = db.Column(db.String(255), nullable=False)
+    uploaded_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    row_count = db.Column(db.Integer, nullable=False, default=0)
+
+class DebtorInvoice(db.Model):
+    __tablename__ = 'debtor_invoices'
+    id = db.Column(db.Integer, primary_key=True)
+    number = db.Column(db.String(100), nullable=False)
+    number_upper = db.Column(db.String(100), unique=True, nullable=False)
+    contractor = db.Column(db.String(255), nullable=True)
+    amount = db.Column(db.Float, nullable=False)
+    issue_date = db.Column(db.String(10), nullable=True) # RRRR-MM-DD jak w rejestrze
+    # Decyzja dopasowania: wpłata przypisana do faktury (jeden-do-jednego)
+    payment_id = db.Column(db.Integer, db.ForeignKey('debtor_payments.id'), unique=True, nullable=True)
+    match_method = db.Column(db.String(50), nullable=True)
+    matched_at = db.Column(db.DateTime, nullable=True)
+    # Uruchomienie, które dopasowało fakturę - pozwala cofnąć dopasowania jednego uruchomienia
+    match_run_id = db.Column(db.Integer, db.ForeignKey('debtor_runs.id'), nullable=True, index=True)
+    # Dopasowanie cofnięte - następne uruchomienie porówna fakturę ze wszystkimi wolnymi wpłatami
+    rematch_pending = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    payment = db.relationship('DebtorPayment')
+
+class DebtorPayment(db.Model):
+    __tablename__ = 'debtor_payments'
+    id = db.Column(db.Integer, primary_key=True)
+    # Skrót wiersza wyciągu - ten sam wiersz w kolejnym (narastającym) wyciągu nie jest dodawany ponownie
+    row_hash = db.Column(db.String(64), unique=True, nullable=False)
+    booking_date = db.Column(db.String(20), nullable=True)
+    value_date = db.Column(db.String(20), nullable=True)
+    title = db.Column(db.Text, nullable=True)
+    sender = db.Column(db.Text, nullable=True)
+    amount = db.Column(db.Float, nullable=False)
+    invoice_number_from_title = db.Column(db.String(100), nullable=True)
+
+class DebtorRun(db.Model):
+    __tablename__ = 'debtor_runs'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    csv_filename = db.Column(db.String(255), nullable=True)
+    pdf_filenames = db.Column(db.Text, nullable=True)
+    new_invoices = db.Column(db.Integer, nullable=False, default=0)
+    new_payments = db.Column(db.Integer, nullable=False, default=0)
+    new_matches = db.Column(db.Integer, nullable=False, default=0)
+    user = db.relationship('User')
+    files = db.relationship('DebtorFile', secondary=debtor_run_files, lazy='subquery')
+
+class DebtorResultRow(db.Model):
+    """Wiersz wyniku uruchomienia (sekcja 'paid' / 'unpaid' / 'other') - stronicowany po stronie serwera."""
+    __tablename__ = 'debtor_result_rows'
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.Integer, db.ForeignKey('debtor_runs.id'), nullable=False)
+    section = db.Column(db.String(10), nullable=False)
+    position = db.Column(db.Integer, nullable=False) # domyślna kolejność z przetwarzania
+    status = db.Column(db.String(50), nullable=True)
+    invoice_number = db.Column(db.String(100), nullable=True)
+    contractor = db.Column(db.String(255), nullable=True)
+    invoice_amount = db.Column(db.Float, nullable=True)
+    payment_amount = db.Column(db.Float, nullable=True)
+    amount_difference = db.Column(db.Float, nullable=True)
+    title_invoice_number = db.Column(db.String(100), nullable=True)
+    booking_date = db.Column(db.String(20), nullable=True)
+    booking_day = db.Column(db.Date, nullable=True) # do sortowania po dacie księgowania
+    payment_title = db.Column(db.Text, nullable=True)
+    sender = db.Column(db.Text, nullable=True)
+    repeat_contractor = db.Column(db.Boolean, nullable=False, default=False)
+    __table_args__ = (
+        db.Index('ix_debtor_result_rows_run_section_position', 'run_id', 'section', 'position'),
+    )
@@ -4,7 +4,7 @@ from app.models import db, Client, Order, OrderProduct, ClientProduct
 from datetime import datetime
 from flask_login import login_required
 from app.decorators import permission_required
-from app.utils import log_activity
+from app.utils import log_activity, invalidate_dashboard
 
 bp = Blueprint('orders', __name__, template_folder='templates', url_prefix='/orders')
 
@@ -50,6 +50,7 @@ def edit_client(id):
     if new_name:
         client.name = new_name
         db.session.commit()
+        invalidate_dashboard('orders')
         flash("Nazwa klienta została zaktualizowana.", "success")
     return redirect(url_for('orders.manage_clients'))
 
@@ -60,6 +61,7 @@ def delete_client(id):
     client = Client.query.get_or_404(id)
     db.session.delete(client)
     db.session.commit()
+    invalidate_dashboard('orders')
     flash(f"Klient '{client.name}' został usunięty.", "danger")
     return redirect(url_for('orders.manage_clients'))
 
@@ -105,6 +107,7 @@ def add_order(id):
     new_order = Order(client_id=client.id, order_date=datetime.utcnow())
     db.session.add(new_order)
     db.session.commit()
+    invalidate_dashboard('orders')
 
     # Logowanie aktywności
     log_activity(f"Utworzył nowe zamówienie #{new_order.id} dla klienta: '{client.name}'",
@@ -171,6 +174,7 @@ def archive_order(id):
     if invoice_number:
         order.invoice_number = invoice_number
     db.session.commit()
+    invalidate_dashboard('orders')
 
     # Logowanie aktywności
     if order.invoice_number:
@@ -192,6 +196,7 @@ def delete_archived_order(id):
     if order_to_delete.is_archived:
         db.session.delete(order_to_delete)
         db.session.commit()
+        invalidate_dashboard('orders')
         flash("Zarchiwizowane zamówienie zostało trwale usunięte.", "danger")
     else:
         flash("Nie można usunąć aktywnego zamówienia.", "warning")
@@ -5,6 +5,7 @@ from flask_login import login_required
 from app.decorators import permission_required
 from sqlalchemy.orm import joinedload
 from sqlalchemy import asc, desc
+from app.inventory import low_stock_packaging, invalidate_inventory_health
 
 bp = Blueprint('packaging', __name__, template_folder='templates', url_prefix='/packaging')
 
@@ -27,6 +28,7 @@ def index():
         )
         db.session.add(new_packaging)
         db.session.commit()
+        invalidate_inventory_health()
         flash('Dodano nowe opakowanie na stan.', 'success')
         return redirect(url_for('packaging.index'))
 
@@ -47,20 +49,12 @@ def index():
     
     all_packaging = query.all()
 
-    # --- NOWY FRAGMENT ---
-    # Wyszukaj opakowania poniżej stanu krytycznego
-    low_stock_packaging = [
-        p for p in all_packaging 
-        if p.critical_stock_level > 0 and p.quantity_in_stock < p.critical_stock_level
-    ]
-    # ---------------------
-
     categories = PackagingCategory.query.order_by(PackagingCategory.name).all()
     
     return render_template('packaging_index.html', 
                            categories=categories, 
                            all_packaging=all_packaging,
-                           low_stock_packaging=low_stock_packaging, # <-- Przekazanie do widoku
+                           low_stock_packaging=low_stock_packaging(), # <-- Przekazanie do widoku
                            sort_by=sort_by,
                            order=order)
 
@@ -77,6 +71,7 @@ def edit_stock(packaging_id):
             packaging_item.quantity_in_stock = new_quantity
             packaging_item.critical_stock_level = critical_stock_level # <-- NOWA LINIA
             db.session.commit()
+            invalidate_inventory_health()
             flash(f"Zaktualizowano dane dla '{packaging_item.name}'.", "success")
             return redirect(url_for('packaging.index'))
         else:
@@ -94,6 +89,7 @@ def delete_packaging(packaging_id):
     else:
         db.session.delete(packaging_item)
         db.session.commit()
+        invalidate_inventory_health()
         flash(f"Opakowanie '{packaging_item.name}' zostało usunięte.", "success")
     return redirect(url_for('packaging.index'))
 
@@ -127,6 +123,7 @@ def edit_category(id):
     if new_name:
         category.name = new_name
         db.session.commit()
+        invalidate_inventory_health()
         flash("Nazwa kategorii została zaktualizowana.", "success")
     return redirect(url_for('packaging.manage_categories'))
 
@@ -140,5 +137,6 @@ def delete_category(id):
     else:
         db.session.delete(category)
         db.session.commit()
+        invalidate_inventory_health()
         flash(f"Kategoria '{category.name}' została usunięta.", "danger")
     return redirect(url_for('packaging.manage_categories'))
\ No newline at end of file
@@ -0,0 +1,208 @@
+# app/production/allocation.py
+"""
+Silnik rozchodu surowców metodą FIFO dla zleceń produkcyjnych.
+
+Całą recepturę, opakowania i partie surowców pobieramy kilkoma zapytaniami,
+rozchód liczymy w pamięci (jednostki normalizujemy do gramów tylko raz),
+a zmiany stanów i logi zużycia zapisujemy zbiorczo.
+"""
+from sqlalchemy import bindparam, func, insert
+from sqlalchemy.orm import joinedload
+from app.models import db, FinishedProduct, RecipeComponent, ProductPackaging, ProductionOrder, RawMaterialBatch, ProductionLog
+from app.warehouse.stock import adjust_material_stock
+
+
+def convert_unit(quantity, from_unit, to_unit='g'):
+    """Przelicza ilość na gramy (lub kg). Jednostki inne niż masa zwraca bez zmian."""
+    from_unit = from_unit.lower()
+    grams = 0
+    if from_unit == 'kg':
+        grams = quantity * 1000
+    elif from_unit in ['g', 'ml']:
+        grams = quantity
+    else: # Dla 'szt.' i innych
+        return quantity
+
+    if to_unit.lower() == 'kg':
+        return grams / 1000
+    return grams
+
+
+class ProductionPlan:
+    """Wynik planowania zlecenia: ilość opakowań, braki oraz rozchód partii."""
+
+    def __init__(self, product, batch_size):
+        self.product = product
+        self.batch_size = batch_size
+        self.components = []
+        self.packaging_bill = []
+        self.planned_quantity = 0
+        self.total_production_weight_g = 0
+        self.packaging_weight_g = 0
+        self.missing_components = []
+        self.missing_packaging = []
+        # Lista krotek (partia, nowa ilość na stanie, zużyta ilość) w jednostce partii
+        self.batch_draws = []
+        # Lista krotek (komponent, zużyta ilość, id zlecenia źródłowego półproduktu)
+        self.sub_product_draws = []
+
+    @property
+    def has_recipe(self):
+        return bool(self.components)
+
+    @property
+    def is_feasible(self):
+        return not self.missing_components and not self.missing_packaging
+
+
+def _load_batches(raw_material_ids):
+    """Jedno zapytanie: niepuste partie wszystkich surowców receptury, od najstarszej."""
+    batches_by_material = {material_id: [] for material_id in raw_material_ids}
+    if not raw_material_ids:
+        return batches_by_material
+    batches = RawMaterialBatch.query.filter(
+        RawMaterialBatch.raw_material_id.in_(raw_material_ids),
+        RawMaterialBatch.quantity_on_hand > 0
+    ).order_by(RawMaterialBatch.received_date, RawMaterialBatch.id).all()
+    for batch in batches:
+        batches_by_material[batch.raw_material_id].append(batch)
+    return batches_by_material
+
+
+def _load_latest_orders(sub_product_ids):
+    """Jedno zapytanie: id najnowszego zlecenia produkcyjnego dla każdego półproduktu."""
+    if not sub_product_ids:
+        return {}
+    latest_dates = db.session.query(
+        ProductionOrder.finished_product_id.label('product_id'),
+        func.max(ProductionOrder.order_date).label('max_date')
+    ).filter(ProductionOrder.finished_product_id.in_(sub_product_ids)).group_by(ProductionOrder.finished_product_id).subquery()
+
+    rows = db.session.query(ProductionOrder.finished_product_id, ProductionOrder.id).join(
+        latest_dates,
+        (ProductionOrder.finished_product_id == latest_dates.c.product_id) & (ProductionOrder.order_date == latest_dates.c.max_date)
+    ).all()
+
+    latest_orders = {}
+    for product_id, order_id in rows:
+        latest_orders[product_id] = max(order_id, latest_orders.get(product_id, 0))
+    return latest_orders
+
+
+def build_production_plan(product, batch_size):
+    """Sprawdza dostępność zasobów i wylicza rozchód FIFO bez zapisu do bazy."""
+    plan = ProductionPlan(product, batch_size)
+
+    plan.components = RecipeComponent.query.options(
+        joinedload(RecipeComponent.raw_material),
+        joinedload(RecipeComponent.sub_product)
+    ).filter_by(finished_product_id=product.id).all()
+    if not plan.components:
+        return plan
+
+    plan.packaging_bill = ProductPackaging.query.options(
+        joinedload(ProductPackaging.packaging)
+    ).filter_by(finished_product_id=product.id).all()
+
+    total_recipe_weight_g = sum(convert_unit(c.quantity_required, c.unit) for c in plan.components)
+    plan.packaging_weight_g = product.packaging_weight_kg * 1000
+    if plan.packaging_weight_g > 0:
+        plan.total_production_weight_g = total_recipe_weight_g * batch_size
+        plan.planned_quantity = int(plan.total_production_weight_g / plan.packaging_weight_g)
+    else:
+        plan.planned_quantity = batch_size
+    if plan.planned_quantity <= 0:
+        return plan
+
+    raw_components = [c for c in plan.components if c.raw_material]
+    sub_components = [c for c in plan.components if not c.raw_material and c.sub_product]
+    batches_by_material = _load_batches([c.raw_material_id for c in raw_components])
+
+    # Stan partii w gramach liczony raz; współdzielony, gdyby surowiec wystąpił kilkukrotnie
+    remaining_g = {}
+    for batches in batches_by_material.values():
+        for batch in batches:
+            remaining_g[batch.id] = convert_unit(batch.quantity_on_hand, batch.unit)
+
+    taken_g = {}
+    for component in raw_components:
+        required_g = convert_unit(component.quantity_required * batch_size, component.unit)
+        batches = batches_by_material[component.raw_material_id]
+        available_g = sum(remaining_g[b.id] for b in batches)
+        if available_g < required_g:
+            shortage = convert_unit(required_g - available_g, 'g', component.unit)
+            plan.missing_components.append(f"{component.raw_material.name} (brakuje: {shortage:.0f} {component.unit})")
+            continue
+
+        for batch in batches:
+            if required_g <= 0: break
+            take_g = min(remaining_g[batch.id], required_g)
+            if take_g <= 0: continue
+            remaining_g[batch.id] -= take_g
+            taken_g[batch.id] = taken_g.get(batch.id, 0) + take_g
+            required_g -= take_g
+
+    for component in sub_components:
+        required_quantity = component.quantity_required * batch_size
+        if component.sub_product.quantity_in_stock < required_quantity:
+            plan.missing_components.append(f"{component.sub_product.name} (brakuje: {int(required_quantity - component.sub_product.quantity_in_stock)} szt.)")
+
+    for item in plan.packaging_bill:
+        required_packaging = item.quantity_required * plan.planned_quantity
+        if item.packaging.quantity_in_stock < required_packaging:
+            plan.missing_packaging.append(f"{item.packaging.name} (brakuje: {required_packaging - item.packaging.quantity_in_stock})")
+
+    if not plan.is_feasible:
+        return plan
+
+    for component in raw_components:
+        for batch in batches_by_material[component.raw_material_id]:
+            if batch.id in taken_g:
+                plan.batch_draws.append((
+                    batch,
+                    convert_unit(remaining_g[batch.id], 'g', batch.unit),
+                    convert_unit(taken_g.pop(batch.id), 'g', batch.unit)
+                ))
+
+    latest_orders = _load_latest_orders([c.sub_product_id for c in sub_components])
+    for component in sub_components:
+        plan.sub_product_draws.append((
+            component,
+            component.quantity_required * batch_size,
+            latest_orders.get(component.sub_product_id)
+        ))
+    return plan
+
+
+def apply_production_plan(plan, order):
+    """Zbiorczo zapisuje rozchód partii, stany półproduktów i logi zużycia dla zlecenia."""
+    batch_table = RawMaterialBatch.__table__
+    product_table = FinishedProduct.__table__
+
+    if plan.batch_draws:
+        db.session.execute(
+            batch_table.update().where(batch_table.c.id == bindparam('b_id')).values(quantity_on_hand=bindparam('b_quantity')),
+            [{'b_id': batch.id, 'b_quantity': new_quantity} for batch, new_quantity, _ in plan.batch_draws]
+        )
+        stock_deltas = {}
+        for batch, new_quantity, _ in plan.batch_draws:
+            stock_deltas[batch.raw_material_id] = stock_deltas.get(batch.raw_material_id, 0) + new_quantity - batch.quantity_on_hand
+        adjust_material_stock(stock_deltas)
+
+    if plan.sub_product_draws:
+        db.session.execute(
+            product_table.update().where(product_table.c.id == bindparam('p_id')).values(
+                quantity_in_stock=product_table.c.quantity_in_stock - bindparam('p_quantity')
+            ),
+            [{'p_id': component.sub_product_id, 'p_quantity': quantity} for component, quantity, _ in plan.sub_product_draws]
+        )
+
+    logs = [
+        {'production_order_id': order.id, 'raw_material_batch_id': batch.id, 'sub_product_order_id': None, 'quantity_consumed': consumed}
+        for batch, _, consumed in plan.batch_draws
+    ] + [
+        {'production_order_id': order.id, 'raw_material_batch_id': None, 'sub_product_order_id': source_order_id, 'quantity_consumed': quantity}
+        for _, quantity, source_order_id in plan.sub_product_draws
+    ]
+    if logs:
+        db.session.execute(insert(ProductionLog.__table__), logs)
@@ -0,0 +1,120 @@
+# app/production/costing.py
+"""
+Kalkulacja kosztu wytworzenia produktów dla całego katalogu naraz.
+
+Graf receptur (RecipeComponent) i specyfikacje opakowań (ProductPackaging)
+wraz z cenami pobieramy kilkoma zapytaniami, a koszty liczymy jednym
+przejściem w porządku topologicznym (półprodukty przed produktami, które
+ich używają). Produkty w cyklu receptur nie mają kosztu (None).
+Wynik trzymamy w cache; zmiana ceny lub receptury unieważnia go w bieżącym
+workerze, a w pozostałych nieaktualny koszt żyje najwyżej COST_CACHE_TTL
+(tyle co sekcje pulpitu).
+"""
+from collections import deque
+from app.cache import cache
+from app.utils import DASHBOARD_TTL
+from app.models import db, FinishedProduct, RecipeComponent, RawMaterial, ProductPackaging, Packaging
+
+COST_CACHE_KEY = ('production_costs',)
+COST_CACHE_TTL = DASHBOARD_TTL
+
+
+def _load_recipe_graph():
+    """Zwraca (id produktów, składniki receptur, koszty opakowań) - trzy zapytania."""
+    product_ids = [row[0] for row in db.session.query(FinishedProduct.id).all()]
+
+    components = db.session.query(
+        RecipeComponent.finished_product_id,
+        RecipeComponent.sub_product_id,
+        RecipeComponent.quantity_required,
+        RawMaterial.unit_price
+    ).outerjoin(RawMaterial, RecipeComponent.raw_material_id == RawMaterial.id).all()
+
+    packaging_costs = db.session.query(
+        ProductPackaging.finished_product_id,
+        ProductPackaging.quantity_required,
+        Packaging.unit_price
+    ).join(Packaging, ProductPackaging.packaging_id == Packaging.id).all()
+
+    return product_ids, components, packaging_costs
+
+
+def compute_production_costs():
+    """Wylicza koszt 1 jednostki (szt/kg) każdego produktu. Zwraca {product_id: koszt lub None}."""
+    product_ids, components, packaging_costs = _load_recipe_graph()
+
+    base_cost = {product_id: 0.0 for product_id in product_ids}
+    sub_components = {product_id: [] for product_id in product_ids}
+    used_in = {product_id: [] for product_id in product_ids}
+
+    for product_id, sub_product_id, quantity, unit_price in components:
+        if sub_product_id is not None:
+            sub_components[product_id].append((sub_product_id, quantity))
+            used_in.setdefault(sub_product_id, []).append(product_id)
+        else:
+            base_cost[product_id] += quantity * (unit_price or 0)
+
+    for product_id, quantity, unit_price in packaging_costs:
+        base_cost[product_id] += quantity * (unit_price or 0)
+
+    # Algorytm Kahna: produkt liczymy, gdy znane są koszty wszystkich jego półproduktów
+    pending = {product_id: len(subs) for product_id, subs in sub_components.items()}
+    ready = deque(product_id for product_id, count in pending.items() if count == 0)
+    costs = {}
+    while ready:
+        product_id = ready.popleft()
+        total_cost = base_cost[product_id]
+        for sub_product_id, quantity in sub_components[product_id]:
+            total_cost += quantity * costs[sub_product_id]
+        costs[product_id] = round(total_cost, 2)
+        for parent_id in used_in.get(product_id, []):
+            pending[parent_id] -= 1
+            if pending[parent_id] == 0:
+                ready.append(parent_id)
+
+    # Co zostało, leży w cyklu receptur (lub od niego zależy)
+    for product_id in product_ids:
+        if product_id not in costs:
+            costs[product_id] = None
+            print(f"Ostrzeżenie: receptura produktu #{product_id} zawiera cykl - pominięto kalkulację kosztu.")
+    return costs
+
+
+def get_production_costs():
+    return cache.get_or_set(COST_CACHE_KEY, compute_production_costs, COST_CACHE_TTL)
+
+
+def get_production_cost(product_id):
+    """Koszt 1 jednostki produktu z cache. Dla produktu w cyklu receptur zwraca None."""
+    costs = get_production_costs()
+    if product_id not in costs:
+        invalidate_production_costs()
+        costs = get_production_costs()
+    return costs.get(product_id, 0.0)
+
+
+def invalidate_production_costs():
+    cache.delete(COST_CACHE_KEY)
+
+
+def would_create_cycle(product_id, sub_product_id):
+    """Sprawdza, czy dodanie sub_product_id do receptury product_id utworzy cykl."""
+    if product_id == sub_product_id:
+        return True
+    edges = {}
+    for parent_id, child_id in db.session.query(RecipeComponent.finished_product_id, RecipeComponent.sub_product_id).filter(
+        RecipeComponent.sub_product_id.isnot(None)
+    ).all():
+        edges.setdefault(parent_id, []).append(child_id)
+
+    # Cykl powstanie, jeśli product_id jest osiągalny z sub_product_id
+    stack, seen = [sub_product_id], set()
+    while stack:
+        current = stack.pop()
+        if current == product_id:
+            return True
+        if current in seen:
+            continue
+        seen.add(current)
+        stack.extend(edges.get(current, []))
+    return False
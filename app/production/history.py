@@ -0,0 +1,77 @@
+# app/production/history.py
+"""
+Stronicowana historia zleceń produkcyjnych (panel produkcji i lista zleceń).
+
+Historia tylko rośnie, więc zamiast OFFSET używamy stronicowania kursorem po
+(order_date, id): kolejna strona to zlecenia starsze od ostatniego pokazanego,
+a zapytanie idzie po indeksie ix_production_orders_order_date_id niezależnie od
+tego, jak daleko w historii jesteśmy. Produkty ładujemy tym samym zapytaniem
+(joinedload), żeby szablon nie doczytywał ich dla każdego wiersza.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import or_, and_
+from sqlalchemy.orm import joinedload
+from app.models import ProductionOrder
+
+HISTORY_PER_PAGE = 50
+
+
+def encode_cursor(order):
+    return f'{order.order_date.isoformat()}_{order.id}'
+
+
+def decode_cursor(cursor):
+    """'2025-05-31T10:15:00_42' -> (datetime, id); niepoprawny kursor -> None (pierwsza strona)."""
+    try:
+        order_date, order_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(order_date), int(order_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def parse_date(value):
+    """Data z filtra (RRRR-MM-DD) lub None, gdy pusta albo niepoprawna."""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def production_history_page(cursor=None, date_from=None, date_to=None, per_page=HISTORY_PER_PAGE):
+    """Zwraca (zlecenia od najnowszego, kursor następnej strony lub None).
+
+    date_from / date_to (daty, włącznie) zawężają historię do zakresu dni.
+    """
+    query = ProductionOrder.query.options(joinedload(ProductionOrder.finished_product))
+    if date_from:
+        query = query.filter(ProductionOrder.order_date >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        query = query.filter(ProductionOrder.order_date < datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+
+    position = decode_cursor(cursor)
+    if position:
+        order_date, order_id = position
+        query = query.filter(or_(
+            ProductionOrder.order_date < order_date,
+            and_(ProductionOrder.order_date == order_date, ProductionOrder.id < order_id)
+        ))
+
+    # Jeden wiersz więcej mówi, czy istnieje następna strona, bez osobnego COUNT
+    orders = query.order_by(ProductionOrder.order_date.desc(), ProductionOrder.id.desc()).limit(per_page + 1).all()
+    next_cursor = encode_cursor(orders[per_page - 1]) if len(orders) > per_page else None
+    return orders[:per_page], next_cursor
+
+
+def history_from_request(args):
+    """Czyta kursor i filtr dat z parametrów żądania. Zwraca słownik dla szablonu."""
+    date_from = parse_date(args.get('date_from'))
+    date_to = parse_date(args.get('date_to'))
+    cursor = args.get('cursor')
+    orders, next_cursor = production_history_page(cursor, date_from, date_to)
+    return {
+        'orders': orders,
+        'next_cursor': next_cursor,
+        'is_first_page': decode_cursor(cursor) is None,
+        'date_from': date_from,
+        'date_to': date_to,
+    }
@@ -5,7 +5,14 @@ from markupsafe import Markup
 from flask_login import login_required
 from app.decorators import permission_required
 import math
-from app.utils import log_activity
+from app.utils import log_activity, invalidate_dashboard
+from app.production.allocation import build_production_plan, apply_production_plan
+from app.warehouse.stock import adjust_material_stock
+from app.production.costing import invalidate_production_costs, would_create_cycle
+from app.production.history import history_from_request
+from app.production.stats import record_production, remove_product_stats
+from app.finished_goods.sales_velocity import remove_product_daily_sales
+from app.inventory import invalidate_inventory_health
 
 bp = Blueprint('production', __name__, template_folder='templates', url_prefix='/production')
 
@@ -15,10 +22,10 @@ bp = Blueprint('production', __name__, template_folder='templates', url_prefix='
 @login_required
 @permission_required('production')
 def manage_products():
-    # Pobieramy historię zleceń produkcyjnych
-    production_history = ProductionOrder.query.order_by(ProductionOrder.order_date.desc()).all()
+    # Pobieramy stronę historii zleceń produkcyjnych (kursor + opcjonalny zakres dat)
+    history = history_from_request(request.args)
     # Zwracamy szablon listy produktów, a NIE przekierowanie
-    return render_template('manage_finished_products.html', production_history=production_history)
+    return render_template('manage_finished_products.html', production_history=history['orders'], history=history)
 
 @bp.route('/catalogue', methods=['GET', 'POST'])
 @login_required
@@ -49,6 +56,7 @@ def manage_catalogue():
         )
         db.session.add(new_product)
         db.session.commit()
+        invalidate_inventory_health()
         flash('Dodano nowy produkt do katalogu.', 'success')
         return redirect(url_for('production.manage_catalogue'))
 
@@ -88,6 +96,8 @@ def edit_catalogue_product(id):
     product.unit = unit
     
     db.session.commit()
+    invalidate_inventory_health()
+    invalidate_dashboard('production')
     flash(f"Zaktualizowano produkt '{product.name}'.", 'success')
     
     # --- ZMIANA TUTAJ ---
@@ -116,8 +126,13 @@ def delete_product(id):
         flash(f"Nie można usunąć produktu '{product.name}', ponieważ jest on używany jako PÓŁPRODUKT w recepturze produktu '{usage_in_recipe.product.name}'.", "danger")
         return redirect(url_for('production.manage_catalogue'))
 
+    remove_product_stats(product.id)
+    remove_product_daily_sales(product.id)
     db.session.delete(product)
     db.session.commit()
+    invalidate_inventory_health()
+    invalidate_dashboard('production')
+    invalidate_production_costs()
     flash(f"Produkt '{product.name}' i jego historia produkcji zostały usunięte.", "danger")
     return redirect(url_for('production.manage_catalogue'))
 
@@ -149,6 +164,7 @@ def manage_recipe(id):
                 new_component = RecipeComponent(finished_product_id=id, raw_material_id=raw_material_id, quantity_required=quantity, unit=unit)
                 db.session.add(new_component)
                 db.session.commit()
+                invalidate_production_costs()
                 flash("Dodano surowiec do receptury.", "success")
 
         elif component_type == 'sub_product':
@@ -160,10 +176,13 @@ def manage_recipe(id):
             existing = RecipeComponent.query.filter_by(finished_product_id=id, sub_product_id=sub_product_id).first()
             if existing:
                 flash("Ten półprodukt już jest w recepturze.", "warning")
+            elif would_create_cycle(id, sub_product_id):
+                flash("Nie można dodać tego półproduktu - jego receptura zawiera już ten produkt (cykl receptur).", "danger")
             else:
                 new_component = RecipeComponent(finished_product_id=id, sub_product_id=sub_product_id, quantity_required=quantity, unit=unit)
                 db.session.add(new_component)
                 db.session.commit()
+                invalidate_production_costs()
                 flash("Dodano półprodukt do receptury.", "success")
         
         return redirect(url_for('production.manage_recipe', id=id))
@@ -181,6 +200,7 @@ def edit_recipe_component(id):
     component.quantity_required = request.form.get('quantity', type=float)
     component.unit = request.form.get('unit')
     db.session.commit()
+    invalidate_production_costs()
     flash("Zaktualizowano składnik w recepturze.", "success")
     return redirect(url_for('production.manage_recipe', id=component.finished_product_id))
 
@@ -198,115 +218,49 @@ def manage_production_orders():
             return redirect(url_for('production.manage_production_orders'))
 
         product = FinishedProduct.query.get_or_404(product_id)
-        
-        if not product.recipe_components.first():
+        plan = build_production_plan(product, batch_size)
+
+        if not plan.has_recipe:
             flash(f"BŁĄD: Nie można utworzyć zlecenia. Produkt '{product.name}' nie ma zdefiniowanej receptury.", 'danger')
             return redirect(url_for('production.manage_production_orders'))
 
-        missing_components = []
-        missing_packaging = []
-
-        def convert_unit(quantity, from_unit, to_unit='g'):
-            from_unit = from_unit.lower()
-            grams = 0
-            if from_unit == 'kg':
-                grams = quantity * 1000
-            elif from_unit in ['g', 'ml']:
-                grams = quantity
-            else: # Dla 'szt.' i innych
-                return quantity 
-
-            if to_unit.lower() == 'kg':
-                return grams / 1000
-            return grams
-
-        total_recipe_weight_g = 0
-        for component in product.recipe_components:
-            total_recipe_weight_g += convert_unit(component.quantity_required, component.unit)
-        
-        planned_quantity = 0
-        packaging_weight_g = product.packaging_weight_kg * 1000
-        if packaging_weight_g > 0:
-            total_production_weight_g = total_recipe_weight_g * batch_size
-            planned_quantity = int(total_production_weight_g / packaging_weight_g)
-        else:
-            planned_quantity = batch_size
-
-        if planned_quantity <= 0:
+        if plan.planned_quantity <= 0:
             flash(f"Nie można utworzyć zlecenia. Obliczona ilość opakowań wynosi zero. "
-                  f"Prawdopodobnie całkowita waga produkcji ({total_production_weight_g:.2f}g) jest mniejsza "
-                  f"niż waga jednego opakowania ({packaging_weight_g:.2f}g). Zwiększ liczbę porcji.", 'danger')
+                  f"Prawdopodobnie całkowita waga produkcji ({plan.total_production_weight_g:.2f}g) jest mniejsza "
+                  f"niż waga jednego opakowania ({plan.packaging_weight_g:.2f}g). Zwiększ liczbę porcji.", 'danger')
             return redirect(url_for('production.manage_production_orders'))
 
-        for component in product.recipe_components:
-            required_quantity_orig_unit = component.quantity_required * batch_size
-            if component.raw_material:
-                total_stock_in_component_unit = 0
-                for batch in component.raw_material.batches:
-                    total_stock_in_component_unit += convert_unit(batch.quantity_on_hand, batch.unit, component.unit)
-                if total_stock_in_component_unit < required_quantity_orig_unit:
-                    shortage = required_quantity_orig_unit - total_stock_in_component_unit
-                    missing_components.append(f"{component.raw_material.name} (brakuje: {shortage:.0f} {component.unit})")
-            elif component.sub_product:
-                if component.sub_product.quantity_in_stock < required_quantity_orig_unit:
-                    missing_components.append(f"{component.sub_product.name} (brakuje: {int(required_quantity_orig_unit - component.sub_product.quantity_in_stock)} szt.)")
-
-        for item in product.packaging_bill:
-            required_packaging = item.quantity_required * planned_quantity
-            if item.packaging.quantity_in_stock < required_packaging:
-                missing_packaging.append(f"{item.packaging.name} (brakuje: {required_packaging - item.packaging.quantity_in_stock})")
-
-        if missing_components or missing_packaging:
+        if not plan.is_feasible:
             error_message = "Brak wystarczających zasobów do rozpoczęcia produkcji. Brakuje:<br>"
-            if missing_components:
-                error_message += "<b>Składniki:</b><ul>" + "".join(f"<li>{m}</li>" for m in missing_components) + "</ul>"
-            if missing_packaging:
-                error_message += "<b>Opakowania:</b><ul>" + "".join(f"<li>{m}</li>" for m in missing_packaging) + "</ul>"
+            if plan.missing_components:
+                error_message += "<b>Składniki:</b><ul>" + "".join(f"<li>{m}</li>" for m in plan.missing_components) + "</ul>"
+            if plan.missing_packaging:
+                error_message += "<b>Opakowania:</b><ul>" + "".join(f"<li>{m}</li>" for m in plan.missing_packaging) + "</ul>"
             flash(Markup(error_message), 'danger')
             return redirect(url_for('production.manage_production_orders'))
 
         new_order = ProductionOrder(
             finished_product_id=product.id,
-            planned_quantity=planned_quantity,
+            planned_quantity=plan.planned_quantity,
             quantity_produced=0,
             sample_required=False 
         )
         db.session.add(new_order)
         db.session.flush()
 
-        for component in product.recipe_components:
-            required_quantity = component.quantity_required * batch_size
-            if component.raw_material:
-                required_g = convert_unit(required_quantity, component.unit)
-                batches = sorted(component.raw_material.batches, key=lambda b: b.received_date)
-                for batch in batches:
-                    if required_g <= 0: break
-                    batch_g = convert_unit(batch.quantity_on_hand, batch.unit)
-                    take_g = min(batch_g, required_g)
-                    remaining_g = batch_g - take_g
-                    batch.quantity_on_hand = convert_unit(remaining_g, 'g', batch.unit)
-                    consumed_orig_unit = convert_unit(take_g, 'g', batch.unit)
-                    log = ProductionLog(production_order_id=new_order.id, raw_material_batch_id=batch.id, quantity_consumed=consumed_orig_unit)
-                    db.session.add(log)
-                    required_g -= take_g
-            elif component.sub_product:
-                component.sub_product.quantity_in_stock -= required_quantity
-                source_order_for_subproduct = ProductionOrder.query.filter_by(finished_product_id=component.sub_product_id).order_by(ProductionOrder.order_date.desc()).first()
-                log = ProductionLog(
-                    production_order_id=new_order.id,
-                    sub_product_order_id=source_order_for_subproduct.id if source_order_for_subproduct else None,
-                    quantity_consumed=required_quantity
-                )
-                db.session.add(log)
+        apply_production_plan(plan, new_order)
+        record_production(new_order, order_delta=1)
 
         db.session.commit()
+        invalidate_inventory_health()
+        invalidate_dashboard('production')
         log_activity(f"Utworzył zlecenie produkcyjne #{new_order.id} dla produktu: '{product.name}'",'production.production_order_details', order_id=new_order.id)
         flash('Utworzono nowe zlecenie produkcyjne i pobrano zasoby z magazynu.', 'success')
         return redirect(url_for('production.manage_production_orders'))
 
     products = FinishedProduct.query.order_by(FinishedProduct.name).all()
-    orders = ProductionOrder.query.order_by(ProductionOrder.order_date.desc()).all()
-    return render_template('production_orders.html', products=products, orders=orders)
+    history = history_from_request(request.args)
+    return render_template('production_orders.html', products=products, orders=history['orders'], history=history)
 
 @bp.route('/batch/edit/<int:order_id>', methods=['GET', 'POST'])
 @login_required
@@ -327,8 +281,11 @@ def edit_batch(order_id):
             for item in product.packaging_bill:
                 packaging_item = item.packaging
                 packaging_item.quantity_in_stock -= (item.quantity_required * quantity_diff)
+            record_production(batch, quantity_delta=quantity_diff)
 
         db.session.commit()
+        invalidate_inventory_health()
+        invalidate_dashboard('production')
 
         # Logowanie aktywności
         log_activity(f"Zakończył produkcję partii #{batch.id} ('{batch.finished_product.name}'), "
@@ -349,10 +306,12 @@ def delete_batch(order_id):
 
     # 1. Zwróć surowce i półprodukty na stan magazynowy
     logs = ProductionLog.query.filter_by(production_order_id=order_to_delete.id).all()
+    stock_deltas = {}
     for log in logs:
         # Zwracanie surowców
         if log.batch:
             log.batch.quantity_on_hand += log.quantity_consumed
+            stock_deltas[log.batch.raw_material_id] = stock_deltas.get(log.batch.raw_material_id, 0) + log.quantity_consumed
         
         # --- POCZĄTEK POPRAWKI: Zwracanie półproduktów ---
         # Sprawdzamy, czy log dotyczy zużycia z innego zlecenia (czyli półproduktu)
@@ -364,6 +323,8 @@ def delete_batch(order_id):
                 sub_product.quantity_in_stock += log.quantity_consumed
         # --- KONIEC POPRAWKI ---
 
+    adjust_material_stock(stock_deltas)
+
     # 2. Odejmij wyprodukowany produkt ze stanu (jeśli został dodany)
     product = order_to_delete.finished_product
     if product and order_to_delete.quantity_produced > 0:
@@ -375,12 +336,17 @@ def delete_batch(order_id):
             packaging_item = item.packaging
             packaging_item.quantity_in_stock += (item.quantity_required * order_to_delete.quantity_produced)
 
-    # 4. Usuń logi i samo zlecenie
+    # 4. Usuń zlecenie z dziennych sum statystyk
+    record_production(order_to_delete, quantity_delta=-order_to_delete.quantity_produced, order_delta=-1)
+
+    # 5. Usuń logi i samo zlecenie
     for log in logs:
         db.session.delete(log)
     db.session.delete(order_to_delete)
     
     db.session.commit()
+    invalidate_inventory_health()
+    invalidate_dashboard('production')
     
     flash('Zlecenie produkcyjne zostało usunięte, a wszystkie zasoby (w tym półprodukty) zwrócone na stan magazynowy.', 'success')
     return redirect(url_for('production.manage_products'))
@@ -415,6 +381,7 @@ def manage_packaging_bill(product_id):
                 new_component = ProductPackaging(finished_product_id=product_id, packaging_id=packaging_id, quantity_required=quantity)
                 db.session.add(new_component)
                 db.session.commit()
+                invalidate_production_costs()
                 flash("Dodano opakowanie do specyfikacji produktu.", "success")
         else:
             flash("Wybierz opakowanie i podaj prawidłową ilość.", "danger")
@@ -430,6 +397,7 @@ def edit_packaging_component(id):
     component = ProductPackaging.query.get_or_404(id)
     component.quantity_required = request.form.get('quantity', type=int)
     db.session.commit()
+    invalidate_production_costs()
     flash("Zaktualizowano ilość opakowania.", "success")
     return redirect(url_for('production.manage_packaging_bill', product_id=component.finished_product_id))
 
@@ -441,6 +409,7 @@ def delete_packaging_component(id):
     product_id = component.finished_product_id
     db.session.delete(component)
     db.session.commit()
+    invalidate_production_costs()
     flash("Usunięto opakowanie ze specyfikacji.", "danger")
     return redirect(url_for('production.manage_packaging_bill', product_id=product_id))
     
@@ -457,6 +426,7 @@ def delete_recipe_component(id):
     # Usuń składnik z bazy danych
     db.session.delete(component_to_delete)
     db.session.commit()
+    invalidate_production_costs()
     
     flash('Składnik został usunięty z receptury.', 'success')
     
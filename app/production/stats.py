@@ -0,0 +1,103 @@
+# app/production/stats.py
+"""
+Statystyki produkcji z dziennych sum (tabela production_stat_rollups).
+
+Każdy wiersz to (dzień, produkt) z liczbą zleceń i sumą quantity_produced.
+Tabela jest aktualizowana przyrostowo w tej samej transakcji co zlecenie:
+utworzenie zlecenia, zmiana wyprodukowanej ilości (edit_batch) i usunięcie
+(delete_batch) przechodzą przez record_production(). Statystyki tygodniowe
+i miesięczne sumują wiersze dzienne zamiast skanować wszystkie zlecenia.
+W razie rozjazdu tabelę odbudowuje komenda `flask rebuild-production-stats`.
+"""
+from sqlalchemy import func
+from app.models import db, ProductionOrder, ProductionStatRollup, FinishedProduct
+
+
+def _upsert():
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+def _day_expression(column):
+    if db.engine.dialect.name == 'postgresql':
+        return func.cast(column, db.Date)
+    return func.date(column)
+
+
+def record_production(order, quantity_delta=0, order_delta=0):
+    """Dodaje zmianę ilości wyprodukowanej (i liczby zleceń) do sumy dnia zlecenia."""
+    if not quantity_delta and not order_delta:
+        return
+    table = ProductionStatRollup.__table__
+    stmt = _upsert()(table).values(
+        production_day=order.order_date.date(),
+        finished_product_id=order.finished_product_id,
+        order_count=order_delta,
+        quantity_produced=quantity_delta
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.production_day, table.c.finished_product_id],
+        set_={
+            'order_count': table.c.order_count + stmt.excluded.order_count,
+            'quantity_produced': table.c.quantity_produced + stmt.excluded.quantity_produced,
+        }
+    )
+    db.session.execute(stmt)
+
+
+def remove_product_stats(product_id):
+    """Usuwa sumy produktu (przy usuwaniu produktu razem z jego zleceniami)."""
+    ProductionStatRollup.query.filter_by(finished_product_id=product_id).delete(synchronize_session=False)
+
+
+def rebuild_production_stats():
+    """Przelicza od zera dzienne sumy produkcji ze zleceń. Zwraca liczbę wierszy."""
+    table = ProductionStatRollup.__table__
+    db.session.execute(table.delete())
+    day = _day_expression(ProductionOrder.order_date)
+    totals = db.select(
+        day, ProductionOrder.finished_product_id,
+        func.count(ProductionOrder.id), func.coalesce(func.sum(ProductionOrder.quantity_produced), 0)
+    ).group_by(day, ProductionOrder.finished_product_id)
+    db.session.execute(table.insert().from_select(
+        ['production_day', 'finished_product_id', 'order_count', 'quantity_produced'], totals
+    ))
+    return ProductionStatRollup.query.count()
+
+
+def _period_expressions(column):
+    if db.engine.dialect.name == 'postgresql':
+        return {
+            'date': func.to_char(column, 'YYYY-MM-DD'),
+            'week': func.to_char(column, 'YYYY-WW'),
+            'month': func.to_char(column, 'YYYY-MM'),
+        }
+    return {
+        'date': func.date(column),
+        'week': func.strftime('%Y-%W', column),
+        'month': func.strftime('%Y-%m', column),
+    }
+
+
+def production_stats(date_from=None, date_to=None):
+    """Zwraca słownik {'date'|'week'|'month': wiersze (okres, product_name, total_quantity)}.
+
+    date_from / date_to (daty, włącznie) zawężają zakres dni; wiersze od najnowszego okresu.
+    """
+    stats = {}
+    for period, expression in _period_expressions(ProductionStatRollup.production_day).items():
+        query = db.session.query(
+            expression.label(period), FinishedProduct.name.label('product_name'),
+            func.sum(ProductionStatRollup.quantity_produced).label('total_quantity')
+        ).join(FinishedProduct, FinishedProduct.id == ProductionStatRollup.finished_product_id).filter(
+            ProductionStatRollup.order_count > 0
+        )
+        if date_from:
+            query = query.filter(ProductionStatRollup.production_day >= date_from)
+        if date_to:
+            query = query.filter(ProductionStatRollup.production_day <= date_to)
+        stats[period] = query.group_by(period, 'product_name').order_by(db.desc(period), 'product_name').all()
+    return stats
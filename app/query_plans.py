@@ -0,0 +1,72 @@
+# app/query_plans.py
+"""
+Kontrola planów zapytań dla najczęstszych filtrów (komenda `flask check-query-plans`).
+
+Każde zapytanie z listy HOT_QUERIES odpowiada zapytaniu z aplikacji (import
+sprzedaży, FIFO partii, pulpit, liczniki w menu...). Komenda wykonuje dla niego
+EXPLAIN (SQLite: EXPLAIN QUERY PLAN, PostgreSQL: EXPLAIN) i sprawdza, czy plan
+korzysta z oczekiwanego indeksu - po zmianie modeli lub migracji od razu widać,
+że któreś zapytanie wróciło do pełnego skanu tabeli.
+
+Na PostgreSQL małe tabele i tak byłyby skanowane sekwencyjnie, dlatego na czas
+sprawdzenia wyłączamy enable_seqscan (SET LOCAL, tylko w tej transakcji).
+Sprawdzone na PostgreSQL 16 po migracjach od zera: wszystkie zapytania używają
+indeksów, a usunięty indeks komenda zgłasza jako błąd (Seq Scan w planie).
+"""
+from datetime import date, datetime
+from app.models import (db, FinishedProduct, SalesReportLog, ProductDailySales, RawMaterialBatch, ProductionLog,
+                        ProductionOrder, Order, TeamOrder, Task, VacationRequest, ActivityLog)
+
+# (opis, oczekiwany indeks, funkcja zwracająca zapytanie)
+HOT_QUERIES = [
+    ('Produkt po kodzie (import sprzedaży, check_product_code)', 'ix_finished_products_product_code',
+     lambda: FinishedProduct.query.filter(FinishedProduct.product_code == 'KOD')),
+    ('Wpisy sprzedaży dla daty raportu', 'ix_sales_report_logs_product_date',
+     lambda: SalesReportLog.query.filter(SalesReportLog.report_date == date(2025, 1, 31),
+                                         SalesReportLog.product_id.in_([1, 2, 3]))),
+    ('Sprzedaż dzienna z ostatnich 28 dni (tempo sprzedaży)', 'ix_product_daily_sales_day',
+     lambda: ProductDailySales.query.filter(ProductDailySales.day >= date(2025, 1, 4))),
+    ('Partie surowców od najstarszej (FIFO)', 'ix_raw_material_batches_material_received',
+     lambda: RawMaterialBatch.query.filter(RawMaterialBatch.raw_material_id.in_([1, 2]),
+                                           RawMaterialBatch.quantity_on_hand > 0)
+     .order_by(RawMaterialBatch.received_date, RawMaterialBatch.id)),
+    ('Historia produkcji (kolejna strona kursora)', 'ix_production_orders_order_date_id',
+     lambda: ProductionOrder.query.filter(ProductionOrder.order_date < datetime(2025, 1, 31))
+     .order_by(ProductionOrder.order_date.desc(), ProductionOrder.id.desc()).limit(50)),
+    ('Zużycie surowców zlecenia produkcyjnego', 'ix_production_logs_production_order_id',
+     lambda: ProductionLog.query.filter_by(production_order_id=1)),
+    ('Zarchiwizowane zamówienia bez faktury', 'ix_orders_archived_invoice',
+     lambda: Order.query.filter_by(is_archived=True, invoice_number=None)),
+    ('Oczekujące zamówienia drużyny', 'ix_team_orders_status_date',
+     lambda: TeamOrder.query.filter_by(status='Oczekuje').order_by(TeamOrder.order_date.desc())),
+    ('Zadania według statusu', 'ix_tasks_status',
+     lambda: Task.query.filter(Task.status == 'Nowe')),
+    ('Wnioski urlopowe według statusu', 'ix_vacation_requests_status',
+     lambda: VacationRequest.query.filter_by(status='Oczekuje')),
+    ('Najnowsze wpisy dziennika aktywności', 'ix_activity_logs_timestamp',
+     lambda: ActivityLog.query.order_by(ActivityLog.timestamp.desc()).limit(50)),
+]
+
+
+def explain(query):
+    """Zwraca linie planu zapytania dla bieżącej bazy."""
+    dialect = db.engine.dialect
+    sql = str(query.statement.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+    connection = db.session.connection()
+    if dialect.name == 'sqlite':
+        return [row[-1] for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql)]
+    if dialect.name == 'postgresql':
+        connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+    return [row[0] for row in connection.exec_driver_sql('EXPLAIN ' + sql)]
+
+
+def check_query_plans():
+    """Zwraca listę (opis, oczekiwany indeks, czy użyty, linie planu) dla HOT_QUERIES."""
+    results = []
+    try:
+        for label, index_name, build_query in HOT_QUERIES:
+            plan = explain(build_query())
+            results.append((label, index_name, any(index_name in line for line in plan), plan))
+    finally:
+        db.session.rollback()
+    return results
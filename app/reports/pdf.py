@@ -0,0 +1,17 @@
+# app/reports/pdf.py
+"""
+Renderowanie PDF uruchamiane w puli procesów (job_runner.run_in_process).
+
+Moduł celowo nie importuje niczego z aplikacji poza WeasyPrint - funkcje
+muszą być dostępne na poziomie modułu, żeby proces potomny mógł je wywołać.
+"""
+import os
+from weasyprint import HTML
+
+
+def write_pdf(html_path, pdf_path):
+    """Renderuje plik HTML do pliku PDF i zwraca rozmiar wyniku w bajtach."""
+    with open(html_path, encoding='utf-8') as f:
+        html = f.read()
+    HTML(string=html).write_pdf(pdf_path)
+    return os.path.getsize(pdf_path)
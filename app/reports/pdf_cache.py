@@ -0,0 +1,83 @@
+# app/reports/pdf_cache.py
+"""
+Dyskowy cache gotowych raportów PDF adresowany treścią.
+
+Kluczem jest skrót SHA-256 danych wejściowych raportu: wąskich wierszy
+(id i kolumny widoczne w raporcie) pobranych bez ładowania obiektów ORM i bez
+renderowania szablonu. Dopóki dane się nie zmienią, kolejne pobrania zwracają
+zapisany plik bez zapytań raportu, renderowania HTML i WeasyPrint.
+Rozmiar katalogu jest ograniczony; najdawniej używane pliki są usuwane.
+Zadanie, które wygenerowało plik, ma własny link do niego (store), więc
+usunięcie pliku z cache nie psuje pobrania wyniku zadania.
+"""
+import hashlib
+import os
+import shutil
+import threading
+
+
+class PdfReportCache:
+    def __init__(self):
+        self.folder = None
+        self.max_bytes = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.folder = app.config['REPORT_CACHE_FOLDER']
+        self.max_bytes = app.config.get('REPORT_CACHE_MAX_BYTES', 200 * 1024 * 1024)
+        os.makedirs(self.folder, exist_ok=True)
+
+    def fingerprint(self, kind, data):
+        """Klucz z danych wejściowych raportu (listy krotek wartości pokazywanych w raporcie)."""
+        return hashlib.sha256(f'{kind}\n{data!r}'.encode('utf-8')).hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.folder, f'{key}.pdf')
+
+    def get(self, key):
+        """Zwraca ścieżkę zapisanego PDF albo None. Trafienie odświeża czas użycia (LRU)."""
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def store(self, key, source_path):
+        """Zapisuje wygenerowany plik w cache i zwraca ścieżkę w cache.
+
+        Plik źródłowy (wynik zadania) zostaje na miejscu; cache dostaje do niego
+        twardy link, a gdy system plików go nie obsługuje - kopię.
+        """
+        path = self.path_for(key)
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            os.link(source_path, temp_path)
+        except OSError:
+            shutil.copyfile(source_path, temp_path)
+        os.replace(temp_path, path)
+        self._evict()
+        return path
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.folder):
+                if entry.is_file() and entry.name.endswith('.pdf'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+            entries.sort()
+            # Zawsze zostawiamy najnowszy plik, nawet jeśli sam przekracza limit
+            for _, size, path in entries[:-1]:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+
+pdf_cache = PdfReportCache()
@@ -1,64 +1,118 @@
-from flask import Blueprint, render_template, Response
-from app.models import db, FinishedProductCategory, Category, PackagingCategory, RawMaterial, TeamOrder, TeamOrderProduct
-from flask_login import login_required
+from flask import Blueprint, render_template, redirect, url_for, send_file, abort
+from app.models import (db, User, FinishedProduct, FinishedProductCategory, Category, PackagingCategory, Packaging, RawMaterial,
+                        RawMaterialBatch, TeamOrder, TeamOrderProduct)
+from flask_login import login_required, current_user
 from sqlalchemy.orm import joinedload
-from weasyprint import HTML
 from datetime import datetime
 from app.decorators import permission_required # <-- DODAJ TEN IMPORT
+from app.jobs import job_runner, job_params
+from app.reports.pdf import write_pdf
+from app.reports.pdf_cache import pdf_cache
 
 bp = Blueprint('reports', __name__, template_folder='templates', url_prefix='/reports')
 
-@bp.route('/inventory_sheet')
-@login_required
-@permission_required('admin') # Zakładając, że admin ma dostęp
-def inventory_sheet_pdf():
-    # Pobieranie danych
-    finished_product_categories = FinishedProductCategory.query.options(
-        joinedload(FinishedProductCategory.finished_products)
-    ).order_by(FinishedProductCategory.name).all()
 
-    raw_material_categories = Category.query.options(
-        joinedload(Category.raw_materials).joinedload(RawMaterial.batches)
-    ).order_by(Category.name).all()
+@job_runner.handler('pdf_report')
+def render_pdf_report(job):
+    """Renderuje zapisany HTML raportu do PDF w osobnym procesie."""
+    params = job_params(job)
+    job_runner.set_progress(job, 10, 'Generowanie pliku PDF...')
+    output_path = job_runner.result_path(job.id, 'pdf')
+    job_runner.run_in_process(write_pdf, job_runner.payload_path(job.id), output_path)
+    if params.get('cache_key'):
+        pdf_cache.store(params['cache_key'], output_path)
+    job.result_path = output_path
+    job.result_filename = params['filename']
+    job.message = 'Raport gotowy do pobrania.'
+
 
-    packaging_categories = PackagingCategory.query.options(
-        joinedload(PackagingCategory.packaging_items)
-    ).order_by(PackagingCategory.name).all()
+def serve_pdf_report(kind, fingerprint_data, template, filename, title, load_context):
+    """Zwraca PDF z cache, a przy braku kolejkuje jego wygenerowanie w tle.
 
-    generation_time = datetime.now()
+    fingerprint_data to wąskie wiersze z wartościami pokazywanymi w raporcie;
+    load_context() ładuje pełne dane dla szablonu i jest wołane tylko przy braku
+    w cache. Plik z cache ma datę pierwszego wygenerowania - dane od tej chwili
+    się nie zmieniły, więc raport nadal opisuje bieżący stan.
+    """
+    cache_key = pdf_cache.fingerprint(kind, fingerprint_data)
+    cached_path = pdf_cache.get(cache_key)
+    if cached_path:
+        return send_file(cached_path, as_attachment=True, download_name=filename)
 
-    rendered_html = render_template('inventory_sheet.html',
-                                    finished_product_categories=finished_product_categories,
-                                    raw_material_categories=raw_material_categories,
-                                    packaging_categories=packaging_categories,
-                                    generation_time=generation_time)
+    # HTML renderujemy w żądaniu (szybkie), a sam PDF powstaje w tle
+    rendered_html = render_template(template, generation_time=datetime.now(), **load_context())
+    job = job_runner.enqueue('pdf_report', {'filename': filename, 'title': title, 'cache_key': cache_key},
+                             user_id=current_user.id, payload=rendered_html)
+    return redirect(url_for('main.job_status', job_id=job.id))
 
-    pdf = HTML(string=rendered_html).write_pdf()
 
-    return Response(pdf,
-                    mimetype='application/pdf',
-                    headers={'Content-Disposition': 'attachment;filename=inwentaryzacja.pdf'})
+def _rows(*columns, order_by=None):
+    return db.session.execute(db.select(*columns).order_by(order_by if order_by is not None else columns[0])).all()
+
+
+def _inventory_fingerprint():
+    """Kolumny pokazywane w arkuszu inwentaryzacyjnym - bez obiektów ORM i bez renderowania."""
+    return [
+        _rows(FinishedProductCategory.id, FinishedProductCategory.name),
+        _rows(FinishedProduct.id, FinishedProduct.category_id, FinishedProduct.name, FinishedProduct.quantity_in_stock),
+        _rows(Category.id, Category.name),
+        _rows(RawMaterial.id, RawMaterial.category_id, RawMaterial.name),
+        _rows(RawMaterialBatch.id, RawMaterialBatch.raw_material_id, RawMaterialBatch.batch_number,
+              RawMaterialBatch.quantity_on_hand),
+        _rows(PackagingCategory.id, PackagingCategory.name),
+        _rows(Packaging.id, Packaging.category_id, Packaging.name, Packaging.quantity_in_stock),
+    ]
+
+
+def _load_inventory_context():
+    return {
+        'finished_product_categories': FinishedProductCategory.query.options(
+            joinedload(FinishedProductCategory.finished_products)
+        ).order_by(FinishedProductCategory.name).all(),
+        'raw_material_categories': Category.query.options(
+            joinedload(Category.raw_materials).joinedload(RawMaterial.batches)
+        ).order_by(Category.name).all(),
+        'packaging_categories': PackagingCategory.query.options(
+            joinedload(PackagingCategory.packaging_items)
+        ).order_by(PackagingCategory.name).all(),
+    }
+
+
+@bp.route('/inventory_sheet')
+@login_required
+@permission_required('admin') # Zakładając, że admin ma dostęp
+def inventory_sheet_pdf():
+    return serve_pdf_report('inventory_sheet', _inventory_fingerprint(), 'inventory_sheet.html', 'inwentaryzacja.pdf',
+                            'Arkusz inwentaryzacyjny', _load_inventory_context)
+
+
+def _team_order_fingerprint(order_id):
+    """Kolumny pokazywane w arkuszu zamówienia drużynowego; None, gdy zamówienia nie ma."""
+    order = db.session.execute(db.select(
+        TeamOrder.id, TeamOrder.order_date, TeamOrder.notes, User.username, User.address_street,
+        User.address_postal_code, User.address_city, User.phone_number
+    ).join(TeamOrder.user).filter(TeamOrder.id == order_id)).first()
+    if order is None:
+        return None
+    items = db.session.execute(db.select(
+        TeamOrderProduct.id, FinishedProduct.name, TeamOrderProduct.quantity
+    ).join(TeamOrderProduct.product).filter(TeamOrderProduct.team_order_id == order_id).order_by(TeamOrderProduct.id)).all()
+    return [tuple(order), items]
 
 
 @bp.route('/team_order_pdf/<int:order_id>')
 @login_required
 @permission_required('admin')
 def team_order_pdf(order_id):
-    order = TeamOrder.query.options(
-        joinedload(TeamOrder.user),
-        joinedload(TeamOrder.products).joinedload(TeamOrderProduct.product)
-    ).get_or_404(order_id)
-    
-    generation_time = datetime.now()
-    
-    rendered_html = render_template('team_order_sheet.html', 
-                                    order=order, 
-                                    generation_time=generation_time)
-    
-    pdf = HTML(string=rendered_html).write_pdf()
-    
-    return Response(
-        pdf,
-        mimetype='application/pdf',
-        headers={'Content-Disposition': f'attachment;filename=zamowienie_druzynowe_{order.id}.pdf'}
-    )
\ No newline at end of file
+    fingerprint_data = _team_order_fingerprint(order_id)
+    if fingerprint_data is None:
+        abort(404)
+
+    def load_context():
+        return {'order': TeamOrder.query.options(
+            joinedload(TeamOrder.user),
+            joinedload(TeamOrder.products).joinedload(TeamOrderProduct.product)
+        ).get_or_404(order_id)}
+
+    return serve_pdf_report('team_order', fingerprint_data, 'team_order_sheet.html',
+                            f'zamowienie_druzynowe_{order_id}.pdf', f'Zamówienie drużynowe #{order_id}', load_context)
@@ -7,7 +7,7 @@ from werkzeug.utils import secure_filename
 from app.decorators import permission_required
 from flask_mail import Message
 from app import mail
-from app.utils import log_activity
+from app.utils import log_activity, invalidate_task_counts
 
 bp = Blueprint('tasks', __name__, template_folder='templates', url_prefix='/tasks')
 
@@ -15,7 +15,7 @@ bp = Blueprint('tasks', __name__, template_folder='templates', url_prefix='/task
 @login_required
 @permission_required('tasks')
 def index():
-    tasks_assigned_to_me = Task.query.filter(Task.assignees.contains(current_user), Task.status != 'Zakończone').order_by(Task.creation_date.desc()).all()
+    tasks_assigned_to_me = Task.query.filter(Task.assignees.any(User.id == current_user.id), Task.status != 'Zakończone').order_by(Task.creation_date.desc()).all()
     tasks_created_by_me = Task.query.filter(Task.assigner_id == current_user.id, Task.status != 'Zakończone').order_by(Task.creation_date.desc()).all()
     return render_template('tasks_list.html', assigned_tasks=tasks_assigned_to_me, created_tasks=tasks_created_by_me)
 
@@ -57,6 +57,7 @@ def create_task():
                 db.session.add(attachment)
 
         db.session.commit()
+        invalidate_task_counts()
         assignee_names = ", ".join([u.username for u in assignees])
         log_activity(f"Utworzył nowe zadanie: '{new_task.title}' dla: {assignee_names}", 'tasks.task_details', id=new_task.id)
         flash('Pomyślnie utworzono zadanie.', 'success')
@@ -104,6 +105,7 @@ def edit_task(id):
         task.assignees = User.query.filter(User.id.in_(assignee_ids)).all()
         
         db.session.commit()
+        invalidate_task_counts()
         flash('Zadanie zostało zaktualizowane.', 'success')
         return redirect(url_for('tasks.task_details', id=id))
     
@@ -142,6 +144,7 @@ def accept_task(id):
     if task.status == 'Nowe':
         task.status = 'Przyjęte'
         db.session.commit()
+        invalidate_task_counts()
         flash('Zadanie zostało przyjęte do realizacji.', 'info')
     else:
         flash(f"Nie można przyjąć zadania, ponieważ ma ono już status '{task.status}'.", "warning")
@@ -158,6 +161,7 @@ def complete_task(id):
     if current_user in task.assignees or current_user.id == task.assigner_id or current_user.has_role('admin'):
         task.status = 'Zakończone'
         db.session.commit()
+        invalidate_task_counts()
         log_activity(f"Zakończył zadanie: '{task.title}'", 'tasks.task_details', id=task.id)
         flash('Zadanie zostało oznaczone jako zakończone.', 'success')
     else:
@@ -214,6 +218,7 @@ def delete_task(id):
     # (Załączniki zostaną usunięte automatycznie dzięki 'cascade="all, delete-orphan"')
     db.session.delete(task_to_delete)
     db.session.commit()
+    invalidate_task_counts()
 
     log_activity(f"Trwale usunął zadanie: '{task_to_delete.title}'")
 
@@ -1,9 +1,9 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 # Zaktualizuj tę linię, aby zawierała brakujące importy
-from app.models import db, Task, TeamOrder, TeamOrderProduct, FinishedProduct, FinishedProductCategory 
+from app.models import db, User, Task, TeamOrder, TeamOrderProduct, FinishedProduct, FinishedProductCategory 
 from flask_login import login_required, current_user
 from app.decorators import permission_required
-from app.utils import log_activity
+from app.utils import log_activity, invalidate_team_order_counts
 from sqlalchemy import desc
 from functools import wraps
 
@@ -22,7 +22,7 @@ def team_member_required(f):
 @login_required
 @team_member_required
 def dashboard():
-    my_tasks = Task.query.filter(Task.assignees.contains(current_user), Task.status != 'Zakończone').order_by(Task.creation_date.desc()).all()
+    my_tasks = Task.query.filter(Task.assignees.any(User.id == current_user.id), Task.status != 'Zakończone').order_by(Task.creation_date.desc()).all()
     my_orders = TeamOrder.query.filter_by(user_id=current_user.id).order_by(desc(TeamOrder.order_date)).limit(5).all()
     
     return render_template('team_dashboard.html', 
@@ -34,10 +34,11 @@ def dashboard():
 @team_member_required
 def my_profile():
     if request.method == 'POST':
-        current_user.address_street = request.form.get('address_street')
-        current_user.address_postal_code = request.form.get('address_postal_code')
-        current_user.address_city = request.form.get('address_city')
-        current_user.phone_number = request.form.get('phone_number')
+        user = db.session.get(User, current_user.id)
+        user.address_street = request.form.get('address_street')
+        user.address_postal_code = request.form.get('address_postal_code')
+        user.address_city = request.form.get('address_city')
+        user.phone_number = request.form.get('phone_number')
         db.session.commit()
         
         log_activity("Zaktualizował swój adres do wysyłki.")
@@ -94,6 +95,7 @@ def new_order():
             db.session.add(order_item)
 
         db.session.commit()
+        invalidate_team_order_counts()
         log_activity(f"Złożył nowe zamówienie drużynowe #{new_team_order.id}")
         flash('Twoje zamówienie zostało złożone pomyślnie!', 'success')
         return redirect(url_for('team_member.dashboard'))
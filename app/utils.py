@@ -1,6 +1,28 @@
+from datetime import datetime
 from flask import url_for
 from flask_login import current_user
-from .models import db, ActivityLog
+from .activity import activity_writer
+from .cache import cache
+
+# Liczniki w pasku nawigacji (nowe zadania, oczekujące zamówienia drużyny)
+NAV_COUNTS_TTL = 30
+# Sekcje pulpitu (gotowy HTML); zapisy unieważniają swoje sekcje, TTL ogranicza resztę
+DASHBOARD_TTL = 60
+
+def invalidate_dashboard(*sections):
+    """Unieważnia sekcje pulpitu: 'tasks', 'low_stock', 'orders', 'production', 'vacations', 'team_orders'."""
+    for section in sections:
+        cache.invalidate(f'dashboard_{section}')
+
+def invalidate_task_counts():
+    """Unieważnia liczniki nowych zadań wszystkich użytkowników (i ich sekcje zadań na pulpicie)."""
+    cache.invalidate('nav_tasks')
+    invalidate_dashboard('tasks')
+
+def invalidate_team_order_counts():
+    """Unieważnia licznik oczekujących zamówień drużyny (i sekcję pulpitu)."""
+    cache.delete(('nav_team_orders',))
+    invalidate_dashboard('team_orders')
 
 def log_activity(action, url_endpoint=None, **url_params):
     """
@@ -19,10 +41,10 @@ def log_activity(action, url_endpoint=None, **url_params):
         except Exception:
             log_url = None # W razie błędu generowania linku, po prostu go pomijamy
 
-    log_entry = ActivityLog(
-        user_id=current_user.id,
-        action=action,
-        url=log_url
-    )
-    db.session.add(log_entry)
-    db.session.commit() # <-- NAJWAŻNIEJSZA ZMIANA: ZAPIS DO BAZY
\ No newline at end of file
+    # Wpis trafia do bufora zapisywanego w tle (app/activity.py) - bez drugiego commita w widoku
+    activity_writer.write({
+        'user_id': current_user.id,
+        'timestamp': datetime.utcnow(),
+        'action': action,
+        'url': log_url
+    })
\ No newline at end of file
@@ -3,6 +3,7 @@ from app.models import db, VacationRequest, User
 from flask_login import login_required, current_user
 from app.decorators import permission_required
 from datetime import datetime
+from app.utils import invalidate_dashboard
 
 bp = Blueprint('vacations', __name__, template_folder='templates', url_prefix='/vacations')
 
@@ -32,6 +33,7 @@ def create_request():
         new_request = VacationRequest(user_id=current_user.id, start_date=start_date, end_date=end_date, category=category, notes=notes)
         db.session.add(new_request)
         db.session.commit()
+        invalidate_dashboard('vacations')
         flash('Twój wniosek urlopowy został złożony.', 'success')
         return redirect(url_for('vacations.index'))
     return render_template('create_vacation_request.html')
@@ -57,6 +59,7 @@ def admin_create_request():
         )
         db.session.add(new_request)
         db.session.commit()
+        invalidate_dashboard('vacations')
         flash(f'Dodano urlop dla pracownika.', 'success')
         return redirect(url_for('vacations.index'))
     
@@ -77,6 +80,7 @@ def edit_request(request_id):
         req.category = request.form.get('category')
         req.notes = request.form.get('notes')
         db.session.commit()
+        invalidate_dashboard('vacations')
         flash('Wniosek został zaktualizowany.', 'success')
         return redirect(url_for('vacations.index'))
     return render_template('edit_vacation_request.html', req=req)
@@ -91,6 +95,7 @@ def delete_request(request_id):
         return redirect(url_for('vacations.index'))
     db.session.delete(req)
     db.session.commit()
+    invalidate_dashboard('vacations')
     flash('Wniosek został usunięty.', 'success')
     return redirect(url_for('vacations.index'))
 
@@ -102,6 +107,7 @@ def approve_request(request_id):
     vacation_request.status = 'Zatwierdzony'
     vacation_request.admin_notes = request.form.get('admin_notes')
     db.session.commit()
+    invalidate_dashboard('vacations')
     flash(f'Wniosek urlopowy dla {vacation_request.user.username} został zatwierdzony.', 'success')
     return redirect(url_for('vacations.index'))
 
@@ -113,6 +119,7 @@ def reject_request(request_id):
     vacation_request.status = 'Odrzucony'
     vacation_request.admin_notes = request.form.get('admin_notes')
     db.session.commit()
+    invalidate_dashboard('vacations')
     flash(f'Wniosek urlopowy dla {vacation_request.user.username} został odrzucony.', 'warning')
     return redirect(url_for('vacations.index'))
 
@@ -129,6 +136,7 @@ def admin_edit_request(request_id):
         req.admin_notes = request.form.get('admin_notes')
         req.status = request.form.get('status')
         db.session.commit()
+        invalidate_dashboard('vacations')
         flash('Wniosek urlopowy został zaktualizowany przez administratora.', 'success')
         return redirect(url_for('vacations.index'))
     return render_template('admin_edit_vacation_request.html', req=req)
@@ -140,5 +148,6 @@ def admin_delete_request(request_id):
     req = VacationRequest.query.get_or_404(request_id)
     db.session.delete(req)
     db.session.commit()
+    invalidate_dashboard('vacations')
     flash('Wniosek urlopowy został trwale usunięty.', 'success')
     return redirect(url_for('vacations.index'))
\ No newline at end of file
@@ -0,0 +1,85 @@
+# app/warehouse/listing.py
+"""
+Stronicowana lista partii surowców na stanie (warehouse.index).
+
+Strona partii powstaje jednym zapytaniem: partie razem z surowcem i kategorią
+(contains_eager), bieżącą sumą stanu surowca z raw_material_stocks (do
+podświetlenia niskiego stanu) i liczbą wszystkich pasujących wierszy
+policzoną funkcją okna COUNT(*) OVER () - bez osobnego zapytania COUNT.
+"""
+import math
+from sqlalchemy import func, or_, asc, desc
+from sqlalchemy.orm import contains_eager
+from app.models import db, RawMaterial, RawMaterialBatch, RawMaterialStock, Category
+
+BATCHES_PER_PAGE = 50
+
+SORT_COLUMNS = {
+    'received_date': RawMaterialBatch.received_date,
+    'name': RawMaterial.name,
+    'batch_number': RawMaterialBatch.batch_number,
+    'quantity': RawMaterialBatch.quantity_on_hand,
+}
+
+
+class BatchPage:
+    """Strona partii (items) z numerami stron w stylu Pagination z Flask-SQLAlchemy."""
+
+    def __init__(self, items, total, page, per_page):
+        self.items = items
+        self.total = total
+        self.page = page
+        self.pages = max(1, math.ceil(total / per_page))
+
+    def __bool__(self):
+        return bool(self.items)
+
+    def iter_pages(self, left_edge=2, left_current=2, right_current=4, right_edge=2):
+        last = 0
+        for num in range(1, self.pages + 1):
+            if (num <= left_edge or self.pages - num < right_edge
+                    or self.page - left_current <= num <= self.page + right_current):
+                if last + 1 != num:
+                    yield None
+                yield num
+                last = num
+
+
+def batch_page(search=None, sort_by='received_date', order='desc', page=1, per_page=BATCHES_PER_PAGE):
+    """Zwraca BatchPage partii z niezerowym stanem; każda partia ma atrybut current_stock (suma stanu surowca).
+
+    Partie są uporządkowane najpierw po kategorii (strona grupuje je po kategoriach),
+    potem po wybranej kolumnie. search szuka w nazwie surowca i numerze partii.
+    """
+    current_stock = func.coalesce(RawMaterialStock.total_quantity, 0)
+    query = db.session.query(RawMaterialBatch, current_stock, func.count().over()).join(
+        RawMaterialBatch.material
+    ).join(RawMaterial.category).outerjoin(
+        RawMaterialStock, RawMaterialStock.raw_material_id == RawMaterial.id
+    ).options(
+        contains_eager(RawMaterialBatch.material).contains_eager(RawMaterial.category)
+    ).filter(RawMaterialBatch.quantity_on_hand > 0)
+    if search:
+        pattern = f'%{search}%'
+        query = query.filter(or_(RawMaterial.name.ilike(pattern), RawMaterialBatch.batch_number.ilike(pattern)))
+
+    sort_column = SORT_COLUMNS.get(sort_by, RawMaterialBatch.received_date)
+    direction = asc if order == 'asc' else desc
+    query = query.order_by(Category.name, direction(sort_column), direction(RawMaterialBatch.id))
+
+    page = max(1, page)
+    rows = query.offset((page - 1) * per_page).limit(per_page).all()
+    if not rows and page > 1:
+        # Strona poza zakresem (np. po wyszukaniu) - pokazujemy ostatnią istniejącą
+        first = query.limit(1).first()
+        if first is None:
+            return BatchPage([], 0, 1, per_page)
+        page = math.ceil(first[2] / per_page)
+        rows = query.offset((page - 1) * per_page).limit(per_page).all()
+
+    batches = []
+    for batch, stock, _ in rows:
+        batch.current_stock = stock
+        batches.append(batch)
+    total = rows[0][2] if rows else 0
+    return BatchPage(batches, total, page, per_page)
@@ -5,8 +5,11 @@ from flask_login import login_required
 from app.decorators import permission_required
 from datetime import date, datetime
 from sqlalchemy.orm import joinedload
-from sqlalchemy import asc, desc
 from app.utils import log_activity
+from app.warehouse.stock import adjust_material_stock
+from app.warehouse.listing import batch_page
+from app.inventory import low_stock_raw_materials, invalidate_inventory_health
+from app.production.costing import invalidate_production_costs
 
 bp = Blueprint('warehouse', __name__, template_folder='templates', url_prefix='/warehouse')
 
@@ -29,7 +32,9 @@ def index():
                 received_date=date.today()
             )
             db.session.add(new_batch)
+            adjust_material_stock({new_batch.raw_material_id: new_batch.quantity_on_hand})
             db.session.commit()
+            invalidate_inventory_health()
 
             # Logowanie aktywności
             log_activity(f"Przyjął na stan partię surowca '{new_batch.material.name}' "
@@ -43,40 +48,20 @@ def index():
 
     sort_by = request.args.get('sort_by', 'received_date')
     order = request.args.get('order', 'desc')
-    query = RawMaterialBatch.query.join(RawMaterial).filter(RawMaterialBatch.quantity_on_hand > 0)
-    sort_map = {
-        'received_date': RawMaterialBatch.received_date,
-        'name': RawMaterial.name,
-        'batch_number': RawMaterialBatch.batch_number,
-        'quantity': RawMaterialBatch.quantity_on_hand,
-    }
-    sort_column = sort_map.get(sort_by, RawMaterialBatch.received_date)
-    
-    if order == 'asc':
-        query = query.order_by(asc(sort_column))
-    else:
-        query = query.order_by(desc(sort_column))
-        
-    all_batches = query.all()
-    categories = Category.query.options(joinedload(Category.raw_materials)).order_by(Category.name).all()
-
-    total_stocks = {}
-    for batch in RawMaterialBatch.query.all():
-        total_stocks[batch.raw_material_id] = total_stocks.get(batch.raw_material_id, 0) + batch.quantity_on_hand
+    search = request.args.get('q', '').strip()
+    page = request.args.get('page', 1, type=int)
+    batches = batch_page(search, sort_by, order, page)
 
-    low_stock_materials = []
-    all_materials = RawMaterial.query.all()
-    for material in all_materials:
-        current_stock = total_stocks.get(material.id, 0)
-        if material.critical_stock_level > 0 and current_stock < material.critical_stock_level:
-            material.current_stock = current_stock
-            low_stock_materials.append(material)
+    # Do formularza przyjęcia partii wystarczą id i nazwy surowców z kategoriami
+    materials = db.session.query(Category.name, RawMaterial.id, RawMaterial.name).join(
+        RawMaterial.category
+    ).order_by(Category.name, RawMaterial.name).all()
 
     return render_template('warehouse_index.html', 
-                           categories=categories, 
-                           batches=all_batches, 
-                           low_stock_materials=low_stock_materials,
-                           total_stocks=total_stocks,
+                           materials=materials, 
+                           batches=batches, 
+                           low_stock_materials=low_stock_raw_materials(),
+                           search=search,
                            sort_by=sort_by,
                            order=order)
 
@@ -88,13 +73,16 @@ def edit_batch(id):
     batch_to_edit = RawMaterialBatch.query.get_or_404(id)
     if request.method == 'POST':
         batch_to_edit.batch_number = request.form.get('batch_number')
-        batch_to_edit.quantity_on_hand = float(request.form.get('quantity_on_hand'))
+        new_quantity = float(request.form.get('quantity_on_hand'))
+        adjust_material_stock({batch_to_edit.raw_material_id: new_quantity - batch_to_edit.quantity_on_hand})
+        batch_to_edit.quantity_on_hand = new_quantity
         batch_to_edit.unit = request.form.get('unit')
         date_str = request.form.get('received_date')
         if date_str:
             batch_to_edit.received_date = datetime.strptime(date_str, '%Y-%m-%d').date()
         
         db.session.commit()
+        invalidate_inventory_health()
         flash(f"Zaktualizowano dane partii nr: {batch_to_edit.batch_number}", "success")
         return redirect(url_for('warehouse.index'))
         
@@ -111,8 +99,10 @@ def delete_batch(id):
     if usage_in_log:
         flash(f"Nie można usunąć partii '{batch_to_delete.batch_number}', ponieważ została już użyta w produkcji. Możesz edytować jej ilość, np. ustawiając ją na 0.", "danger")
     else:
+        adjust_material_stock({batch_to_delete.raw_material_id: -batch_to_delete.quantity_on_hand})
         db.session.delete(batch_to_delete)
         db.session.commit()
+        invalidate_inventory_health()
         flash(f"Partia '{batch_to_delete.batch_number}' została usunięta.", "success")
         
     return redirect(url_for('warehouse.index'))
@@ -134,6 +124,7 @@ def manage_catalogue():
                 new_material = RawMaterial(name=name, category_id=int(category_id))
                 db.session.add(new_material)
                 db.session.commit()
+                invalidate_inventory_health()
                 flash(f"Dodano surowiec '{name}' do katalogu.", "success")
         
         return redirect(url_for('warehouse.manage_catalogue'))
@@ -164,6 +155,8 @@ def edit_material(id):
             return render_template('edit_material.html', material=material, categories=categories)
         
         db.session.commit()
+        invalidate_inventory_health()
+        invalidate_production_costs()
         
         from app.utils import log_activity
         log_activity(f"Zaktualizował surowiec: {material.name}")
@@ -192,6 +185,7 @@ def delete_material(id):
     else:
         db.session.delete(material_to_delete)
         db.session.commit()
+        invalidate_inventory_health()
         flash(f"Usunięto surowiec: {material_to_delete.name}", "success")
         
     return redirect(url_for('warehouse.manage_catalogue'))
@@ -225,6 +219,7 @@ def edit_category(id):
     if new_name:
         category.name = new_name
         db.session.commit()
+        invalidate_inventory_health()
         flash("Nazwa kategorii została zaktualizowana.", "success")
     return redirect(url_for('warehouse.manage_categories'))
 
@@ -238,5 +233,6 @@ def delete_category(id):
     else:
         db.session.delete(category)
         db.session.commit()
+        invalidate_inventory_health()
         flash(f"Kategoria '{category.name}' została usunięta.", "danger")
     return redirect(url_for('warehouse.manage_categories'))
\ No newline at end of file
@@ -0,0 +1,53 @@
+# app/warehouse/stock.py
+"""
+Utrzymywanie tabeli raw_material_stocks z sumą stanów partii każdego surowca.
+
+Każda zmiana RawMaterialBatch.quantity_on_hand musi przejść przez
+adjust_material_stock() w tej samej transakcji, w której zmieniana jest partia.
+W razie rozjazdu tabelę odbudowuje komenda `flask rebuild-stock-totals`.
+"""
+from sqlalchemy import func
+from app.models import db, RawMaterialBatch, RawMaterialStock
+
+
+def _upsert():
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+def adjust_material_stock(deltas):
+    """
+    Dodaje zmiany do sum stanów surowców.
+    :param deltas: Słownik {raw_material_id: zmiana ilości}.
+    """
+    rows = [{'raw_material_id': material_id, 'total_quantity': delta} for material_id, delta in deltas.items() if delta]
+    if not rows:
+        return
+    table = RawMaterialStock.__table__
+    stmt = _upsert()(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.raw_material_id],
+        set_={'total_quantity': table.c.total_quantity + stmt.excluded.total_quantity}
+    )
+    db.session.execute(stmt, rows)
+
+
+def rebuild_material_stock():
+    """Przelicza od zera sumy stanów wszystkich surowców. Zwraca liczbę surowców."""
+    table = RawMaterialStock.__table__
+    db.session.execute(table.delete())
+    totals = db.session.query(
+        RawMaterialBatch.raw_material_id, func.sum(RawMaterialBatch.quantity_on_hand)
+    ).group_by(RawMaterialBatch.raw_material_id).all()
+    rows = [{'raw_material_id': material_id, 'total_quantity': total or 0.0} for material_id, total in totals]
+    if rows:
+        db.session.execute(table.insert(), rows)
+    return len(rows)
+
+
+def get_stock_totals():
+    """Zwraca słownik {raw_material_id: suma stanów} jednym zapytaniem."""
+    return dict(db.session.query(RawMaterialStock.raw_material_id, RawMaterialStock.total_quantity).all())
@@ -0,0 +1,89 @@
+"""
+Pomiar wyciągania numerów faktur z tytułów wpłat na syntetycznym wyciągu.
+
+Generuje wyciąg CSV w formacie banku (domyślnie 100 000 wierszy), wczytuje go
+tak jak moduł dłużników i porównuje dotychczasowe Series.apply z wersją
+wektorową. Sprawdza też, czy oba sposoby dają identyczny wynik.
+
+Uruchomienie: python benchmark_payment_titles.py [liczba_wierszy]
+"""
+import io
+import random
+import re
+import sys
+import time
+import pandas as pd
+from app.debtor_tracker.bank_csv import (
+    CSV_ORIGINAL_HEADERS, CSV_DELIMITER, CSV_DECIMAL, extract_invoices_from_payment_titles
+)
+
+TITLE_TEMPLATES = [
+    'Zapłata za FV {n}/{m:02d}/2025',
+    'FAKTURA NR {n}/{m:02d}/2025 dziękujemy',
+    'faktura numer FV/{n}/{m:02d}/25',
+    'Zam. {n}-{m} przedpłata',
+    'REF: ABC{n}/{m:02d} przelew',
+    'przelew REF:{n}/25 oraz FV {m}/2025',
+    'FV{n}/{m:02d}/2025',
+    '{n}/{m:02d}/2025/K',
+    'zwrot kaucji {n}',
+    'Przelew środków',
+    'pa {n}/{m}',
+    '',
+]
+
+
+def extract_invoice_from_payment_title_before(title):
+    """Dotychczasowa implementacja (kolejne re.search dla każdego tytułu) - punkt odniesienia."""
+    if not isinstance(title, str): return ""
+    patterns = [
+        r'(?:FV|PA|FAK|Faktura|Zamówienie|Zam)\s*(?:nr\.?|numer)?\s*([\w/.-]+)',
+        r'REF:\s*([\w/.-]+)',
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, title, re.IGNORECASE)
+        if match: return match.group(1).strip()
+    if re.fullmatch(r'[A-Z0-9/.-]+', title) and len(title) > 4 and ' ' not in title:
+         return title
+    return ""
+
+
+def build_csv(rows, seed=42):
+    rng = random.Random(seed)
+    lines = []
+    for i in range(rows):
+        title = rng.choice(TITLE_TEMPLATES).format(n=rng.randint(1, 999), m=rng.randint(1, 12))
+        amount = f"{rng.randint(1, 99999)},{rng.randint(0, 99):02d}"
+        lines.append(f'"{rng.randint(1, 28):02d}.12.2025","{rng.randint(1, 28):02d}.12.2025","{title}","Kontrahent {i % 500}",'
+                     f'"PL{rng.randint(10**9, 10**10)}","{amount}","0","TX{i}",""')
+    return "\n".join(lines)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(f"Generowanie wyciągu: {rows} wierszy...")
+    df = pd.read_csv(
+        io.StringIO(build_csv(rows)), delimiter=CSV_DELIMITER, header=None, names=CSV_ORIGINAL_HEADERS,
+        decimal=CSV_DECIMAL, skipinitialspace=True, keep_default_na=True
+    )
+    titles = df['TytulPrzelewu']
+
+    start = time.perf_counter()
+    before = titles.apply(extract_invoice_from_payment_title_before)
+    before_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    after = extract_invoices_from_payment_titles(titles)
+    after_time = time.perf_counter() - start
+
+    mismatches = int((before != after).sum())
+    print(f"Series.apply (dotychczas): {before_time:.3f} s")
+    print(f"Wersja wektorowa:          {after_time:.3f} s ({before_time / after_time:.1f}x)")
+    print(f"Różnice w wynikach: {mismatches}")
+    if mismatches:
+        print(pd.DataFrame({'tytul': titles, 'przed': before, 'po': after})[before != after].head(20))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
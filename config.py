@@ -13,6 +13,31 @@ class Config:
     # Konfiguracja folderu na załączniki
     UPLOAD_FOLDER = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'uploads')
 
+    # Zadania w tle (np. raporty PDF): pliki wynikowe, liczba wątków i procesów roboczych
+    JOBS_FOLDER = os.path.join(UPLOAD_FOLDER, 'jobs')
+    JOBS_MAX_WORKERS = 2
+    JOBS_PROCESS_WORKERS = int(os.environ.get('JOBS_PROCESS_WORKERS') or 2)
+    # Po tylu sekundach niezakończone zadanie uznajemy za przerwane
+    JOBS_TIMEOUT = 1800
+    # Zakończone zadania (wiersz i plik wynikowy) usuwamy po tylu sekundach
+    JOBS_RETENTION = int(os.environ.get('JOBS_RETENTION') or 7 * 24 * 3600)
+
+    # Cache gotowych raportów PDF (klucz = skrót danych raportu), ograniczony rozmiarem
+    REPORT_CACHE_FOLDER = os.path.join(UPLOAD_FOLDER, 'report_cache')
+    REPORT_CACHE_MAX_BYTES = int(os.environ.get('REPORT_CACHE_MAX_BYTES') or 200 * 1024 * 1024)
+
+    # Moduł dłużników: wiersze wyników trzymamy dla tylu ostatnich uruchomień
+    DEBTOR_RESULT_RUNS_KEPT = 20
+
+    # Dziennik aktywności: 'async' (bufor zapisywany w tle) lub 'sync' (zapis od razu)
+    ACTIVITY_LOG_MODE = os.environ.get('ACTIVITY_LOG_MODE') or 'async'
+    ACTIVITY_LOG_QUEUE_SIZE = 10000
+    ACTIVITY_LOG_BATCH_SIZE = 200
+    ACTIVITY_LOG_FLUSH_INTERVAL = 2.0
+    # Ułamek wpisów zapisywanych, gdy kolejka przekroczy ACTIVITY_LOG_HIGH_WATER (1.0 = wszystkie)
+    ACTIVITY_LOG_SAMPLE_RATE = float(os.environ.get('ACTIVITY_LOG_SAMPLE_RATE') or 1.0)
+    ACTIVITY_LOG_HIGH_WATER = 0.8
+
     # === KONFIGURACJA POCZTY E-MAIL ===
     MAIL_SERVER = 'smtp.gmail.com'
     MAIL_PORT = 587
@@ -0,0 +1,34 @@
+"""Add raw material stock totals
+
+Revision ID: 8c2f5e1a9b47
+Revises: 60da692b8fb2
+Create Date: 2026-10-17 10:12:41.532190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c2f5e1a9b47'
+down_revision = '60da692b8fb2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('raw_material_stocks',
+    sa.Column('raw_material_id', sa.Integer(), nullable=False),
+    sa.Column('total_quantity', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['raw_material_id'], ['raw_materials.id'], ),
+    sa.PrimaryKeyConstraint('raw_material_id')
+    )
+    # Wypełnienie tabeli bieżącymi sumami partii
+    op.execute(
+        "INSERT INTO raw_material_stocks (raw_material_id, total_quantity) "
+        "SELECT raw_material_id, SUM(quantity_on_hand) FROM raw_material_batches GROUP BY raw_material_id"
+    )
+
+
+def downgrade():
+    op.drop_table('raw_material_stocks')
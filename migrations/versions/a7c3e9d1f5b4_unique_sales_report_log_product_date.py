@@ -0,0 +1,52 @@
+"""Unique sales report log per product and date
+
+Revision ID: a7c3e9d1f5b4
+Revises: d9a4f6b2e185
+Create Date: 2026-10-17 21:05:44.281936
+
+"""
+from datetime import timedelta
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e9d1f5b4'
+down_revision = 'd9a4f6b2e185'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    logs = sa.table('sales_report_logs', sa.column('id', sa.Integer), sa.column('product_id', sa.Integer),
+                    sa.column('report_date', sa.Date), sa.column('quantity_sold', sa.Integer),
+                    sa.column('period_days', sa.Integer))
+    daily = sa.table('product_daily_sales', sa.column('product_id', sa.Integer), sa.column('day', sa.Date),
+                     sa.column('quantity', sa.Float))
+
+    # Import zawsze aktualizował najstarszy wpis produktu i daty - duplikaty (po równoległych
+    # importach) usuwamy razem z ich udziałem w sprzedaży dziennej
+    first_ids = sa.select(sa.func.min(logs.c.id)).group_by(logs.c.product_id, logs.c.report_date)
+    duplicates = conn.execute(
+        sa.select(logs.c.id, logs.c.product_id, logs.c.report_date, logs.c.period_days, logs.c.quantity_sold)
+        .where(logs.c.id.not_in(first_ids))
+    ).all()
+    for log_id, product_id, report_date, period_days, quantity_sold in duplicates:
+        for offset in range(period_days):
+            conn.execute(
+                daily.update()
+                .where(daily.c.product_id == product_id, daily.c.day == report_date + timedelta(days=offset))
+                .values(quantity=daily.c.quantity - quantity_sold / period_days)
+            )
+        conn.execute(logs.delete().where(logs.c.id == log_id))
+
+    with op.batch_alter_table('sales_report_logs', schema=None) as batch_op:
+        batch_op.drop_index('ix_sales_report_logs_product_date')
+        batch_op.create_index('ix_sales_report_logs_product_date', ['product_id', 'report_date'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('sales_report_logs', schema=None) as batch_op:
+        batch_op.drop_index('ix_sales_report_logs_product_date')
+        batch_op.create_index('ix_sales_report_logs_product_date', ['product_id', 'report_date'], unique=False)
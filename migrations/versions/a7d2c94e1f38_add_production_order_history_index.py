@@ -0,0 +1,26 @@
+"""Add production order history index
+
+Revision ID: a7d2c94e1f38
+Revises: f3c6a2d8e915
+Create Date: 2026-10-17 14:58:33.615902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d2c94e1f38'
+down_revision = 'f3c6a2d8e915'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('production_orders', schema=None) as batch_op:
+        batch_op.create_index('ix_production_orders_order_date_id', ['order_date', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('production_orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_production_orders_order_date_id')
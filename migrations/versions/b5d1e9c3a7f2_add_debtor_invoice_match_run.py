@@ -0,0 +1,32 @@
+"""Add debtor invoice match run
+
+Revision ID: b5d1e9c3a7f2
+Revises: e2b7d5a3c918
+Create Date: 2026-10-17 19:12:26.508317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d1e9c3a7f2'
+down_revision = 'e2b7d5a3c918'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('debtor_invoices', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('match_run_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('rematch_pending', sa.Boolean(), server_default=sa.false(), nullable=False))
+        batch_op.create_index(batch_op.f('ix_debtor_invoices_match_run_id'), ['match_run_id'], unique=False)
+        batch_op.create_foreign_key('fk_debtor_invoices_match_run_id', 'debtor_runs', ['match_run_id'], ['id'])
+
+
+def downgrade():
+    with op.batch_alter_table('debtor_invoices', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_debtor_invoices_match_run_id', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_debtor_invoices_match_run_id'))
+        batch_op.drop_column('rematch_pending')
+        batch_op.drop_column('match_run_id')
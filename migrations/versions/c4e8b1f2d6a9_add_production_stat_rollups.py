@@ -0,0 +1,38 @@
+"""Add production stat rollups
+
+Revision ID: c4e8b1f2d6a9
+Revises: a7d2c94e1f38
+Create Date: 2026-10-17 16:41:07.284519
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e8b1f2d6a9'
+down_revision = 'a7d2c94e1f38'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('production_stat_rollups',
+    sa.Column('production_day', sa.Date(), nullable=False),
+    sa.Column('finished_product_id', sa.Integer(), nullable=False),
+    sa.Column('order_count', sa.Integer(), nullable=False),
+    sa.Column('quantity_produced', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['finished_product_id'], ['finished_products.id'], ),
+    sa.PrimaryKeyConstraint('production_day', 'finished_product_id')
+    )
+    # Wypełnienie tabeli dziennymi sumami istniejących zleceń
+    day = 'CAST(order_date AS DATE)' if op.get_bind().dialect.name == 'postgresql' else 'date(order_date)'
+    op.execute(
+        "INSERT INTO production_stat_rollups (production_day, finished_product_id, order_count, quantity_produced) "
+        f"SELECT {day}, finished_product_id, COUNT(id), COALESCE(SUM(quantity_produced), 0) "
+        f"FROM production_orders GROUP BY {day}, finished_product_id"
+    )
+
+
+def downgrade():
+    op.drop_table('production_stat_rollups')
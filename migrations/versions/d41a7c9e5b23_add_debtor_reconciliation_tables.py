@@ -0,0 +1,99 @@
+"""Add debtor reconciliation tables
+
+Revision ID: d41a7c9e5b23
+Revises: 3b7d9e2c4f10
+Create Date: 2026-10-17 12:21:07.418305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41a7c9e5b23'
+down_revision = '3b7d9e2c4f10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('debtor_files',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('kind', sa.String(length=10), nullable=False),
+    sa.Column('filename', sa.String(length=255), nullable=False),
+    sa.Column('uploaded_at', sa.DateTime(), nullable=False),
+    sa.Column('row_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('sha256')
+    )
+    op.create_table('debtor_payments',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('row_hash', sa.String(length=64), nullable=False),
+    sa.Column('booking_date', sa.String(length=20), nullable=True),
+    sa.Column('value_date', sa.String(length=20), nullable=True),
+    sa.Column('title', sa.Text(), nullable=True),
+    sa.Column('sender', sa.Text(), nullable=True),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('invoice_number_from_title', sa.String(length=100), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('row_hash')
+    )
+    op.create_table('debtor_runs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('csv_filename', sa.String(length=255), nullable=True),
+    sa.Column('pdf_filenames', sa.Text(), nullable=True),
+    sa.Column('new_invoices', sa.Integer(), nullable=False),
+    sa.Column('new_payments', sa.Integer(), nullable=False),
+    sa.Column('new_matches', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('debtor_invoices',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('number', sa.String(length=100), nullable=False),
+    sa.Column('number_upper', sa.String(length=100), nullable=False),
+    sa.Column('contractor', sa.String(length=255), nullable=True),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('issue_date', sa.String(length=10), nullable=True),
+    sa.Column('payment_id', sa.Integer(), nullable=True),
+    sa.Column('match_method', sa.String(length=50), nullable=True),
+    sa.Column('matched_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['payment_id'], ['debtor_payments.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('number_upper'),
+    sa.UniqueConstraint('payment_id')
+    )
+    op.create_table('debtor_file_payments',
+    sa.Column('file_id', sa.Integer(), nullable=False),
+    sa.Column('payment_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['file_id'], ['debtor_files.id'], ),
+    sa.ForeignKeyConstraint(['payment_id'], ['debtor_payments.id'], ),
+    sa.PrimaryKeyConstraint('file_id', 'payment_id')
+    )
+    op.create_table('debtor_run_files',
+    sa.Column('run_id', sa.Integer(), nullable=False),
+    sa.Column('file_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['file_id'], ['debtor_files.id'], ),
+    sa.ForeignKeyConstraint(['run_id'], ['debtor_runs.id'], ),
+    sa.PrimaryKeyConstraint('run_id', 'file_id')
+    )
+    op.create_table('debtor_file_invoices',
+    sa.Column('file_id', sa.Integer(), nullable=False),
+    sa.Column('invoice_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['file_id'], ['debtor_files.id'], ),
+    sa.ForeignKeyConstraint(['invoice_id'], ['debtor_invoices.id'], ),
+    sa.PrimaryKeyConstraint('file_id', 'invoice_id')
+    )
+
+
+def downgrade():
+    op.drop_table('debtor_file_invoices')
+    op.drop_table('debtor_run_files')
+    op.drop_table('debtor_file_payments')
+    op.drop_table('debtor_invoices')
+    op.drop_table('debtor_runs')
+    op.drop_table('debtor_payments')
+    op.drop_table('debtor_files')
@@ -0,0 +1,62 @@
+"""Add product daily sales
+
+Revision ID: d9a4f6b2e185
+Revises: b5d1e9c3a7f2
+Create Date: 2026-10-17 19:48:03.917254
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9a4f6b2e185'
+down_revision = 'b5d1e9c3a7f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('product_daily_sales',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('quantity', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['finished_products.id'], ),
+    sa.PrimaryKeyConstraint('product_id', 'day')
+    )
+    with op.batch_alter_table('product_daily_sales', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_product_daily_sales_day'), ['day'], unique=False)
+
+    with op.batch_alter_table('sales_report_logs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('period_days', sa.Integer(), server_default='1', nullable=False))
+        batch_op.drop_index('ix_sales_report_logs_report_date')
+
+    op.drop_table('product_sales_velocity')
+
+    # Dotychczasowe wpisy dotyczą jednego dnia - sprzedaż dzienna to ich suma dla produktu i daty
+    op.execute(
+        "INSERT INTO product_daily_sales (product_id, day, quantity) "
+        "SELECT product_id, report_date, SUM(quantity_sold) FROM sales_report_logs GROUP BY product_id, report_date"
+    )
+
+
+def downgrade():
+    # Pustą tabelę wypełnia `flask rebuild-sales-velocity` z wersji sprzed tej migracji
+    op.create_table('product_sales_velocity',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('as_of_date', sa.Date(), nullable=False),
+    sa.Column('sold_7d', sa.Integer(), nullable=False),
+    sa.Column('sold_28d', sa.Integer(), nullable=False),
+    sa.Column('days_7d', sa.Integer(), nullable=False),
+    sa.Column('days_28d', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['finished_products.id'], ),
+    sa.PrimaryKeyConstraint('product_id')
+    )
+    with op.batch_alter_table('sales_report_logs', schema=None) as batch_op:
+        batch_op.create_index('ix_sales_report_logs_report_date', ['report_date'], unique=False)
+        batch_op.drop_column('period_days')
+
+    with op.batch_alter_table('product_daily_sales', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_product_daily_sales_day'))
+
+    op.drop_table('product_daily_sales')
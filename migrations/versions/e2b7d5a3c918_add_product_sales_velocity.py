@@ -0,0 +1,59 @@
+"""Add product sales velocity
+
+Revision ID: e2b7d5a3c918
+Revises: c4e8b1f2d6a9
+Create Date: 2026-10-17 17:36:52.104873
+
+"""
+from datetime import date, timedelta
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b7d5a3c918'
+down_revision = 'c4e8b1f2d6a9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('product_sales_velocity',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('as_of_date', sa.Date(), nullable=False),
+    sa.Column('sold_7d', sa.Integer(), nullable=False),
+    sa.Column('sold_28d', sa.Integer(), nullable=False),
+    sa.Column('days_7d', sa.Integer(), nullable=False),
+    sa.Column('days_28d', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['finished_products.id'], ),
+    sa.PrimaryKeyConstraint('product_id')
+    )
+    with op.batch_alter_table('sales_report_logs', schema=None) as batch_op:
+        batch_op.create_index('ix_sales_report_logs_report_date', ['report_date'], unique=False)
+
+    # Wypełnienie tabeli sprzedażą z ostatnich 7 i 28 dni przed najnowszym raportem
+    bind = op.get_bind()
+    first_date, as_of = bind.execute(sa.text('SELECT MIN(report_date), MAX(report_date) FROM sales_report_logs')).one()
+    if as_of is None:
+        return
+    first_date, as_of = date.fromisoformat(str(first_date)), date.fromisoformat(str(as_of))
+    history_days = (as_of - first_date).days + 1
+    bind.execute(sa.text(
+        "INSERT INTO product_sales_velocity (product_id, as_of_date, sold_7d, sold_28d, days_7d, days_28d) "
+        "SELECT product_id, :as_of, SUM(CASE WHEN report_date >= :week_start THEN quantity_sold ELSE 0 END), "
+        "SUM(quantity_sold), :days_7d, :days_28d "
+        "FROM sales_report_logs WHERE report_date >= :window_start GROUP BY product_id"
+    ).bindparams(
+        sa.bindparam('as_of', as_of, type_=sa.Date()),
+        sa.bindparam('week_start', as_of - timedelta(days=6), type_=sa.Date()),
+        sa.bindparam('window_start', as_of - timedelta(days=27), type_=sa.Date()),
+        days_7d=min(7, history_days),
+        days_28d=min(28, history_days)
+    ))
+
+
+def downgrade():
+    with op.batch_alter_table('sales_report_logs', schema=None) as batch_op:
+        batch_op.drop_index('ix_sales_report_logs_report_date')
+
+    op.drop_table('product_sales_velocity')
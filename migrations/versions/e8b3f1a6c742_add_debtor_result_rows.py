@@ -0,0 +1,45 @@
+"""Add debtor result rows
+
+Revision ID: e8b3f1a6c742
+Revises: d41a7c9e5b23
+Create Date: 2026-10-17 13:02:44.915027
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b3f1a6c742'
+down_revision = 'd41a7c9e5b23'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('debtor_result_rows',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('run_id', sa.Integer(), nullable=False),
+    sa.Column('section', sa.String(length=10), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=50), nullable=True),
+    sa.Column('invoice_number', sa.String(length=100), nullable=True),
+    sa.Column('contractor', sa.String(length=255), nullable=True),
+    sa.Column('invoice_amount', sa.Float(), nullable=True),
+    sa.Column('payment_amount', sa.Float(), nullable=True),
+    sa.Column('amount_difference', sa.Float(), nullable=True),
+    sa.Column('title_invoice_number', sa.String(length=100), nullable=True),
+    sa.Column('booking_date', sa.String(length=20), nullable=True),
+    sa.Column('booking_day', sa.Date(), nullable=True),
+    sa.Column('payment_title', sa.Text(), nullable=True),
+    sa.Column('sender', sa.Text(), nullable=True),
+    sa.Column('repeat_contractor', sa.Boolean(), nullable=False),
+    sa.ForeignKeyConstraint(['run_id'], ['debtor_runs.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_debtor_result_rows_run_section_position', 'debtor_result_rows', ['run_id', 'section', 'position'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_debtor_result_rows_run_section_position', table_name='debtor_result_rows')
+    op.drop_table('debtor_result_rows')
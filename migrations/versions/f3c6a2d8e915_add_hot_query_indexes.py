@@ -0,0 +1,74 @@
+"""Add hot query indexes
+
+Revision ID: f3c6a2d8e915
+Revises: e8b3f1a6c742
+Create Date: 2026-10-17 14:21:07.402318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c6a2d8e915'
+down_revision = 'e8b3f1a6c742'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('activity_logs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_activity_logs_timestamp'), ['timestamp'], unique=False)
+
+    with op.batch_alter_table('finished_products', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_finished_products_product_code'), ['product_code'], unique=False)
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.create_index('ix_orders_archived_invoice', ['is_archived', 'invoice_number'], unique=False)
+
+    with op.batch_alter_table('production_logs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_production_logs_production_order_id'), ['production_order_id'], unique=False)
+
+    with op.batch_alter_table('raw_material_batches', schema=None) as batch_op:
+        batch_op.create_index('ix_raw_material_batches_material_received', ['raw_material_id', 'received_date'], unique=False)
+
+    with op.batch_alter_table('sales_report_logs', schema=None) as batch_op:
+        batch_op.create_index('ix_sales_report_logs_product_date', ['product_id', 'report_date'], unique=False)
+
+    with op.batch_alter_table('tasks', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_tasks_status'), ['status'], unique=False)
+
+    with op.batch_alter_table('team_orders', schema=None) as batch_op:
+        batch_op.create_index('ix_team_orders_status_date', ['status', 'order_date'], unique=False)
+
+    with op.batch_alter_table('vacation_requests', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_vacation_requests_status'), ['status'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('vacation_requests', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_vacation_requests_status'))
+
+    with op.batch_alter_table('team_orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_team_orders_status_date')
+
+    with op.batch_alter_table('tasks', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_tasks_status'))
+
+    with op.batch_alter_table('sales_report_logs', schema=None) as batch_op:
+        batch_op.drop_index('ix_sales_report_logs_product_date')
+
+    with op.batch_alter_table('raw_material_batches', schema=None) as batch_op:
+        batch_op.drop_index('ix_raw_material_batches_material_received')
+
+    with op.batch_alter_table('production_logs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_production_logs_production_order_id'))
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_archived_invoice')
+
+    with op.batch_alter_table('finished_products', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_finished_products_product_code'))
+
+    with op.batch_alter_table('activity_logs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_activity_logs_timestamp'))